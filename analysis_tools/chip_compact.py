@@ -0,0 +1,269 @@
+# 紧凑筹码分布模块（使用持仓增量）
+# 接口与ChipDistributionWithIncrement相同，筹码不保存在 {价格: 筹码量} 字典中（每个价格约100字节），
+# 而是保存在以最小变动价位为间距的float32数组中，每个价格4字节；另存float32残差时8字节，与float64相同。
+# 每次更新在float64中计算后写回，不带补偿时n次更新后相对误差最坏为 n * 2**-24，精度见framework.compact。
+import numpy as np
+from framework.event_journal import get_journal
+from framework.compact import compensated_store, compensated_values
+from analysis_tools.chip_plotting import chip_arrays, plot_chip_distribution_fast
+from analysis_tools.chip_kernels import merge_chip_grid, replay_increment_chips, snap_prices, tick_decimals
+
+
+class CompactChipDistribution:
+    """
+    紧凑筹码分布计算类（使用持仓增量）
+    结果与ChipDistributionWithIncrement的向量化计算一致，可以在策略中替换使用
+    """
+    def __init__(self, price_tick=0.01, compensated=False):
+        """
+        初始化筹码分布
+
+        Args:
+            price_tick: 价格网格间距，期货应使用合约的最小变动价位，默认为0.01
+            compensated: 是否另存float32值与float64结果之差（float32残差），下次更新时加回，默认为False。
+                不保存残差时n次更新后相对误差最坏为 n * 2**-24；保存后误差不随更新次数累积，但每个价格占8字节
+        """
+        # 历史衰减系数
+        self.decay_coefficient = 1
+        # 价格精度（价格网格间距）及价格保留的小数位数
+        self.price_precision = price_tick
+        self.price_decimals = tick_decimals(price_tick)
+        self.compensated = compensated
+        self.reset()
+
+    @classmethod
+    def for_symbol(cls, symbol, api=None, **kwargs):
+        """
+        按合约的最小变动价位创建筹码分布
+
+        Args:
+            symbol: 合约代码
+            api: TqApi实例，提供时优先使用行情中的price_tick，默认为None（使用本地合约参数表）
+            **kwargs: 其他初始化参数
+
+        Returns:
+            筹码分布实例
+        """
+        from framework.contracts import resolve_price_tick
+        return cls(price_tick=resolve_price_tick(symbol, api), **kwargs)
+
+    def reset(self):
+        """
+        清空筹码分布
+        """
+        # 筹码网格，第j个元素对应价格 (origin + j) * price_tick 处的筹码量
+        self.grid = np.zeros(0, dtype=np.float32)
+        # float32网格的舍入误差，筹码量为grid + residual
+        self.residual = np.zeros(0, dtype=np.float32) if self.compensated else None
+        self.origin = 0
+        # 前一日持仓量，用于计算持仓增量
+        self.prev_open_interest = None
+
+    @property
+    def nbytes(self):
+        """
+        筹码网格占用的字节数
+        """
+        return self.grid.nbytes + (self.residual.nbytes if self.residual is not None else 0)
+
+    @property
+    def prices(self):
+        """
+        价格网格
+        """
+        return snap_prices((self.origin + np.arange(len(self.grid))) * self.price_precision,
+                           self.price_precision, self.price_decimals)
+
+    @property
+    def values(self):
+        """
+        float64筹码网格，保存残差时为float32值加残差
+        """
+        return compensated_values(self.grid, self.residual)
+
+    @property
+    def price_vol(self):
+        """
+        {价格: 筹码量} 字典，只包含筹码量不为0的价格，每次访问时生成
+        """
+        values = self.values
+        nonzero = np.flatnonzero(values)
+        return dict(zip(self.prices[nonzero].tolist(), values[nonzero].tolist()))
+
+    def calculate_from_klines(self, klines, method='triangle', decay_coefficient=1):
+        """
+        从K线数据计算筹码分布
+
+        Args:
+            klines: K线数据，pandas.DataFrame格式，需要包含high, low, close, volume, open_interest字段
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+            decay_coefficient: 历史衰减系数
+        """
+        if klines is None or len(klines) == 0:
+            get_journal().warning("chip", "K线数据为空，无法计算筹码分布")
+            return
+        for col in ['high', 'low', 'close', 'volume', 'open_interest']:
+            if col not in klines.columns:
+                get_journal().warning("chip", "K线数据缺少必要的列: {column}", column=col)
+                return
+
+        self.reset()
+        self.decay_coefficient = decay_coefficient
+        self.replay_bars(klines['high'].to_numpy(), klines['low'].to_numpy(), klines['close'].to_numpy(),
+                         klines['volume'].to_numpy(), klines['open_interest'].to_numpy(), method)
+
+    def replay_bars(self, high, low, close, volume, open_interest, method='triangle'):
+        """
+        一次计入多根K线，相当于逐根调用update_bar
+
+        Args:
+            high: 最高价数组
+            low: 最低价数组
+            close: 收盘价数组
+            volume: 成交量数组
+            open_interest: 持仓量数组
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+
+        Returns:
+            int: 计入的有效K线数量
+        """
+        existing = self.values
+        prices, values, survival, last_oi, count = replay_increment_chips(
+            high, low, close, volume, open_interest, method, self.decay_coefficient,
+            min_d=self.price_precision, decimals=self.price_decimals,
+            prev_open_interest=self.prev_open_interest, existing=(existing, self.origin))
+        if count == 0:
+            return 0
+
+        grid, self.origin = merge_chip_grid(existing[None, :], self.origin, [survival], values[None, :],
+                                            int(np.rint(prices[0] / self.price_precision)))
+        # 在float64中合并后写回float32，舍入误差留到下一次合并时加回
+        self.grid, self.residual = compensated_store(grid[0], self.compensated)
+        self.prev_open_interest = last_oi
+        return count
+
+    def update_bar(self, date, high, low, close, volume, open_interest, method='triangle'):
+        """
+        使用一根K线增量更新筹码分布
+
+        Args:
+            date: 日期
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+            volume: 成交量
+            open_interest: 持仓量
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+
+        Returns:
+            bool: 数据有效并已更新时返回True
+        """
+        return self.replay_bars(np.array([high]), np.array([low]), np.array([close]), np.array([volume]),
+                                np.array([open_interest]), method) > 0
+
+    def get_chip_metrics(self, price, percentiles):
+        """
+        一次计算获利比例和多个成本分位
+
+        Args:
+            price: 当前价格
+            percentiles: 百分位数列表，0-100之间
+
+        Returns:
+            tuple: (获利比例, 对应百分位的价格列表)
+        """
+        if len(self.grid) == 0:
+            return 0, [0 for _ in percentiles]
+        prices = self.prices
+        cumulative = np.cumsum(self.values)
+        total_chips = cumulative[-1]
+        if total_chips == 0:
+            return 0, [0 for _ in percentiles]
+
+        # 价格严格低于当前价格的筹码为获利盘
+        below = np.searchsorted(prices, price, side='left')
+        profit_ratio = cumulative[below - 1] / total_chips if below > 0 else 0
+
+        ratios = cumulative / total_chips
+        costs = []
+        for percentile in percentiles:
+            idx = np.searchsorted(ratios, percentile / 100, side='left')
+            costs.append(prices[min(idx, len(prices) - 1)])
+        return profit_ratio, costs
+
+    def get_profit_ratio(self, price):
+        """
+        计算获利比例
+        获利比例 = 当前价格以下的筹码总量 / 筹码总量
+
+        Args:
+            price: 当前价格
+
+        Returns:
+            获利比例，0-1之间的浮点数
+        """
+        return self.get_chip_metrics(price, [])[0]
+
+    def get_cost_distribution(self, percentile):
+        """
+        计算成本分布
+        COST(10)表示10%获利盘的价格是多少
+
+        Args:
+            percentile: 百分位数，0-100之间的整数
+
+        Returns:
+            对应百分位的价格
+        """
+        return self.get_chip_metrics(np.nan, [percentile])[1][0]
+
+    def plot_chip_distribution(self, current_price=None):
+        """
+        绘制筹码分布图
+
+        Args:
+            current_price: 当前价格，如果提供则会在图中标记当前价格线
+        """
+        if len(self.grid) == 0:
+            get_journal().warning("chip", "没有筹码分布数据")
+            return
+
+        # 只在绘图时导入pyplot，避免计算任务加载绘图库
+        import matplotlib.pyplot as plt
+
+        prices, volumes = chip_arrays(self)
+        plt.figure(figsize=(12, 6))
+        plot_chip_distribution_fast(prices, volumes, current_price, price_step=self.price_precision,
+                                    title='筹码分布图（使用持仓增量）')
+        plt.show()
+
+    def save_chip_distribution(self, path, current_price=None, figsize=(12, 6), dpi=100):
+        """
+        将筹码分布图保存为PNG文件，不依赖图形界面
+
+        Args:
+            path: 输出文件路径
+            current_price: 当前价格，如果提供则会在图中标记当前价格线
+            figsize: 图像尺寸（英寸），默认为(12, 6)
+            dpi: 分辨率，默认为100
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        prices, volumes = chip_arrays(self)
+        plot_chip_distribution_fast(prices, volumes, current_price, ax=fig.add_subplot(),
+                                    price_step=self.price_precision, title='筹码分布图（使用持仓增量）')
+        fig.savefig(path)
+
+    def get_chip_distribution(self):
+        """
+        获取筹码分布数据
+
+        Returns:
+            tuple: (价格列表, 筹码密度列表)
+        """
+        values = self.values
+        nonzero = np.flatnonzero(values)
+        return self.prices[nonzero].tolist(), values[nonzero].tolist()
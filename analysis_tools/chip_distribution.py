@@ -1,22 +1,47 @@
 # 筹码分布计算模块
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+from framework.event_journal import get_journal
+from analysis_tools.chip_plotting import chip_arrays, plot_chip_distribution_fast
+from analysis_tools.chip_kernels import grid_prices, tick_decimals
 
 class ChipDistribution:
     """
     筹码分布计算类
     基于股票的历史交易数据计算筹码分布
     """
-    def __init__(self, decay_coefficient = 1):
+    def __init__(self, decay_coefficient = 1, price_tick=0.01):
+        """
+        初始化筹码分布
+
+        Args:
+            decay_coefficient: 历史衰减系数，默认为1
+            price_tick: 价格网格间距，期货应使用合约的最小变动价位，默认为0.01
+        """
         # 价格和筹码量的分布
         self.price_vol = {}
         # 历史衰减系数
         self.decay_coefficient = decay_coefficient
-        # 价格精度
-        self.price_precision = 0.01
+        # 价格精度（价格网格间距）及价格保留的小数位数
+        self.price_precision = price_tick
+        self.price_decimals = tick_decimals(price_tick)
+    
+    @classmethod
+    def for_symbol(cls, symbol, api=None, **kwargs):
+        """
+        按合约的最小变动价位创建筹码分布
+
+        Args:
+            symbol: 合约代码
+            api: TqApi实例，提供时优先使用行情中的price_tick，默认为None（使用本地合约参数表）
+            **kwargs: 其他初始化参数
+
+        Returns:
+            筹码分布实例
+        """
+        from framework.contracts import resolve_price_tick
+        return cls(price_tick=resolve_price_tick(symbol, api), **kwargs)
     
-    def calculate_triangle_distribution(self, date, high, low, avg, volume, turnover_rate, min_d=0.01):
+    def calculate_triangle_distribution(self, date, high, low, avg, volume, turnover_rate, min_d=None):
         """
         三角形分布算法计算筹码分布
         将当日的换手筹码在当日的最高价、最低价和平均价之间三角形分布
@@ -28,19 +53,21 @@ class ChipDistribution:
             avg: 平均价
             volume: 成交量
             turnover_rate: 换手率（百分比）
-            min_d: 价格精度
+            min_d: 价格网格间距，默认为None（使用price_precision）
         """
         # 检查输入数据有效性
         if np.isnan(high) or np.isnan(low) or np.isnan(avg) or np.isnan(volume) or np.isnan(turnover_rate):
             return
         
+        if min_d is None:
+            min_d = self.price_precision
+        
         # 确保 high > low
         if high <= low:
             high = low + min_d
             
-        # 生成价格序列
-        price_range = np.arange(low, high + min_d, min_d)
-        price_range = [round(p, 2) for p in price_range]
+        # 生成价格序列，最低价向下、最高价向上取整到价格网格
+        price_range = grid_prices(low, high, min_d).tolist()
         
         # 计算当日筹码分布
         today_chip = {}
@@ -75,7 +102,7 @@ class ChipDistribution:
             else:
                 self.price_vol[price] = today_chip[price] * (turnover_rate * self.decay_coefficient / 100)
     
-    def calculate_even_distribution(self, date, high, low, volume, turnover_rate, min_d=0.01):
+    def calculate_even_distribution(self, date, high, low, volume, turnover_rate, min_d=None):
         """
         均匀分布算法计算筹码分布
         将当日的换手筹码在当日的最高价和最低价之间均匀分布
@@ -86,19 +113,21 @@ class ChipDistribution:
             low: 最低价
             volume: 成交量
             turnover_rate: 换手率（百分比）
-            min_d: 价格精度
+            min_d: 价格网格间距，默认为None（使用price_precision）
         """
         # 检查输入数据有效性
         if np.isnan(high) or np.isnan(low) or np.isnan(volume) or np.isnan(turnover_rate):
             return
         
+        if min_d is None:
+            min_d = self.price_precision
+        
         # 确保 high > low
         if high <= low:
             high = low + min_d
             
-        # 生成价格序列
-        price_range = np.arange(low, high + min_d, min_d)
-        price_range = [round(p, 2) for p in price_range]
+        # 生成价格序列，最低价向下、最高价向上取整到价格网格
+        price_range = grid_prices(low, high, min_d).tolist()
         
         # 计算每个价格点的筹码量
         each_vol = volume / len(price_range)
@@ -124,18 +153,19 @@ class ChipDistribution:
         """
         # 检查输入数据
         if klines is None or len(klines) == 0:
-            print("K线数据为空，无法计算筹码分布")
+            get_journal().warning("chip", "K线数据为空，无法计算筹码分布")
             return
             
         # 检查必要的列是否存在
         required_columns = ['high', 'low', 'close', 'volume']
         for col in required_columns:
             if col not in klines.columns:
-                print(f"K线数据缺少必要的列: {col}")
+                get_journal().warning("chip", "K线数据缺少必要的列: {column}", column=col)
                 return
         
         self.price_vol = {}
         self.decay_coefficient = decay_coefficient
+        journal = get_journal()
         
         for i in range(len(klines)):
             try:
@@ -165,7 +195,7 @@ class ChipDistribution:
                 else:
                     self.calculate_even_distribution(date, high, low, volume, turnover_rate)
             except Exception as e:
-                print(f"处理第{i}行数据时出错: {e}")
+                journal.error("error", "处理第{row}行数据时出错: {error}", row=i, error=str(e))
                 continue
     
     def get_profit_ratio(self, price):
@@ -226,30 +256,39 @@ class ChipDistribution:
             current_price: 当前价格，如果提供则会在图中标记当前价格线
         """
         if not self.price_vol:
-            print("没有筹码分布数据")
+            get_journal().warning("chip", "没有筹码分布数据")
             return
         
-        # 按价格排序
-        sorted_items = sorted(self.price_vol.items())
-        prices = [item[0] for item in sorted_items]
-        volumes = [item[1] for item in sorted_items]
+        # 只在绘图时导入pyplot，避免计算任务加载绘图库
+        import matplotlib.pyplot as plt
         
+        # 按像素分辨率合并价格区间后绘制
+        prices, volumes = chip_arrays(self)
         plt.figure(figsize=(12, 6))
-        plt.bar(prices, volumes, width=self.price_precision, alpha=0.7)
-        plt.xlabel('价格')
-        plt.ylabel('筹码量')
-        plt.title('筹码分布图')
-        
-        if current_price:
-            plt.axvline(x=current_price, color='r', linestyle='--', label=f'当前价格: {current_price}')
-            profit_ratio = self.get_profit_ratio(current_price)
-            plt.text(current_price, max(volumes) * 0.9, f'获利比例: {profit_ratio:.2%}', 
-                     bbox=dict(facecolor='white', alpha=0.5))
-            plt.legend()
-        
-        plt.grid(True, alpha=0.3)
+        plot_chip_distribution_fast(prices, volumes, current_price, price_step=self.price_precision,
+                                    title='筹码分布图')
         plt.show()
     
+    def save_chip_distribution(self, path, current_price=None, figsize=(12, 6), dpi=100):
+        """
+        将筹码分布图保存为PNG文件，不依赖图形界面
+        
+        Args:
+            path: 输出文件路径
+            current_price: 当前价格，如果提供则会在图中标记当前价格线
+            figsize: 图像尺寸（英寸），默认为(12, 6)
+            dpi: 分辨率，默认为100
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        prices, volumes = chip_arrays(self)
+        plot_chip_distribution_fast(prices, volumes, current_price, ax=fig.add_subplot(),
+                                    price_step=self.price_precision, title='筹码分布图')
+        fig.savefig(path)
+    
     def get_chip_distribution(self):
         """
         获取筹码分布数据
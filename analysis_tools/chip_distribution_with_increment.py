@@ -1,24 +1,48 @@
 # 筹码分布计算模块（使用持仓增量）
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+from framework.event_journal import get_journal
+from analysis_tools.chip_plotting import chip_arrays, plot_chip_distribution_fast
+from analysis_tools.chip_kernels import grid_prices, replay_increment_chips, tick_decimals
 
 class ChipDistributionWithIncrement:
     """
     筹码分布计算类（使用持仓增量）
     基于股票/期货的历史交易数据和持仓增量计算筹码分布
     """
-    def __init__(self):
+    def __init__(self, price_tick=0.01):
+        """
+        初始化筹码分布
+
+        Args:
+            price_tick: 价格网格间距，期货应使用合约的最小变动价位，默认为0.01
+        """
         # 价格和筹码量的分布
         self.price_vol = {}
         # 历史衰减系数
         self.decay_coefficient = 1
-        # 价格精度
-        self.price_precision = 0.01
+        # 价格精度（价格网格间距）及价格保留的小数位数
+        self.price_precision = price_tick
+        self.price_decimals = tick_decimals(price_tick)
         # 前一日持仓量，用于计算持仓增量
         self.prev_open_interest = None
     
-    def calculate_triangle_distribution(self, date, high, low, avg, volume, open_interest, min_d=0.01):
+    @classmethod
+    def for_symbol(cls, symbol, api=None, **kwargs):
+        """
+        按合约的最小变动价位创建筹码分布
+
+        Args:
+            symbol: 合约代码
+            api: TqApi实例，提供时优先使用行情中的price_tick，默认为None（使用本地合约参数表）
+            **kwargs: 其他初始化参数
+
+        Returns:
+            筹码分布实例
+        """
+        from framework.contracts import resolve_price_tick
+        return cls(price_tick=resolve_price_tick(symbol, api), **kwargs)
+    
+    def calculate_triangle_distribution(self, date, high, low, avg, volume, open_interest, min_d=None):
         """
         三角形分布算法计算筹码分布
         将当日的换手筹码在当日的最高价、最低价和平均价之间三角形分布
@@ -30,19 +54,21 @@ class ChipDistributionWithIncrement:
             avg: 平均价
             volume: 成交量
             open_interest: 持仓量
-            min_d: 价格精度
+            min_d: 价格网格间距，默认为None（使用price_precision）
         """
         # 检查输入数据有效性
         if np.isnan(high) or np.isnan(low) or np.isnan(avg) or np.isnan(volume) or np.isnan(open_interest):
             return
         
+        if min_d is None:
+            min_d = self.price_precision
+        
         # 确保 high > low
         if high <= low:
             high = low + min_d
             
-        # 生成价格序列
-        price_range = np.arange(low, high + min_d, min_d)
-        price_range = [round(p, 2) for p in price_range]
+        # 生成价格序列，最低价向下、最高价向上取整到价格网格
+        price_range = grid_prices(low, high, min_d).tolist()
         
         # 计算当日筹码分布
         today_chip = {}
@@ -95,7 +121,7 @@ class ChipDistributionWithIncrement:
             else:
                 self.price_vol[price] = today_chip[price] * (turnover_rate * self.decay_coefficient)
     
-    def calculate_even_distribution(self, date, high, low, volume, open_interest, min_d=0.01):
+    def calculate_even_distribution(self, date, high, low, volume, open_interest, min_d=None):
         """
         均匀分布算法计算筹码分布
         将当日的换手筹码在当日的最高价和最低价之间均匀分布
@@ -106,19 +132,21 @@ class ChipDistributionWithIncrement:
             low: 最低价
             volume: 成交量
             open_interest: 持仓量
-            min_d: 价格精度
+            min_d: 价格网格间距，默认为None（使用price_precision）
         """
         # 检查输入数据有效性
         if np.isnan(high) or np.isnan(low) or np.isnan(volume) or np.isnan(open_interest):
             return
         
+        if min_d is None:
+            min_d = self.price_precision
+        
         # 确保 high > low
         if high <= low:
             high = low + min_d
             
-        # 生成价格序列
-        price_range = np.arange(low, high + min_d, min_d)
-        price_range = [round(p, 2) for p in price_range]
+        # 生成价格序列，最低价向下、最高价向上取整到价格网格
+        price_range = grid_prices(low, high, min_d).tolist()
         
         # 计算每个价格点的筹码量
         each_vol = volume / len(price_range)
@@ -151,7 +179,7 @@ class ChipDistributionWithIncrement:
             else:
                 self.price_vol[price] = each_vol * (turnover_rate * self.decay_coefficient)
     
-    def calculate_from_klines(self, klines, method='triangle', decay_coefficient=1):
+    def calculate_from_klines(self, klines, method='triangle', decay_coefficient=1, vectorized=True):
         """
         从K线数据计算筹码分布
         
@@ -159,23 +187,30 @@ class ChipDistributionWithIncrement:
             klines: K线数据，pandas.DataFrame格式，需要包含high, low, close, volume, open_interest字段
             method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
             decay_coefficient: 历史衰减系数
+            vectorized: 是否使用向量化计算（见replay_bars），默认为True；为False时逐K线计算
         """
         # 检查输入数据
         if klines is None or len(klines) == 0:
-            print("K线数据为空，无法计算筹码分布")
+            get_journal().warning("chip", "K线数据为空，无法计算筹码分布")
             return
             
         # 检查必要的列是否存在
         required_columns = ['high', 'low', 'close', 'volume', 'open_interest']
         for col in required_columns:
             if col not in klines.columns:
-                print(f"K线数据缺少必要的列: {col}")
+                get_journal().warning("chip", "K线数据缺少必要的列: {column}", column=col)
                 return
         
         self.price_vol = {}
         self.decay_coefficient = decay_coefficient
+        journal = get_journal()
         self.prev_open_interest = None
         
+        if vectorized:
+            self.replay_bars(klines['high'].to_numpy(), klines['low'].to_numpy(), klines['close'].to_numpy(),
+                             klines['volume'].to_numpy(), klines['open_interest'].to_numpy(), method)
+            return
+        
         for i in range(len(klines)):
             try:
                 date = klines.index[i]
@@ -185,19 +220,82 @@ class ChipDistributionWithIncrement:
                 volume = klines['volume'].iloc[i]
                 open_interest = klines['open_interest'].iloc[i]
                 
-                # 检查数据有效性
-                if np.isnan(high) or np.isnan(low) or np.isnan(close) or np.isnan(volume) or np.isnan(open_interest):
-                    continue
-                
-                if method == 'triangle':
-                    avg = (high + low + close) / 3
-                    self.calculate_triangle_distribution(date, high, low, avg, volume, open_interest)
-                else:
-                    self.calculate_even_distribution(date, high, low, volume, open_interest)
+                self.update_bar(date, high, low, close, volume, open_interest, method)
             except Exception as e:
-                print(f"处理第{i}行数据时出错: {e}")
+                journal.error("error", "处理第{row}行数据时出错: {error}", row=i, error=str(e))
                 continue
     
+    def replay_bars(self, high, low, close, volume, open_interest, method='triangle'):
+        """
+        一次计入多根K线，相当于逐根调用update_bar
+        使用累积衰减乘积一次算出整段K线的贡献，不需要逐K线衰减整个分布；
+        三角形分布最高价处负值分配的清理方式见analysis_tools.chip_kernels
+        
+        Args:
+            high: 最高价数组
+            low: 最低价数组
+            close: 收盘价数组
+            volume: 成交量数组
+            open_interest: 持仓量数组
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+        
+        Returns:
+            int: 计入的有效K线数量
+        """
+        existing = None
+        if self.price_vol:
+            # 已有筹码按价格网格排列，用于递推收到负值分配的价格点
+            ticks = np.rint(np.fromiter(self.price_vol, dtype=float) / self.price_precision).astype(np.int64)
+            existing = (np.zeros(ticks.max() - ticks.min() + 1), int(ticks.min()))
+            existing[0][ticks - existing[1]] = list(self.price_vol.values())
+        prices, values, survival, last_oi, count = replay_increment_chips(
+            high, low, close, volume, open_interest, method, self.decay_coefficient,
+            min_d=self.price_precision, decimals=self.price_decimals,
+            prev_open_interest=self.prev_open_interest, existing=existing)
+        if count == 0:
+            return 0
+        
+        # 已有筹码衰减后清理接近零的筹码量，再加上新增筹码
+        price_vol = {}
+        for price, vol in self.price_vol.items():
+            vol = vol * survival
+            if vol >= 1e-10:
+                price_vol[price] = vol
+        nonzero = np.flatnonzero(values)
+        for price, vol in zip(prices[nonzero].tolist(), values[nonzero].tolist()):
+            price_vol[price] = price_vol.get(price, 0) + vol
+        self.price_vol = {price: vol for price, vol in price_vol.items() if vol != 0}
+        self.prev_open_interest = last_oi
+        return count
+    
+    def update_bar(self, date, high, low, close, volume, open_interest, method='triangle'):
+        """
+        使用一根K线增量更新筹码分布
+        适合在策略中逐K线调用，不需要从头重新计算
+        
+        Args:
+            date: 日期
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+            volume: 成交量
+            open_interest: 持仓量
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+        
+        Returns:
+            bool: 数据有效并已更新时返回True
+        """
+        # 检查数据有效性
+        if np.isnan(high) or np.isnan(low) or np.isnan(close) or np.isnan(volume) or np.isnan(open_interest):
+            return False
+        
+        if method == 'triangle':
+            avg = (high + low + close) / 3
+            self.calculate_triangle_distribution(date, high, low, avg, volume, open_interest)
+        else:
+            self.calculate_even_distribution(date, high, low, volume, open_interest)
+        return True
+    
     def get_profit_ratio(self, price):
         """
         计算获利比例
@@ -248,6 +346,41 @@ class ChipDistributionWithIncrement:
         
         return sorted_prices[-1] if sorted_prices else 0
     
+    def get_chip_metrics(self, price, percentiles):
+        """
+        一次计算获利比例和多个成本分位
+        只对筹码分布排序一次，供策略每根K线调用
+        
+        Args:
+            price: 当前价格
+            percentiles: 百分位数列表，0-100之间
+        
+        Returns:
+            tuple: (获利比例, 对应百分位的价格列表)
+        """
+        if not self.price_vol:
+            return 0, [0 for _ in percentiles]
+        
+        prices = np.fromiter(self.price_vol.keys(), dtype=float, count=len(self.price_vol))
+        volumes = np.fromiter(self.price_vol.values(), dtype=float, count=len(self.price_vol))
+        order = np.argsort(prices)
+        prices = prices[order]
+        cumulative = np.cumsum(volumes[order])
+        total_chips = cumulative[-1]
+        if total_chips == 0:
+            return 0, [0 for _ in percentiles]
+        
+        # 价格严格低于当前价格的筹码为获利盘
+        below = np.searchsorted(prices, price, side='left')
+        profit_ratio = cumulative[below - 1] / total_chips if below > 0 else 0
+        
+        ratios = cumulative / total_chips
+        costs = []
+        for percentile in percentiles:
+            idx = np.searchsorted(ratios, percentile / 100, side='left')
+            costs.append(prices[min(idx, len(prices) - 1)])
+        return profit_ratio, costs
+    
     def plot_chip_distribution(self, current_price=None):
         """
         绘制筹码分布图
@@ -256,30 +389,39 @@ class ChipDistributionWithIncrement:
             current_price: 当前价格，如果提供则会在图中标记当前价格线
         """
         if not self.price_vol:
-            print("没有筹码分布数据")
+            get_journal().warning("chip", "没有筹码分布数据")
             return
         
-        # 按价格排序
-        sorted_items = sorted(self.price_vol.items())
-        prices = [item[0] for item in sorted_items]
-        volumes = [item[1] for item in sorted_items]
+        # 只在绘图时导入pyplot，避免计算任务加载绘图库
+        import matplotlib.pyplot as plt
         
+        # 按像素分辨率合并价格区间后绘制
+        prices, volumes = chip_arrays(self)
         plt.figure(figsize=(12, 6))
-        plt.bar(prices, volumes, width=self.price_precision, alpha=0.7)
-        plt.xlabel('价格')
-        plt.ylabel('筹码量')
-        plt.title('筹码分布图（使用持仓增量）')
-        
-        if current_price:
-            plt.axvline(x=current_price, color='r', linestyle='--', label=f'当前价格: {current_price}')
-            profit_ratio = self.get_profit_ratio(current_price)
-            plt.text(current_price, max(volumes) * 0.9, f'获利比例: {profit_ratio:.2%}', 
-                     bbox=dict(facecolor='white', alpha=0.5))
-            plt.legend()
-        
-        plt.grid(True, alpha=0.3)
+        plot_chip_distribution_fast(prices, volumes, current_price, price_step=self.price_precision,
+                                    title='筹码分布图（使用持仓增量）')
         plt.show()
     
+    def save_chip_distribution(self, path, current_price=None, figsize=(12, 6), dpi=100):
+        """
+        将筹码分布图保存为PNG文件，不依赖图形界面
+        
+        Args:
+            path: 输出文件路径
+            current_price: 当前价格，如果提供则会在图中标记当前价格线
+            figsize: 图像尺寸（英寸），默认为(12, 6)
+            dpi: 分辨率，默认为100
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        prices, volumes = chip_arrays(self)
+        plot_chip_distribution_fast(prices, volumes, current_price, ax=fig.add_subplot(),
+                                    price_step=self.price_precision, title='筹码分布图（使用持仓增量）')
+        fig.savefig(path)
+    
     def get_chip_distribution(self):
         """
         获取筹码分布数据
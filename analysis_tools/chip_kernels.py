@@ -0,0 +1,468 @@
+# 筹码分布向量化计算模块
+# 持仓增量筹码分布的逐K线递推为:
+#     V_t = V_{t-1} * (1 - r_t) + D_t * r_t
+# 其中 r_t 为换手率乘以衰减系数，D_t 为当日筹码在价格上的分配。
+# 展开后第t根K线对最终分布的贡献为 D_t * r_t * prod(1 - r_k for k > t)，
+# 因此整段历史只需要一次反向累积乘积加一次散点累加，总计算量为 O(K线数 + 分配的价格点数 + 价格网格)。
+# 逐K线计算在每次衰减后删除小于1e-10的筹码。三角形分布在最高价处的价格点会算出负值分配：
+# 价格点为空时负值在下一根K线衰减后被删除，价格点已有筹码时与之相加并保留。
+# 这种删除是非线性的，因此收到负值分配的价格点单独按K线顺序递推，与逐K线计算一致，其余价格点线性累加。
+import numpy as np
+
+# 价格取整到网格时的容差，单位为网格间距
+_GRID_TOLERANCE = 1e-6
+
+
+def increment_turnover_rates(volume, open_interest, prev_open_interest=None):
+    """
+    向量化计算持仓增量换手率
+    与逐K线计算一致：有效换手取成交量和持仓增量绝对值的较小值，再除以当日持仓量；
+    没有前一日持仓量时使用成交量除以持仓量
+
+    Args:
+        volume: 成交量数组
+        open_interest: 持仓量数组
+        prev_open_interest: 第一根K线之前的持仓量，默认为None
+
+    Returns:
+        numpy数组: 换手率
+    """
+    volume = np.asarray(volume, dtype=float)
+    open_interest = np.asarray(open_interest, dtype=float)
+    if len(volume) == 0:
+        return np.zeros(0)
+    prev = np.empty_like(open_interest)
+    prev[1:] = open_interest[:-1]
+    prev[0] = np.nan if prev_open_interest is None else prev_open_interest
+    effective = np.minimum(volume, np.abs(open_interest - prev))
+    if prev_open_interest is None:
+        effective[0] = volume[0]
+    rates = np.zeros_like(volume)
+    np.divide(effective, open_interest, out=rates, where=open_interest > 0)
+    return rates
+
+
+def survival_weights(rates):
+    """
+    计算每根K线的筹码在之后各K线衰减后的剩余比例 prod(1 - r_k for k > t)
+    1 - r_k 不大于0时逐K线计算会清空全部历史筹码，这里对应截断为0
+
+    Args:
+        rates: 换手率乘以衰减系数后的数组，二维数组时每行单独计算
+
+    Returns:
+        tuple: (各K线的剩余比例数组, 全部K线的总剩余比例)，二维输入时总剩余比例为每行一个值的数组
+    """
+    factors = np.clip(1 - np.asarray(rates, dtype=float), 0, None)
+    if factors.shape[-1] == 0:
+        return np.zeros(factors.shape), 1.0 if factors.ndim == 1 else np.ones(factors.shape[:-1])
+    # 反向累积乘积得到 prod(k >= t)，再错开一位得到 prod(k > t)
+    suffix = np.cumprod(factors[..., ::-1], axis=-1)[..., ::-1]
+    weights = np.empty_like(suffix)
+    weights[..., :-1] = suffix[..., 1:]
+    weights[..., -1] = 1.0
+    survival = suffix[..., 0]
+    return weights, float(survival) if factors.ndim == 1 else survival
+
+
+def tick_decimals(tick):
+    """
+    价格网格间距对应的小数位数，如0.01对应2，0.5对应1，1和5对应0
+
+    Args:
+        tick: 价格网格间距
+
+    Returns:
+        int: 小数位数
+    """
+    decimals = 0
+    while decimals < 10 and abs(round(tick, decimals) - tick) > 1e-12:
+        decimals += 1
+    return decimals
+
+
+def snap_prices(prices, tick, decimals):
+    """
+    将价格对齐到价格网格，网格间距为最小变动价位
+
+    Args:
+        prices: 价格数组
+        tick: 价格网格间距
+        decimals: 价格保留的小数位数，见tick_decimals
+
+    Returns:
+        numpy数组: 对齐后的价格
+    """
+    return np.round(np.rint(np.asarray(prices, dtype=float) / tick) * tick, decimals)
+
+
+def tick_span(low, high, tick):
+    """
+    最低价到最高价覆盖的价格网格区间，最低价向下、最高价向上取整到网格
+    直接在网格序号上取区间，最低价不在网格上时各价格点也互不重复
+
+    Args:
+        low: 最低价（标量或数组）
+        high: 最高价（标量或数组）
+        tick: 价格网格间距
+
+    Returns:
+        tuple: (第一个价格点的网格序号, 价格点数量)
+    """
+    low = np.asarray(low, dtype=float)
+    high = np.asarray(high, dtype=float)
+    # 容差吸收价格除以间距时的浮点误差，网格上的价格不会被多取一格
+    first = np.floor(low / tick + _GRID_TOLERANCE).astype(np.int64)
+    last = np.ceil(high / tick - _GRID_TOLERANCE).astype(np.int64)
+    return first, np.maximum(last - first + 1, 1)
+
+
+def grid_prices(low, high, tick, decimals=None):
+    """
+    单根K线在价格网格上的全部价格点，供逐K线计算使用
+
+    Args:
+        low: 最低价
+        high: 最高价
+        tick: 价格网格间距
+        decimals: 价格保留的小数位数，默认为None（由tick计算）
+
+    Returns:
+        numpy数组: 价格点
+    """
+    first, count = tick_span(low, high, tick)
+    decimals = tick_decimals(tick) if decimals is None else decimals
+    return snap_prices(np.arange(int(first), int(first) + int(count)) * tick, tick, decimals)
+
+
+def expand_bar_prices(high, low, min_d=0.01, decimals=2):
+    """
+    将每根K线展开为其最低价到最高价之间的价格点，价格点为网格上的价格
+    与逐K线计算中的 grid_prices 一致，最高价不大于最低价时最高价取最低价加min_d
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        min_d: 价格网格间距（最小变动价位），默认为0.01
+        decimals: 价格保留的小数位数，默认为2
+
+    Returns:
+        tuple: (价格点所属K线的序号数组, 价格点数组, 调整后的最高价数组)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    high = np.where(high <= low, low + min_d, high)
+    first, counts = tick_span(low, high, min_d)
+    bar_index = np.repeat(np.arange(len(high)), counts)
+    starts = np.cumsum(counts) - counts
+    offsets = np.arange(counts.sum()) - np.repeat(starts, counts)
+    prices = snap_prices((first[bar_index] + offsets) * min_d, min_d, decimals)
+    return bar_index, prices, high
+
+
+def bar_allocations(high, low, close, volume, method='triangle', min_d=0.01, decimals=2):
+    """
+    计算每根K线的筹码在各价格点上的分配量
+    三角形分布以 (最高价 + 最低价 + 收盘价) / 3 为顶点，均匀分布平均分配成交量
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        volume: 成交量数组
+        method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+        min_d: 价格网格间距（最小变动价位），默认为0.01
+        decimals: 价格保留的小数位数，默认为2
+
+    Returns:
+        tuple: (价格点所属K线的序号数组, 价格点数组, 分配量数组)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    bar_index, prices, adjusted_high = expand_bar_prices(high, low, min_d, decimals)
+
+    if method != 'triangle':
+        counts = np.bincount(bar_index, minlength=len(high))
+        return bar_index, prices, (volume / np.maximum(counts, 1))[bar_index]
+
+    avg = (high + low + np.asarray(close, dtype=float)) / 3
+    amounts = triangle_amounts(prices, low[bar_index], adjusted_high[bar_index], avg[bar_index],
+                               volume[bar_index], min_d)
+    return bar_index, prices, amounts
+
+
+def triangle_amounts(prices, low, high, avg, volume, min_d):
+    """
+    三角形分布在各价格点上的分配量，与逐K线计算的梯形面积公式一致；最高价处的价格点可能为负值
+
+    Args:
+        prices: 价格点数组
+        low: 价格点所属K线的最低价数组
+        high: 价格点所属K线调整后的最高价数组
+        avg: 价格点所属K线的三角形顶点数组
+        volume: 价格点所属K线的成交量数组
+        min_d: 价格网格间距
+
+    Returns:
+        numpy数组: 分配量
+    """
+    h = 2 / (high - low)
+    below = prices < avg
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(below, h / (avg - low), h / (high - avg))
+        y1 = np.where(below, slope * (prices - low), slope * (high - prices))
+        y2 = np.where(below, slope * (prices + min_d - low), slope * (high - prices - min_d))
+    return min_d * (y1 + y2) / 2 * volume
+
+
+def top_allocations(high, low, close, volume, min_d=0.01, decimals=2):
+    """
+    三角形分布每根K线最高的价格点及其分配量，用于找出会收到负值分配的价格点
+
+    Returns:
+        tuple: (最高价格点数组, 分配量数组)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    adjusted_high = np.where(high <= low, low + min_d, high)
+    first, counts = tick_span(low, adjusted_high, min_d)
+    prices = snap_prices((first + counts - 1) * min_d, min_d, decimals)
+    avg = (high + low + np.asarray(close, dtype=float)) / 3
+    return prices, triangle_amounts(prices, low, adjusted_high, avg, np.asarray(volume, dtype=float), min_d)
+
+
+def replay_touched(buckets, bars, amounts, weights, bar_weights, initial, last_bar, threshold=1e-10):
+    """
+    按K线顺序递推单独处理的价格点，与逐K线计算一致：每根K线先衰减并删除小于threshold的筹码，再加上当日分配。
+    递推在折算到最后一根K线的数值上进行，两次分配之间的衰减不需要逐K线计算，
+    第t根K线时筹码量小于threshold相当于折算值小于threshold乘以weights[t]
+
+    Args:
+        buckets: 各分配所属价格点的序号数组，同一价格点的分配按K线顺序排列
+        bars: 各分配所属K线的序号数组
+        amounts: 乘以换手率之前的分配量数组
+        weights: 各衰减系数下每根K线之后的剩余比例二维数组，见survival_weights
+        bar_weights: 各衰减系数下每根K线的换手率乘以剩余比例的二维数组
+        initial: 已有筹码衰减到最后一根K线后的二维数组 (衰减系数数, 价格点数)
+        last_bar: 最后一根K线的序号
+        threshold: 删除筹码的阈值，默认为1e-10
+
+    Returns:
+        numpy数组: 各价格点在最后一根K线之后的筹码量 (衰减系数数, 价格点数)
+    """
+    values = np.array(initial, dtype=float)
+    if len(buckets) == 0:
+        return values
+    order = np.argsort(buckets, kind='stable')
+    buckets, bars, amounts = buckets[order], bars[order], amounts[order]
+    # 每个价格点内的第k次分配依赖第k-1次的结果，同一轮中各价格点互不影响，按k分轮递推
+    starts = np.searchsorted(buckets, np.arange(values.shape[1]))
+    ranks = np.arange(len(buckets)) - starts[buckets]
+    by_rank = np.argsort(ranks, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(ranks))))
+    for k in range(len(bounds) - 1):
+        events = by_rank[bounds[k]:bounds[k + 1]]
+        columns, times = buckets[events], bars[events]
+        current = values[:, columns]
+        current[current < threshold * weights[:, times]] = 0
+        values[:, columns] = current + amounts[events] * bar_weights[:, times]
+
+    # 最后一次分配之后还有K线的价格点在之后的衰减中清理
+    last = np.full(values.shape[1], last_bar)
+    last[np.unique(buckets)] = -1
+    np.maximum.at(last, buckets, bars)
+    later = np.flatnonzero(last < last_bar)
+    tail = values[:, later]
+    tail[tail < threshold] = 0
+    values[:, later] = tail
+    return values
+
+
+def replay_chips(high, low, close, volume, rates, decay_coefficients, method='triangle', min_d=0.01, decimals=2,
+                 existing=None, threshold=1e-10, chunk_points=1 << 21):
+    """
+    对多个衰减系数一次计算一段K线对筹码分布的全部贡献
+    每根K线的价格分配只计算一次，再按各衰减系数的累积衰减乘积加权累加，结果为 (衰减系数数, 价格网格) 二维数组。
+    已有筹码按剩余比例衰减、小于threshold的清零后与返回的新增筹码相加，得到与逐K线计算一致的结果；
+    收到负值分配的价格点的新增筹码中包含对已有筹码的修正。输入K线需要已去除无效K线
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        volume: 成交量数组
+        rates: 乘以衰减系数之前的换手率数组
+        decay_coefficients: 衰减系数数组
+        method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+        min_d: 价格网格间距（最小变动价位），默认为0.01
+        decimals: 价格保留的小数位数，默认为2
+        existing: 已有筹码 (二维数组, 第一列价格对应的最小变动价位序号)，默认为None（没有已有筹码）
+        threshold: 逐K线计算删除筹码的阈值，默认为1e-10
+        chunk_points: 每批展开的价格点数与衰减系数数的乘积上限，用于限制内存占用，默认为2097152
+
+    Returns:
+        tuple: (价格数组, 新增筹码量二维数组, 之前已有筹码在各衰减系数下的剩余比例数组)
+    """
+    coefficients = np.atleast_1d(np.asarray(decay_coefficients, dtype=float))
+    rates = coefficients[:, None] * np.asarray(rates, dtype=float)[None, :]
+    weights, survival = survival_weights(rates)
+    bar_weights = rates * weights
+
+    # 价格网格覆盖全部K线的价格点，以最小变动价位为单位的整数序号
+    origin = int(np.floor(low.min() / min_d)) - 1
+    size = int(np.ceil((max(high.max(), low.max() + min_d) + min_d) / min_d)) - origin + 2
+    count = len(coefficients)
+    grid = np.zeros(count * size)
+    rows = (np.arange(count) * size)[:, None]
+
+    # 三角形分布收到负值分配的价格点，按K线顺序单独递推
+    touched = np.zeros(0, dtype=np.int64)
+    if method == 'triangle':
+        top_prices, top_amounts = top_allocations(high, low, close, volume, min_d, decimals)
+        touched = np.unique(np.rint(top_prices[top_amounts < 0] / min_d).astype(np.int64) - origin)
+    is_touched = np.zeros(size, dtype=bool)
+    is_touched[touched] = True
+    events = []
+
+    # 按价格点数量分批展开，避免长历史一次性占用过多内存
+    chunk_points = max(chunk_points // count, 1)
+    counts = tick_span(low, np.where(high <= low, low + min_d, high), min_d)[1]
+    bounds = np.searchsorted(np.cumsum(counts), np.arange(chunk_points, counts.sum(), chunk_points))
+    for start, stop in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(high)]))):
+        if start >= stop:
+            continue
+        bar_index, prices, amounts = bar_allocations(high[start:stop], low[start:stop], close[start:stop],
+                                                     volume[start:stop], method, min_d, decimals)
+        ticks = np.rint(prices / min_d).astype(np.int64) - origin
+        separate = is_touched[ticks]
+        if separate.any():
+            events.append((np.searchsorted(touched, ticks[separate]), bar_index[separate] + start,
+                           amounts[separate]))
+            # 其余价格点上的负值只来自舍入误差
+            amounts = np.where(separate, 0, np.maximum(amounts, 0))
+        # 当日分配只计算一次，按各衰减系数的权重广播后一次散点累加
+        grid += np.bincount((rows + ticks).ravel(),
+                            weights=(amounts * bar_weights[:, start:stop][:, bar_index]).ravel(),
+                            minlength=count * size)
+    grid = grid.reshape(count, size)
+
+    if len(touched):
+        # 已有筹码衰减到最后一根K线，调用方按同样的方式清理后与新增筹码相加
+        initial = np.zeros((count, len(touched)))
+        if existing is not None and existing[0].shape[1] > 0:
+            columns = touched + origin - existing[1]
+            inside = (columns >= 0) & (columns < existing[0].shape[1])
+            initial[:, inside] = existing[0][:, columns[inside]]
+        initial *= np.asarray(survival).reshape(-1, 1)
+        base = np.where(initial < threshold, 0, initial)
+        buckets, bars, amounts = [np.concatenate(parts) for parts in zip(*events)]
+        final = replay_touched(buckets, bars, amounts, weights, bar_weights, initial, len(high) - 1, threshold)
+        grid[:, touched] = final - base
+
+    prices = snap_prices((origin + np.arange(size)) * min_d, min_d, decimals)
+    return prices, grid, survival
+
+
+def replay_increment_chips_multi(high, low, close, volume, open_interest, method='triangle', decay_coefficients=(1,),
+                                 min_d=0.01, decimals=2, prev_open_interest=None, existing=None, chunk_points=1 << 21):
+    """
+    对多个衰减系数一次计算一段K线对持仓增量筹码分布的全部贡献
+    无效K线（任一字段为NaN）被跳过，与逐K线计算一致
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        volume: 成交量数组
+        open_interest: 持仓量数组
+        method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+        decay_coefficients: 衰减系数数组，默认为(1,)
+        min_d: 价格网格间距（最小变动价位），默认为0.01
+        decimals: 价格保留的小数位数，默认为2
+        prev_open_interest: 这段K线之前的持仓量，默认为None
+        existing: 已有筹码，见replay_chips，默认为None
+        chunk_points: 见replay_chips，默认为2097152
+
+    Returns:
+        tuple: (价格数组, 新增筹码量二维数组, 之前已有筹码的剩余比例数组, 最后一根有效K线的持仓量, 有效K线数量)
+    """
+    columns = [np.asarray(values, dtype=float) for values in (high, low, close, volume, open_interest)]
+    valid = np.logical_and.reduce([np.isfinite(values) for values in columns])
+    high, low, close, volume, open_interest = [values[valid] for values in columns]
+    count = len(np.atleast_1d(decay_coefficients))
+    if len(high) == 0:
+        return np.zeros(0), np.zeros((count, 0)), np.ones(count), prev_open_interest, 0
+
+    rates = increment_turnover_rates(volume, open_interest, prev_open_interest)
+    prices, grid, survival = replay_chips(high, low, close, volume, rates, decay_coefficients, method,
+                                          min_d, decimals, existing, chunk_points=chunk_points)
+    return prices, grid, survival, float(open_interest[-1]), len(high)
+
+
+def replay_increment_chips(high, low, close, volume, open_interest, method='triangle', decay_coefficient=1,
+                           min_d=0.01, decimals=2, prev_open_interest=None, existing=None, chunk_points=1 << 21):
+    """
+    一次计算一段K线对持仓增量筹码分布的全部贡献
+    无效K线（任一字段为NaN）被跳过，与逐K线计算一致
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        volume: 成交量数组
+        open_interest: 持仓量数组
+        method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+        decay_coefficient: 历史衰减系数，默认为1
+        min_d: 价格网格间距（最小变动价位），默认为0.01
+        decimals: 价格保留的小数位数，默认为2
+        prev_open_interest: 这段K线之前的持仓量，默认为None
+        existing: 已有筹码 (一维数组, 第一个元素价格对应的最小变动价位序号)，默认为None
+        chunk_points: 每批展开的价格点数上限，用于限制内存占用，默认为2097152
+
+    Returns:
+        tuple: (价格数组, 新增筹码量数组, 之前已有筹码的剩余比例, 最后一根有效K线的持仓量, 有效K线数量)
+    """
+    prices, grid, survival, last_oi, count = replay_increment_chips_multi(
+        high, low, close, volume, open_interest, method, [decay_coefficient], min_d, decimals,
+        prev_open_interest, None if existing is None else (np.asarray(existing[0])[None, :], existing[1]),
+        chunk_points)
+    return prices, grid[0], float(survival[0]), last_oi, count
+
+
+def merge_chip_grid(grid, origin, survival, values, values_origin, threshold=1e-10):
+    """
+    将已有筹码网格按剩余比例衰减并清理小于threshold的筹码量后与新增筹码合并，去掉两端没有筹码的价格。
+    与逐K线计算一样只在衰减后清理，新增筹码见replay_chips
+
+    Args:
+        grid: 已有筹码二维数组 (行数, 价格网格)
+        origin: grid第一列价格对应的最小变动价位序号
+        survival: 各行已有筹码的剩余比例数组
+        values: 新增筹码二维数组，行数与grid相同
+        values_origin: values第一列价格对应的最小变动价位序号
+        threshold: 清理阈值，默认为1e-10
+
+    Returns:
+        tuple: (合并后的float64二维数组, 第一列价格对应的最小变动价位序号)
+    """
+    if grid.shape[1] == 0:
+        merged = np.array(values, dtype=float)
+        origin = values_origin
+    else:
+        # 合并已有网格和新增筹码的价格范围
+        start = min(origin, values_origin)
+        stop = max(origin + grid.shape[1], values_origin + values.shape[1])
+        merged = np.zeros((grid.shape[0], stop - start))
+        decayed = grid * np.asarray(survival)[:, None]
+        # 清理接近零的筹码量
+        decayed[decayed < threshold] = 0
+        merged[:, origin - start:origin - start + grid.shape[1]] = decayed
+        merged[:, values_origin - start:values_origin - start + values.shape[1]] += values
+        origin = start
+
+    # 去掉两端没有筹码的价格
+    occupied = np.flatnonzero(merged.any(axis=0))
+    if len(occupied) == 0:
+        return np.zeros((merged.shape[0], 0)), origin
+    return merged[:, occupied[0]:occupied[-1] + 1], origin + int(occupied[0])
@@ -0,0 +1,128 @@
+# 筹码分布绘图模块
+import os
+import numpy as np
+
+
+def chip_arrays(chip):
+    """
+    将筹码分布对象的数据转换为按价格排序的numpy数组
+
+    Args:
+        chip: 筹码分布对象，需要有price_vol字典属性
+
+    Returns:
+        tuple: (价格数组, 筹码量数组)
+    """
+    count = len(chip.price_vol)
+    prices = np.fromiter(chip.price_vol.keys(), dtype=float, count=count)
+    volumes = np.fromiter(chip.price_vol.values(), dtype=float, count=count)
+    order = np.argsort(prices)
+    return prices[order], volumes[order]
+
+
+def bin_chip_distribution(prices, volumes, max_bins=1000, price_step=None):
+    """
+    将筹码分布合并到不超过max_bins个价格区间
+
+    Args:
+        prices: 价格数组
+        volumes: 筹码量数组
+        max_bins: 最大区间数，通常取图像宽度的像素数
+        price_step: 原始价格精度，用于确定最后一个区间的右边界，默认为None（按相邻价格差估计）
+
+    Returns:
+        tuple: (区间边界数组, 各区间筹码量数组)，边界数组比筹码量数组多一个元素
+    """
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    if len(prices) == 0:
+        return np.zeros(1), np.zeros(0)
+
+    if price_step is None:
+        diffs = np.diff(np.unique(prices))
+        price_step = diffs.min() if len(diffs) else 1.0
+    low = prices.min()
+    high = prices.max() + price_step
+    n_bins = int(min(max_bins, max(1, round((high - low) / price_step))))
+    edges = np.linspace(low, high, n_bins + 1)
+    values, _ = np.histogram(prices, bins=edges, weights=volumes)
+    return edges, values
+
+
+def plot_chip_distribution_fast(prices, volumes, current_price=None, ax=None, max_bins=None,
+                                price_step=None, title='筹码分布图'):
+    """
+    绘制筹码分布图
+    先按像素分辨率合并价格区间，再用一个阶梯填充图形绘制，避免每个价格一个矩形
+
+    Args:
+        prices: 价格数组
+        volumes: 筹码量数组
+        current_price: 当前价格，如果提供则会在图中标记当前价格线和获利比例
+        ax: matplotlib坐标轴，默认为None（使用当前坐标轴）
+        max_bins: 最大区间数，默认为None（取坐标轴宽度的像素数）
+        price_step: 原始价格精度，默认为None
+        title: 图表标题
+
+    Returns:
+        matplotlib坐标轴
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    if max_bins is None:
+        max_bins = max(int(ax.bbox.width), 1)
+
+    edges, values = bin_chip_distribution(prices, volumes, max_bins, price_step)
+    # 阶梯填充为单个多边形集合，绘制开销与价格区间数量无关
+    ax.fill_between(edges, np.append(values, values[-1:]), step='post', alpha=0.7)
+    ax.set_xlabel('价格')
+    ax.set_ylabel('筹码量')
+    ax.set_title(title)
+
+    if current_price:
+        prices = np.asarray(prices, dtype=float)
+        volumes = np.asarray(volumes, dtype=float)
+        total_chips = volumes.sum()
+        profit_ratio = volumes[prices < current_price].sum() / total_chips if total_chips else 0
+        ax.axvline(x=current_price, color='r', linestyle='--', label=f'当前价格: {current_price}')
+        ax.text(current_price, values.max() * 0.9 if len(values) else 0, f'获利比例: {profit_ratio:.2%}',
+                bbox=dict(facecolor='white', alpha=0.5))
+        ax.legend()
+
+    ax.grid(True, alpha=0.3)
+    return ax
+
+
+def render_chip_charts(charts, output_dir, figsize=(12, 6), dpi=100):
+    """
+    批量渲染筹码分布图为PNG文件
+    使用Agg画布直接渲染，不依赖图形界面，所有图表复用同一个Figure
+
+    Args:
+        charts: 可迭代对象，每个元素为 (名称, 价格数组, 筹码量数组, 当前价格)，当前价格可以为None
+        output_dir: 输出目录
+        figsize: 图像尺寸（英寸），默认为(12, 6)
+        dpi: 分辨率，默认为100
+
+    Returns:
+        list: 生成的PNG文件路径
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    os.makedirs(output_dir, exist_ok=True)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    max_bins = max(int(ax.bbox.width), 1)
+
+    paths = []
+    for name, prices, volumes, current_price in charts:
+        ax.clear()
+        plot_chip_distribution_fast(prices, volumes, current_price, ax=ax, max_bins=max_bins,
+                                    title=f'{name} 筹码分布图')
+        path = os.path.join(output_dir, f'{name}.png')
+        fig.savefig(path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,214 @@
+# 多品种筹码分布截面筛选模块
+# 将多个品种的持仓增量筹码分布保存在同一个二维数组中，每行一个品种，
+# 每个品种有自己的价格网格起点和最小变动价位，逐K线批量更新，并一次查询全部品种的获利比例和成本分位。
+import numpy as np
+from analysis_tools.chip_kernels import bar_allocations, tick_decimals
+
+
+class CrossSectionalChips:
+    """
+    多品种筹码分布
+    更新规则与ChipDistributionWithIncrement逐K线计算相同：先按持仓增量换手率衰减已有筹码并清理小于1e-10的筹码，
+    再将当日筹码按三角形或均匀分布计入
+    """
+    def __init__(self, symbols, price_ticks=None, method='triangle', decay_coefficient=1, width=2048):
+        """
+        初始化多品种筹码分布
+
+        Args:
+            symbols: 品种代码列表
+            price_ticks: 各品种的价格网格间距列表，默认为None（使用各合约的最小变动价位）
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+            decay_coefficient: 历史衰减系数，默认为1
+            width: 初始价格网格宽度（格数），价格超出范围时自动平移或扩大，默认为2048
+        """
+        self.symbols = list(symbols)
+        if price_ticks is None:
+            from framework.contracts import get_contract_spec
+            price_ticks = [get_contract_spec(symbol).price_tick for symbol in self.symbols]
+        self.price_ticks = np.asarray(price_ticks, dtype=float)
+        if len(self.price_ticks) != len(self.symbols):
+            raise ValueError("price_ticks的长度需要与symbols一致")
+        self.method = method
+        self.decay_coefficient = decay_coefficient
+        count = len(self.symbols)
+        # 筹码网格，第s行第j列对应价格 (origins[s] + j) * price_ticks[s]
+        self.grid = np.zeros((count, width))
+        self.origins = np.zeros(count, dtype=np.int64)
+        self.initialized = np.zeros(count, dtype=bool)
+        self.prev_open_interest = np.full(count, np.nan)
+        self.bar_counts = np.zeros(count, dtype=np.int64)
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @property
+    def width(self):
+        return self.grid.shape[1]
+
+    def update(self, high, low, close, volume, open_interest):
+        """
+        用每个品种的一根K线批量更新筹码分布
+        任一字段为NaN的品种本次不更新
+
+        Args:
+            high: 各品种最高价数组
+            low: 各品种最低价数组
+            close: 各品种收盘价数组
+            volume: 各品种成交量数组
+            open_interest: 各品种持仓量数组
+
+        Returns:
+            numpy布尔数组: 各品种是否已更新
+        """
+        columns = [np.asarray(values, dtype=float) for values in (high, low, close, volume, open_interest)]
+        valid = np.logical_and.reduce([np.isfinite(values) for values in columns])
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            return valid
+        high, low, close, volume, open_interest = [values[rows] for values in columns]
+        ticks = self.price_ticks[rows]
+
+        # 持仓增量换手率，没有前一根K线持仓量时使用成交量除以持仓量
+        prev = self.prev_open_interest[rows]
+        effective = np.where(np.isnan(prev), volume, np.minimum(volume, np.abs(open_interest - prev)))
+        rates = np.zeros(len(rows))
+        np.divide(effective, open_interest, out=rates, where=open_interest > 0)
+        rates *= self.decay_coefficient
+        self.prev_open_interest[rows] = open_interest
+
+        # 衰减已有筹码并清理接近零的筹码
+        block = self.grid[rows] * (1 - rates)[:, None]
+        block[block < 1e-10] = 0
+        self.grid[rows] = block
+
+        # 网格范围覆盖最低价到最高价，逐K线计算的价格序列可能比最高价多出一格
+        low_ticks = np.rint(low / ticks).astype(np.int64)
+        high_ticks = np.rint(np.maximum(high, low + ticks) / ticks).astype(np.int64) + 1
+        self._ensure_range(rows, low_ticks, high_ticks)
+
+        # 最小变动价位相同的品种一起计算分配量
+        deposits = np.zeros(self.grid.size)
+        for tick in np.unique(ticks):
+            group = np.flatnonzero(ticks == tick)
+            bar_index, prices, amounts = bar_allocations(high[group], low[group], close[group], volume[group],
+                                                         self.method, tick, tick_decimals(tick))
+            bar_rows = rows[group][bar_index]
+            cols = np.rint(prices / tick).astype(np.int64) - self.origins[bar_rows]
+            deposits += np.bincount(bar_rows * self.width + cols, weights=amounts * rates[group][bar_index],
+                                    minlength=self.grid.size)
+        self.grid += deposits.reshape(self.grid.shape)
+
+        self.initialized[rows] = True
+        self.bar_counts[rows] += 1
+        return valid
+
+    def _ensure_range(self, rows, low_ticks, high_ticks):
+        """
+        确保各品种的价格网格覆盖 [low_ticks, high_ticks]，必要时平移网格或扩大网格宽度
+        """
+        for row, low, high in zip(rows, low_ticks, high_ticks):
+            origin = self.origins[row]
+            if self.initialized[row] and origin <= low and high < origin + self.width:
+                continue
+            if self.initialized[row]:
+                occupied = np.flatnonzero(self.grid[row])
+                if len(occupied):
+                    low = min(low, origin + occupied[0])
+                    high = max(high, origin + occupied[-1])
+            if high - low + 1 > self.width:
+                new_width = self.width
+                while high - low + 1 > new_width:
+                    new_width *= 2
+                self.grid = np.pad(self.grid, ((0, 0), (0, new_width - self.width)))
+            # 新的网格以所需范围居中
+            new_origin = low - (self.width - (high - low + 1)) // 2
+            if self.initialized[row]:
+                shifted = np.zeros(self.width)
+                shift = origin - new_origin
+                source = self.grid[row]
+                lo, hi = max(0, -shift), min(self.width, self.width - shift)
+                shifted[lo + shift:hi + shift] = source[lo:hi]
+                self.grid[row] = shifted
+            self.origins[row] = new_origin
+            self.initialized[row] = True
+
+    def metrics(self, prices, percentiles=(15, 50, 85)):
+        """
+        一次计算全部品种的获利比例和成本分位
+
+        Args:
+            prices: 各品种当前价格数组
+            percentiles: 百分位数列表，0-100之间，默认为(15, 50, 85)
+
+        Returns:
+            tuple: (获利比例数组, 成本价格数组)，成本价格数组的形状为 (品种数, 百分位数)；
+                没有筹码的品种获利比例和成本均为0
+        """
+        prices = np.asarray(prices, dtype=float)
+        cumulative = np.cumsum(self.grid, axis=1)
+        totals = cumulative[:, -1]
+        has_chips = totals > 0
+        safe_totals = np.where(has_chips, totals, 1)
+
+        # 价格严格低于当前价格的格子为获利盘
+        below = np.ceil(prices / self.price_ticks - self.origins - 1e-9)
+        below = np.clip(np.nan_to_num(below, nan=0), 0, self.width).astype(np.int64)
+        profit = np.where(below > 0, cumulative[np.arange(len(prices)), np.maximum(below - 1, 0)], 0)
+        profit_ratio = np.where(has_chips, profit / safe_totals, 0)
+
+        ratios = cumulative / safe_totals[:, None]
+        costs = np.zeros((len(self.symbols), len(percentiles)))
+        for k, percentile in enumerate(percentiles):
+            # 累计比例首次达到百分位的格子
+            idx = np.minimum((ratios < percentile / 100).sum(axis=1), self.width - 1)
+            costs[:, k] = np.where(has_chips, (self.origins + idx) * self.price_ticks, 0)
+        return profit_ratio, costs
+
+    def profit_ratio(self, prices):
+        """
+        计算全部品种的获利比例
+
+        Args:
+            prices: 各品种当前价格数组
+
+        Returns:
+            numpy数组: 获利比例
+        """
+        return self.metrics(prices, ())[0]
+
+    def cost_distribution(self, percentile):
+        """
+        计算全部品种的成本分位，COST(85)表示85%获利盘的价格
+
+        Args:
+            percentile: 百分位数，0-100之间
+
+        Returns:
+            numpy数组: 各品种对应百分位的价格
+        """
+        return self.metrics(np.full(len(self.symbols), np.nan), (percentile,))[1][:, 0]
+
+    def get_distribution(self, symbol):
+        """
+        获取单个品种的筹码分布，可直接传给chip_plotting中的绘图函数
+
+        Args:
+            symbol: 品种代码
+
+        Returns:
+            tuple: (价格数组, 筹码量数组)，只包含筹码量不为0的价格
+        """
+        row = self._index[symbol]
+        nonzero = np.flatnonzero(self.grid[row])
+        return (self.origins[row] + nonzero) * self.price_ticks[row], self.grid[row, nonzero]
+
+    def select(self, mask):
+        """
+        按布尔数组选出品种代码
+
+        Args:
+            mask: 与symbols等长的布尔数组
+
+        Returns:
+            list: 选中的品种代码
+        """
+        return [symbol for symbol, selected in zip(self.symbols, mask) if selected]
@@ -0,0 +1,232 @@
+# 多衰减系数筹码分布模块
+# 对同一段K线同时计算多个衰减系数下的持仓增量筹码分布，用于衰减系数的参数扫描和敏感性分析。
+# 各衰减系数共用同一个价格网格，筹码保存在 (衰减系数数, 价格网格) 二维数组中；
+# 每根K线的价格分配只计算一次，按各衰减系数的累积衰减乘积广播加权后一次累加。
+# 紧凑模式下网格保存为float32，默认不保存残差，n次更新后相对误差最坏为 n * 2**-24，精度见framework.compact。
+import numpy as np
+from framework.event_journal import get_journal
+from framework.compact import compensated_store, compensated_values
+from analysis_tools.chip_kernels import merge_chip_grid, replay_increment_chips_multi, snap_prices, tick_decimals
+
+
+class DecaySweepChips:
+    """
+    多衰减系数持仓增量筹码分布
+    每一行的结果与对应衰减系数的ChipDistributionWithIncrement向量化计算一致
+    """
+    def __init__(self, decay_coefficients, price_tick=0.01, method='triangle', compact=False, compensated=False):
+        """
+        初始化多衰减系数筹码分布
+
+        Args:
+            decay_coefficients: 衰减系数列表
+            price_tick: 价格网格间距，期货应使用合约的最小变动价位，默认为0.01
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+            compact: 是否以float32保存筹码网格，默认为False
+            compensated: 紧凑模式下是否另存float32值与float64结果之差（float32残差），默认为False。
+                不保存残差时n次更新后相对误差最坏为 n * 2**-24；保存后每个价格与float64一样占8字节
+        """
+        self.decay_coefficients = np.atleast_1d(np.asarray(decay_coefficients, dtype=float))
+        if len(self.decay_coefficients) == 0:
+            raise ValueError("衰减系数列表不能为空")
+        self.price_precision = price_tick
+        self.price_decimals = tick_decimals(price_tick)
+        self.method = method
+        self.compact = compact
+        self.compensated = compensated
+        self.reset()
+
+    def reset(self):
+        """
+        清空全部筹码分布
+        """
+        # 筹码网格，第k行第j列对应衰减系数k在价格 (origin + j) * price_tick 处的筹码量
+        self.grid = np.zeros((len(self.decay_coefficients), 0), dtype=np.float32 if self.compact else float)
+        # 紧凑模式下float32网格的舍入误差，筹码量为grid + residual
+        self.residual = None
+        self.origin = 0
+        self.prev_open_interest = None
+        self.bar_count = 0
+
+    def __len__(self):
+        """
+        衰减系数数量
+        """
+        return len(self.decay_coefficients)
+
+    @property
+    def prices(self):
+        """
+        价格网格
+        """
+        return snap_prices((self.origin + np.arange(self.grid.shape[1])) * self.price_precision,
+                           self.price_precision, self.price_decimals)
+
+    @property
+    def values(self):
+        """
+        float64筹码网格，紧凑模式下保存残差时为float32值加残差
+        """
+        if not self.compact:
+            return self.grid
+        return compensated_values(self.grid, self.residual)
+
+    @property
+    def nbytes(self):
+        """
+        筹码网格占用的字节数
+        """
+        return self.grid.nbytes + (self.residual.nbytes if self.residual is not None else 0)
+
+    def calculate_from_klines(self, klines):
+        """
+        从K线数据计算全部衰减系数的筹码分布
+
+        Args:
+            klines: K线数据，pandas.DataFrame格式，需要包含high, low, close, volume, open_interest字段
+        """
+        if klines is None or len(klines) == 0:
+            get_journal().warning("chip", "K线数据为空，无法计算筹码分布")
+            return
+        for col in ['high', 'low', 'close', 'volume', 'open_interest']:
+            if col not in klines.columns:
+                get_journal().warning("chip", "K线数据缺少必要的列: {column}", column=col)
+                return
+
+        self.reset()
+        self.replay_bars(klines['high'].to_numpy(), klines['low'].to_numpy(), klines['close'].to_numpy(),
+                         klines['volume'].to_numpy(), klines['open_interest'].to_numpy())
+
+    def replay_bars(self, high, low, close, volume, open_interest):
+        """
+        一次计入多根K线，已有筹码按各衰减系数的剩余比例衰减后与新增筹码合并
+
+        Args:
+            high: 最高价数组
+            low: 最低价数组
+            close: 收盘价数组
+            volume: 成交量数组
+            open_interest: 持仓量数组
+
+        Returns:
+            int: 计入的有效K线数量
+        """
+        existing = self.values
+        prices, values, survival, last_oi, count = replay_increment_chips_multi(
+            high, low, close, volume, open_interest, self.method, self.decay_coefficients,
+            min_d=self.price_precision, decimals=self.price_decimals,
+            prev_open_interest=self.prev_open_interest, existing=(existing, self.origin))
+        if count == 0:
+            return 0
+
+        grid, self.origin = merge_chip_grid(existing, self.origin, survival, values,
+                                            int(np.rint(prices[0] / self.price_precision)))
+        if self.compact:
+            # 在float64中合并后写回float32，舍入误差留到下一次合并时加回
+            self.grid, self.residual = compensated_store(grid, self.compensated)
+        else:
+            self.grid = grid
+        self.prev_open_interest = last_oi
+        self.bar_count += count
+        return count
+
+    def update_bar(self, high, low, close, volume, open_interest):
+        """
+        使用一根K线更新全部衰减系数的筹码分布
+
+        Returns:
+            bool: 数据有效并已更新时返回True
+        """
+        return self.replay_bars(np.array([high]), np.array([low]), np.array([close]), np.array([volume]),
+                                np.array([open_interest])) > 0
+
+    def metrics(self, price, percentiles=(15, 50, 85)):
+        """
+        一次计算全部衰减系数下的获利比例和成本分位
+
+        Args:
+            price: 当前价格
+            percentiles: 百分位数列表，0-100之间，默认为(15, 50, 85)
+
+        Returns:
+            tuple: (获利比例数组, 成本价格数组)，成本价格数组的形状为 (衰减系数数, 百分位数)；
+                没有筹码时获利比例和成本均为0
+        """
+        count = len(self)
+        if self.grid.shape[1] == 0:
+            return np.zeros(count), np.zeros((count, len(percentiles)))
+        prices = self.prices
+        cumulative = np.cumsum(self.values, axis=1)
+        totals = cumulative[:, -1]
+        has_chips = totals > 0
+        safe_totals = np.where(has_chips, totals, 1)
+
+        # 价格严格低于当前价格的格子为获利盘
+        below = np.searchsorted(prices, price, side='left')
+        profit = cumulative[:, below - 1] if below > 0 else np.zeros(count)
+        profit_ratio = np.where(has_chips, profit / safe_totals, 0)
+
+        ratios = cumulative / safe_totals[:, None]
+        costs = np.zeros((count, len(percentiles)))
+        for k, percentile in enumerate(percentiles):
+            # 累计比例首次达到百分位的格子
+            idx = np.minimum((ratios < percentile / 100).sum(axis=1), len(prices) - 1)
+            costs[:, k] = np.where(has_chips, prices[idx], 0)
+        return profit_ratio, costs
+
+    def profit_ratio(self, price):
+        """
+        计算全部衰减系数下的获利比例
+
+        Args:
+            price: 当前价格
+
+        Returns:
+            numpy数组: 获利比例
+        """
+        return self.metrics(price, ())[0]
+
+    def cost_distribution(self, percentile):
+        """
+        计算全部衰减系数下的成本分位，COST(85)表示85%获利盘的价格
+
+        Args:
+            percentile: 百分位数，0-100之间
+
+        Returns:
+            numpy数组: 各衰减系数对应百分位的价格
+        """
+        return self.metrics(np.nan, (percentile,))[1][:, 0]
+
+    def get_distribution(self, index):
+        """
+        获取单个衰减系数的筹码分布，可直接传给chip_plotting中的绘图函数
+
+        Args:
+            index: 衰减系数在decay_coefficients中的序号
+
+        Returns:
+            tuple: (价格数组, 筹码量数组)，只包含筹码量不为0的价格
+        """
+        values = self.values[index]
+        nonzero = np.flatnonzero(values)
+        return self.prices[nonzero], values[nonzero]
+
+    def to_chip(self, index):
+        """
+        将单个衰减系数的筹码分布转换为ChipDistributionWithIncrement，可继续逐K线更新或使用其绘图方法
+
+        Args:
+            index: 衰减系数在decay_coefficients中的序号
+
+        Returns:
+            ChipDistributionWithIncrement实例
+        """
+        from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+
+        chip = ChipDistributionWithIncrement(price_tick=self.price_precision)
+        chip.decay_coefficient = float(self.decay_coefficients[index])
+        chip.prev_open_interest = self.prev_open_interest
+        prices, volumes = self.get_distribution(index)
+        chip.price_vol = dict(zip(prices.tolist(), volumes.tolist()))
+        return chip
@@ -0,0 +1,228 @@
+# 滑动窗口成交量分布模块
+# 与筹码分布的衰减模型不同，成交量分布只统计最近N根K线（或当前交易时段）的成交量，窗口外的K线完全移出。
+# 每根K线的分配量保存在环形缓冲区中，新K线计入时减去被移出K线的分配量、加上新K线的分配量，
+# 每次更新的计算量只与K线的价格跨度有关，与窗口长度无关。
+import numpy as np
+from analysis_tools.chip_kernels import bar_allocations, tick_decimals
+
+
+class WindowedVolumeProfile:
+    """
+    滑动窗口成交量分布
+    每根K线的成交量按三角形或均匀分布分配到价格网格上，与筹码分布使用同一套分配算法
+    """
+    def __init__(self, window=20, method='triangle', price_tick=0.01, width=1024, rebuild_interval=1000):
+        """
+        初始化成交量分布
+
+        Args:
+            window: 窗口长度（K线数），默认为20；为None时不移出K线，直到调用reset（按交易时段统计）
+            method: 分布算法，'triangle'为三角形分布，'even'为均匀分布
+            price_tick: 价格网格间距，默认为0.01
+            width: 初始价格网格宽度（格数），价格超出范围时自动平移或扩大，默认为1024
+            rebuild_interval: 每隔多少次更新由缓冲区重建网格，消除反复加减的舍入误差，默认为1000
+        """
+        if window is not None and window < 1:
+            raise ValueError("窗口长度需要大于0")
+        self.window = window
+        self.method = method
+        self.price_tick = price_tick
+        self.decimals = tick_decimals(price_tick)
+        self.rebuild_interval = rebuild_interval
+        self._initial_width = width
+        self.reset()
+
+    def reset(self):
+        """
+        清空成交量分布，按交易时段统计时在新时段开始前调用
+        """
+        # 网格第j格对应价格 (origin + j) * price_tick
+        self.grid = np.zeros(self._initial_width)
+        self.origin = 0
+        # 窗口内各K线的分配，(价格格序号数组, 分配量数组)
+        self._deposits = [None] * self.window if self.window is not None else []
+        self._pos = 0
+        self.bar_count = 0
+        self._updates = 0
+
+    def __len__(self):
+        """
+        窗口内的K线数量
+        """
+        return self.bar_count
+
+    def update(self, high, low, close, volume, new_session=False):
+        """
+        计入一根K线，窗口已满时移出最早的一根
+
+        Args:
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+            volume: 成交量
+            new_session: 是否为新交易时段的第一根K线，为True时先清空分布，默认为False
+
+        Returns:
+            bool: 数据有效并已更新时返回True
+        """
+        if new_session:
+            self.reset()
+        if np.isnan(high) or np.isnan(low) or np.isnan(close) or np.isnan(volume):
+            return False
+
+        tick = self.price_tick
+        _, prices, amounts = bar_allocations(np.array([high]), np.array([low]), np.array([close]),
+                                             np.array([volume]), self.method, tick, self.decimals)
+        # 三角形分布在最高价处可能算出负值，成交量不能为负；
+        # 网格较粗时三角形的分段面积之和不等于成交量，按比例缩放使每根K线正好分配其成交量
+        amounts = np.maximum(amounts, 0)
+        total = amounts.sum()
+        if total > 0:
+            amounts = amounts * (volume / total)
+        ticks = np.rint(prices / tick).astype(np.int64)
+        self._ensure_range(ticks[0], ticks[-1])
+
+        if self.window is not None:
+            evicted = self._deposits[self._pos]
+            if evicted is not None:
+                np.subtract.at(self.grid, evicted[0] - self.origin, evicted[1])
+                self.bar_count -= 1
+            self._deposits[self._pos] = (ticks, amounts)
+            self._pos = (self._pos + 1) % self.window
+        else:
+            self._deposits.append((ticks, amounts))
+        # 价格点重复时花式索引的 += 只生效一次，用 np.add.at 逐个累加
+        np.add.at(self.grid, ticks - self.origin, amounts)
+        self.bar_count += 1
+
+        self._updates += 1
+        if self._updates >= self.rebuild_interval:
+            self._rebuild()
+        return True
+
+    def replay_bars(self, high, low, close, volume):
+        """
+        依次计入多根K线
+
+        Returns:
+            int: 计入的有效K线数量
+        """
+        return sum(self.update(h, l, c, v) for h, l, c, v in zip(high, low, close, volume))
+
+    def _ensure_range(self, low, high):
+        """
+        确保价格网格覆盖 [low, high] 格，必要时平移网格或扩大网格宽度
+        """
+        width = len(self.grid)
+        if self.bar_count > 0 and self.origin <= low and high < self.origin + width:
+            return
+        if self.bar_count > 0:
+            occupied = [(ticks[0], ticks[-1]) for ticks, _ in self._live_deposits()]
+            low = min(low, min(start for start, _ in occupied))
+            high = max(high, max(end for _, end in occupied))
+        new_width = width
+        while high - low + 1 > new_width:
+            new_width *= 2
+        # 新的网格以所需范围居中
+        new_origin = low - (new_width - (high - low + 1)) // 2
+        grid = np.zeros(new_width)
+        if self.bar_count > 0:
+            shift = self.origin - new_origin
+            lo, hi = max(0, -shift), min(width, new_width - shift)
+            grid[lo + shift:hi + shift] = self.grid[lo:hi]
+        self.grid = grid
+        self.origin = new_origin
+
+    def _live_deposits(self):
+        return [deposit for deposit in self._deposits if deposit is not None]
+
+    def _rebuild(self):
+        """
+        由窗口内各K线的分配重新累加网格
+        """
+        self.grid[:] = 0
+        for ticks, amounts in self._live_deposits():
+            np.add.at(self.grid, ticks - self.origin, amounts)
+        self._updates = 0
+
+    def get_distribution(self):
+        """
+        获取成交量分布，可直接传给chip_plotting中的绘图函数
+
+        Returns:
+            tuple: (价格数组, 成交量数组)，只包含成交量大于0的价格
+        """
+        nonzero = np.flatnonzero(self.grid > 1e-10)
+        prices = np.round((self.origin + nonzero) * self.price_tick, self.decimals)
+        return prices, self.grid[nonzero]
+
+    def get_chip_metrics(self, price, percentiles):
+        """
+        一次计算获利比例（当前价格以下的成交量占比）和多个成本分位
+
+        Args:
+            price: 当前价格
+            percentiles: 百分位数列表，0-100之间
+
+        Returns:
+            tuple: (获利比例, 对应百分位的价格列表)
+        """
+        prices, volumes = self.get_distribution()
+        if len(prices) == 0:
+            return 0, [0 for _ in percentiles]
+        cumulative = np.cumsum(volumes)
+        total = cumulative[-1]
+        below = np.searchsorted(prices, price, side='left')
+        profit_ratio = cumulative[below - 1] / total if below > 0 else 0
+        ratios = cumulative / total
+        costs = [prices[min(np.searchsorted(ratios, p / 100, side='left'), len(prices) - 1)] for p in percentiles]
+        return profit_ratio, costs
+
+    def get_profit_ratio(self, price):
+        """
+        当前价格以下的成交量占比
+        """
+        return self.get_chip_metrics(price, ())[0]
+
+    def get_cost_distribution(self, percentile):
+        """
+        成交量累计占比达到百分位的价格
+        """
+        return self.get_chip_metrics(np.nan, (percentile,))[1][0]
+
+    def point_of_control(self):
+        """
+        成交量最大的价格，没有数据时返回None
+        """
+        prices, volumes = self.get_distribution()
+        if len(prices) == 0:
+            return None
+        return prices[np.argmax(volumes)]
+
+    def value_area(self, fraction=0.7):
+        """
+        价值区域: 从成交量最大的价格向两侧扩展，直到覆盖fraction比例的成交量
+
+        Args:
+            fraction: 覆盖的成交量比例，默认为0.7
+
+        Returns:
+            tuple: (区域下沿价格, 区域上沿价格)，没有数据时返回(None, None)
+        """
+        prices, volumes = self.get_distribution()
+        if len(prices) == 0:
+            return None, None
+        target = volumes.sum() * fraction
+        lo = hi = int(np.argmax(volumes))
+        covered = volumes[lo]
+        while covered < target and (lo > 0 or hi < len(volumes) - 1):
+            # 每次向成交量较大的一侧扩展一格
+            below = volumes[lo - 1] if lo > 0 else -1
+            above = volumes[hi + 1] if hi < len(volumes) - 1 else -1
+            if above >= below:
+                hi += 1
+                covered += above
+            else:
+                lo -= 1
+                covered += below
+        return prices[lo], prices[hi]
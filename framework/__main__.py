@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+命令行入口
+
+    python -m framework jobs.yaml --workers 4 --store data
+"""
+
+import argparse
+import sys
+from framework.batch_runner import load_job_spec, run_jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m framework", description="批量运行回测和筹码分布任务")
+    parser.add_argument("spec", help="YAML/JSON任务文件")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认使用任务文件中的workers或CPU核数")
+    parser.add_argument("--store", default=None, help="本地存储目录，默认使用任务文件中的store或data")
+    parser.add_argument("--no-resume", action="store_true", help="重新运行已完成的任务")
+    args = parser.parse_args(argv)
+
+    spec = load_job_spec(args.spec)
+    status = run_jobs(spec, workers=args.workers, resume=not args.no_resume, store_root=args.store)
+    return 1 if "failed" in status.values() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量任务运行模块
+读取YAML/JSON任务文件，将回测和筹码分布任务按合约展开后并行运行，结果写入本地存储。
+已完成的任务会被跳过，中断后重新运行同一任务文件即可继续。
+
+任务文件示例:
+
+    store: data
+    workers: 4
+    cache: {root: data/cache, max_bytes: 1073741824}
+    defaults:
+      start_date: "2023-01-01"
+      end_date: "2023-12-31"
+    jobs:
+      - type: backtest
+        strategy: strategies.moving_average_strategy.MovingAverageStrategy
+        params: {short_period: 5, long_period: 20}
+        symbols: [CZCE.FG401, SHFE.rb2401]
+      - type: chip
+        symbols: [CZCE.FG401]
+        methods: [triangle, even]
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from framework.event_journal import get_journal, configure_journal, reset_journal
+from framework.local_store import LocalStore
+from framework.contracts import resolve_price_tick
+
+# 各类任务的默认参数
+JOB_DEFAULTS = {
+    "backtest": {
+        "params": {},
+        "start_date": None,
+        "end_date": None,
+        "initial_capital": 100000,
+        "kline_period": 86400,
+        "mode": "offline",
+        "save_journal": True,
+    },
+    "chip": {
+        "start_date": None,
+        "end_date": None,
+        "kline_period": 86400,
+        "model": "increment",
+        "decay_coefficient": 1,
+        "price_tick": None,
+        "percentiles": [15, 50, 85],
+        "render": False,
+    },
+}
+
+
+def load_job_spec(path):
+    """
+    读取任务文件
+
+    Args:
+        path: 任务文件路径，扩展名为 .yaml/.yml 时按YAML解析，否则按JSON解析
+
+    Returns:
+        dict: 任务配置
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("读取YAML任务文件需要安装PyYAML，也可以改用JSON格式")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs"), list):
+        raise ValueError("任务文件需要包含jobs列表")
+    return spec
+
+
+def make_job_id(job):
+    """
+    根据任务内容生成任务编号，相同内容的任务编号相同
+
+    Args:
+        job: 展开后的单个任务
+
+    Returns:
+        str: 任务编号，如 'backtest-MovingAverageStrategy-CZCE.FG401-1a2b3c4d5e'
+    """
+    digest = hashlib.sha1(json.dumps(job, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:10]
+    if job["type"] == "backtest":
+        name = job["strategy"].rsplit(".", 1)[-1]
+    else:
+        name = f"{job['model']}_{job['method']}"
+    return f"{job['type']}-{name}-{job['symbol']}-{digest}"
+
+
+def expand_jobs(spec):
+    """
+    将任务文件展开为单个合约、单个算法的任务列表
+
+    Args:
+        spec: 任务配置
+
+    Returns:
+        list: (任务编号, 任务) 列表
+    """
+    defaults = spec.get("defaults", {})
+    jobs = []
+    for entry in spec["jobs"]:
+        job_type = entry.get("type", "backtest")
+        if job_type not in JOB_DEFAULTS:
+            raise ValueError(f"不支持的任务类型: {job_type}")
+        base = dict(JOB_DEFAULTS[job_type])
+        base.update({key: value for key, value in defaults.items() if key in base})
+        base.update(entry)
+        base["type"] = job_type
+        if job_type == "backtest" and not base.get("strategy"):
+            raise ValueError("回测任务需要指定strategy")
+
+        symbols = base.pop("symbols", None) or [base.pop("symbol", None)]
+        if symbols == [None]:
+            raise ValueError("任务需要指定symbols或symbol")
+        methods = [None]
+        if job_type == "chip":
+            methods = base.pop("methods", None) or [base.pop("method", "triangle")]
+
+        for symbol in symbols:
+            for method in methods:
+                job = dict(base, symbol=symbol)
+                if method is not None:
+                    job["method"] = method
+                jobs.append((make_job_id(job), job))
+    return jobs
+
+
+def load_strategy_class(path):
+    """
+    按 '模块.类名' 导入策略类
+    """
+    module_name, _, class_name = path.rpartition(".")
+    if not module_name:
+        raise ValueError(f"策略路径需要为 '模块.类名' 格式: {path}")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def run_backtest_job(job, store, job_id, cache=None):
+    """
+    运行单个回测任务
+
+    Returns:
+        dict: 回测结果
+    """
+    from framework.quant_framework import QuantFramework
+
+    strategy = load_strategy_class(job["strategy"])(**job["params"])
+    framework = QuantFramework()
+    framework.set_strategy(strategy)
+
+    if job["mode"] == "tqsdk":
+        # 天勤账户从环境变量读取，避免写入任务文件
+        framework.initialize(job["symbol"], job["start_date"], job["end_date"], job["initial_capital"],
+                             os.environ.get("TQ_ACCOUNT"), os.environ.get("TQ_PASSWORD"))
+        framework.run_backtest()
+        return framework.get_results()
+
+    klines = store.load_klines(job["symbol"], job["kline_period"])
+    framework.initialize(job["symbol"], job["start_date"], job["end_date"], job["initial_capital"])
+    if job["save_journal"]:
+        from framework.trade_journal import TradeJournal
+        strategy.attach_trade_journal(TradeJournal(
+            os.path.join(store.result_dir(job_id), "journal"),
+            metadata={"symbol": job["symbol"], "strategy": job["strategy"], "params": job["params"]},
+        ))
+    return framework.run_offline_backtest(klines, cache=cache)
+
+
+def run_chip_job(job, store, job_id, cache=None):
+    """
+    运行单个筹码分布任务
+
+    Returns:
+        dict: 最新收盘价、获利比例和成本分布
+    """
+    klines = store.load_klines(job["symbol"], job["kline_period"], job["start_date"], job["end_date"])
+    if job["model"] == "increment":
+        from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement as chip_class
+    elif job["model"] == "turnover":
+        from analysis_tools.chip_distribution import ChipDistribution as chip_class
+    else:
+        raise ValueError(f"不支持的筹码分布模型: {job['model']}")
+
+    # 未指定价格网格间距时使用合约的最小变动价位
+    price_tick = job["price_tick"] or resolve_price_tick(job["symbol"])
+
+    def compute(directory):
+        chip = chip_class(price_tick=price_tick)
+        chip.calculate_from_klines(klines, method=job["method"], decay_coefficient=job["decay_coefficient"])
+        price = float(klines["close"].iloc[-1]) if len(klines) else None
+        result = {
+            "bar_count": len(klines),
+            "close": price,
+            "profit_ratio": float(chip.get_profit_ratio(price)) if price is not None else 0.0,
+            "costs": {str(p): float(chip.get_cost_distribution(p)) for p in job["percentiles"]},
+        }
+        if job["render"]:
+            chip.save_chip_distribution(os.path.join(directory, "chip.png"), current_price=price)
+        return result
+
+    output_dir = store.result_dir(job_id)
+    if cache is None:
+        result = compute(output_dir)
+    else:
+        from framework.result_cache import make_cache_key, code_fingerprint
+
+        params = {key: job[key] for key in ("model", "method", "decay_coefficient", "percentiles", "render")}
+        params["price_tick"] = price_tick
+        key = make_cache_key("chip", code_fingerprint(chip_class), params, klines)
+        result = cache.get_or_compute(key, compute)
+        chart = os.path.join(cache.entry_dir(key), "chip.png")
+        if job["render"] and os.path.isfile(chart):
+            shutil.copy(chart, output_dir)
+    if job["render"]:
+        result["chart"] = os.path.join(output_dir, "chip.png")
+    return result
+
+
+JOB_RUNNERS = {
+    "backtest": run_backtest_job,
+    "chip": run_chip_job,
+}
+
+
+def make_cache(config, store_root):
+    """
+    根据任务文件中的cache配置创建结果缓存
+
+    Args:
+        config: True表示使用默认配置，字典可指定root和max_bytes，None或False表示不使用缓存
+        store_root: 本地存储根目录，缓存默认放在其下的cache目录
+
+    Returns:
+        ResultCache实例或None
+    """
+    if not config:
+        return None
+    from framework.result_cache import ResultCache
+
+    config = config if isinstance(config, dict) else {}
+    return ResultCache(config.get("root", os.path.join(store_root, "cache")),
+                       config.get("max_bytes", 1 << 30))
+
+
+def run_job(job_id, job, store_root, quiet=False, cache_config=None):
+    """
+    运行单个任务并保存结果
+
+    Args:
+        job_id: 任务编号
+        job: 任务
+        store_root: 本地存储根目录
+        quiet: 是否将事件日志写入任务目录而不输出到控制台，并行运行时使用
+        cache_config: 结果缓存配置，见make_cache，默认为None（不使用缓存）
+
+    Returns:
+        dict: 任务结果
+    """
+    store = LocalStore(store_root)
+    cache = make_cache(cache_config, store_root)
+    if quiet:
+        configure_journal(path=os.path.join(store.result_dir(job_id), "events.jsonl"), console=False)
+    started = time.time()
+    try:
+        metrics = JOB_RUNNERS[job["type"]](job, store, job_id, cache)
+    finally:
+        if quiet:
+            configure_journal(path=None, console=False)
+    result = {
+        "job_id": job_id,
+        "job": job,
+        "metrics": metrics,
+        "elapsed": round(time.time() - started, 3),
+        "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    store.save_result(job_id, result)
+    return result
+
+
+def run_jobs(spec, workers=None, resume=True, store_root=None):
+    """
+    运行任务文件中的全部任务
+
+    Args:
+        spec: 任务配置
+        workers: 并行进程数，默认为None（使用任务文件中的workers，未指定时为CPU核数）
+        resume: 是否跳过本地存储中已有结果的任务，默认为True
+        store_root: 本地存储根目录，默认为None（使用任务文件中的store，未指定时为'data'）
+
+    Returns:
+        dict: 任务编号到状态的映射，状态为 'done'、'skipped' 或 'failed'
+    """
+    journal = get_journal()
+    store_root = store_root or spec.get("store", "data")
+    workers = workers or spec.get("workers") or os.cpu_count() or 1
+    store = LocalStore(store_root)
+    cache_config = spec.get("cache")
+
+    status = {}
+    pending = []
+    for job_id, job in expand_jobs(spec):
+        if resume and store.has_result(job_id):
+            status[job_id] = "skipped"
+        else:
+            pending.append((job_id, job))
+    journal.info("batch", "共 {total} 个任务，跳过已完成 {skipped} 个，待运行 {pending} 个",
+                 total=len(status) + len(pending), skipped=len(status), pending=len(pending))
+
+    if workers == 1:
+        for job_id, job in pending:
+            status[job_id] = _run_inline(journal, job_id, job, store_root, cache_config)
+    elif pending:
+        # 子进程会继承事件日志的缓冲区和文件，先写出，避免重复写入
+        journal.flush()
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_worker) as executor:
+            futures = {executor.submit(run_job, job_id, job, store_root, True, cache_config): job_id
+                       for job_id, job in pending}
+            for future in as_completed(futures):
+                job_id = futures[future]
+                error = future.exception()
+                if error is None:
+                    status[job_id] = "done"
+                    journal.info("batch", "任务完成: {job_id}", job_id=job_id)
+                else:
+                    status[job_id] = "failed"
+                    journal.error("error", "任务失败: {job_id}: {error}", job_id=job_id, error=str(error))
+
+    journal.info("batch", "运行结束: 完成 {done} 个，跳过 {skipped} 个，失败 {failed} 个",
+                 done=sum(1 for s in status.values() if s == "done"),
+                 skipped=sum(1 for s in status.values() if s == "skipped"),
+                 failed=sum(1 for s in status.values() if s == "failed"))
+    journal.flush()
+    return status
+
+
+def _init_worker():
+    """
+    进程池子进程的初始化函数，重新创建事件日志
+    """
+    reset_journal(console=False)
+
+
+def _run_inline(journal, job_id, job, store_root, cache_config):
+    """
+    在当前进程中运行任务，返回任务状态
+    """
+    try:
+        run_job(job_id, job, store_root, cache_config=cache_config)
+    except Exception as e:
+        journal.error("error", "任务失败: {job_id}: {error}", job_id=job_id, error=str(e))
+        return "failed"
+    journal.info("batch", "任务完成: {job_id}", job_id=job_id)
+    return "done"
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+紧凑数据类型模块
+将K线数据和筹码网格转换为较小的数据类型，用于在内存中同时保存多个合约的长历史。
+
+精度说明:
+    价格: 先对齐到最小变动价位再保存为float32。float32有24位有效位，价格不超过2**22个最小变动价位时
+        误差小于1/4个价位，restore_prices可以精确还原为对齐后的float64价格；超过时compact_prices报错。
+    成交量和持仓量: 保存为int32，不超过2**31-1时没有误差；含NaN的列保存为float32，不超过2**24时没有误差，
+        否则保持float64。
+    时间: datetime保持int64纳秒时间戳。
+    筹码网格: 每次更新在float64中计算，写回float32时相对误差不超过2**-24（约6e-8）。
+        不带补偿时误差随更新次数累积，n次更新后最坏为n * 2**-24；
+        带补偿时每次更新仍在float64中累加，写回时另存float32值与float64结果之差（float32残差数组），
+        下一次更新时以float32值加残差还原float64再计算；这不是Kahan求和，只是把一个float64拆成两个float32保存，
+        还原值与float64计算结果的相对误差约为2**-48，不随更新次数增长，但每个价格占8字节。
+"""
+
+import numpy as np
+
+# K线中的价格字段和计数字段
+PRICE_FIELDS = ["open", "high", "low", "close"]
+COUNT_FIELDS = ["volume", "open_oi", "close_oi", "open_interest"]
+# float32可以精确还原的最大价位数
+MAX_PRICE_TICKS = 2 ** 22
+# float32可以精确表示的最大整数
+MAX_FLOAT32_INTEGER = 2 ** 24
+
+
+def compact_prices(values, price_tick):
+    """
+    将价格对齐到最小变动价位后转换为float32
+
+    Args:
+        values: 价格数组
+        price_tick: 最小变动价位
+
+    Returns:
+        numpy数组: float32价格
+    """
+    ticks = np.rint(np.asarray(values, dtype=float) / price_tick)
+    finite = ticks[np.isfinite(ticks)]
+    if len(finite) and np.abs(finite).max() >= MAX_PRICE_TICKS:
+        raise ValueError(f"价格超过float32可以精确还原的范围: 最小变动价位{price_tick}的{MAX_PRICE_TICKS}倍")
+    return (ticks * price_tick).astype(np.float32)
+
+
+def restore_prices(values, price_tick):
+    """
+    将float32价格还原为对齐到最小变动价位的float64价格
+
+    Args:
+        values: compact_prices转换后的价格数组
+        price_tick: 最小变动价位
+
+    Returns:
+        numpy数组: float64价格
+    """
+    from analysis_tools.chip_kernels import snap_prices, tick_decimals
+
+    return snap_prices(np.asarray(values, dtype=float), price_tick, tick_decimals(price_tick))
+
+
+def compact_counts(values):
+    """
+    将成交量、持仓量等整数字段转换为较小的数据类型
+    没有NaN时转换为int32，含NaN时转换为float32；超过可以精确表示的范围或含小数时保持原样
+
+    Args:
+        values: 数组
+
+    Returns:
+        numpy数组
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        if len(values) and (values.min() < -2 ** 31 or values.max() >= 2 ** 31):
+            return values
+        return values.astype(np.int32)
+    finite = values[np.isfinite(values)]
+    if len(finite) and (np.abs(finite).max() >= 2 ** 31 or not np.array_equal(finite, np.rint(finite))):
+        return values
+    if len(finite) == len(values):
+        return values.astype(np.int32)
+    if len(finite) and np.abs(finite).max() > MAX_FLOAT32_INTEGER:
+        return values
+    return values.astype(np.float32)
+
+
+def compact_klines(klines, price_tick=None, symbol=None):
+    """
+    将K线数据转换为紧凑数据类型：价格为float32，成交量和持仓量为int32，datetime保持int64
+
+    Args:
+        klines: K线数据，pandas.DataFrame格式
+        price_tick: 最小变动价位，默认为None（按symbol从合约参数表取得）
+        symbol: 合约代码，没有提供price_tick时使用，默认为None
+
+    Returns:
+        转换后的K线数据（副本）
+    """
+    if price_tick is None:
+        if symbol is None:
+            raise ValueError("需要提供最小变动价位或合约代码")
+        from framework.contracts import resolve_price_tick
+
+        price_tick = resolve_price_tick(symbol)
+    result = klines.copy()
+    for field in PRICE_FIELDS:
+        if field in result.columns:
+            result[field] = compact_prices(result[field].to_numpy(), price_tick)
+    for field in COUNT_FIELDS:
+        if field in result.columns:
+            result[field] = compact_counts(result[field].to_numpy())
+    return result
+
+
+def compensated_store(exact, compensated=True):
+    """
+    将float64数组拆成float32值和float32残差（float64值减去float32值）
+
+    Args:
+        exact: float64数组
+        compensated: 是否保存残差，默认为True
+
+    Returns:
+        tuple: (float32数组, float32残差数组)，不保存残差时残差数组为None
+    """
+    values = exact.astype(np.float32)
+    if not compensated:
+        return values, None
+    return values, (exact - values).astype(np.float32)
+
+
+def compensated_values(values, residual):
+    """
+    float32数组加上残差数组，还原为float64数组
+
+    Args:
+        values: float32数组
+        residual: compensated_store返回的残差数组，为None时只转换类型
+
+    Returns:
+        numpy数组: float64数组
+    """
+    result = values.astype(float)
+    if residual is not None:
+        result += residual
+    return result
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合约参数模块
+维护各交易所品种的合约乘数、最小变动价位、保证金率和手续费标准
+"""
+
+import re
+
+
+class ContractSpec:
+    """
+    合约参数
+    """
+    def __init__(self, exchange, product, multiplier=1, price_tick=0.01, margin_rate=0.1,
+                 commission_per_lot=0.0, commission_rate=0.0):
+        """
+        初始化合约参数
+
+        Args:
+            exchange: 交易所代码，如 'SHFE'
+            product: 品种代码，如 'rb'
+            multiplier: 合约乘数
+            price_tick: 最小变动价位
+            margin_rate: 保证金率
+            commission_per_lot: 按手数收取的手续费（元/手）
+            commission_rate: 按成交金额收取的手续费率
+        """
+        self.exchange = exchange
+        self.product = product
+        self.multiplier = multiplier
+        self.price_tick = price_tick
+        self.margin_rate = margin_rate
+        self.commission_per_lot = commission_per_lot
+        self.commission_rate = commission_rate
+
+    def __repr__(self):
+        return (f"ContractSpec({self.exchange}.{self.product}, multiplier={self.multiplier}, "
+                f"price_tick={self.price_tick}, margin_rate={self.margin_rate})")
+
+
+# 品种参数表: 品种代码 -> (交易所, 合约乘数, 最小变动价位, 保证金率, 每手手续费, 手续费率)
+# 数值为交易所标准参数，期货公司加收部分请通过 register_contract_spec 覆盖
+_CONTRACT_TABLE = {
+    # 郑州商品交易所
+    "FG": ("CZCE", 20, 1.0, 0.12, 6.0, 0.0),
+    "SA": ("CZCE", 20, 1.0, 0.12, 3.5, 0.0),
+    "MA": ("CZCE", 10, 1.0, 0.10, 2.0, 0.0),
+    "TA": ("CZCE", 5, 2.0, 0.08, 3.0, 0.0),
+    "SR": ("CZCE", 10, 1.0, 0.08, 3.0, 0.0),
+    "CF": ("CZCE", 5, 5.0, 0.08, 4.3, 0.0),
+    "AP": ("CZCE", 10, 1.0, 0.10, 5.0, 0.0),
+    "OI": ("CZCE", 10, 1.0, 0.09, 2.0, 0.0),
+    "RM": ("CZCE", 10, 1.0, 0.09, 1.5, 0.0),
+    # 上海期货交易所
+    "rb": ("SHFE", 10, 1.0, 0.10, 0.0, 0.0001),
+    "hc": ("SHFE", 10, 1.0, 0.10, 0.0, 0.0001),
+    "cu": ("SHFE", 5, 10.0, 0.10, 0.0, 0.00005),
+    "al": ("SHFE", 5, 5.0, 0.10, 3.0, 0.0),
+    "zn": ("SHFE", 5, 5.0, 0.10, 3.0, 0.0),
+    "ni": ("SHFE", 1, 10.0, 0.12, 3.0, 0.0),
+    "au": ("SHFE", 1000, 0.02, 0.08, 10.0, 0.0),
+    "ag": ("SHFE", 15, 1.0, 0.10, 0.0, 0.00005),
+    "ru": ("SHFE", 10, 5.0, 0.10, 3.0, 0.0),
+    "fu": ("SHFE", 10, 1.0, 0.10, 0.0, 0.00005),
+    "bu": ("SHFE", 10, 1.0, 0.10, 0.0, 0.0001),
+    # 大连商品交易所
+    "i": ("DCE", 100, 0.5, 0.13, 0.0, 0.0001),
+    "j": ("DCE", 100, 0.5, 0.20, 0.0, 0.0001),
+    "jm": ("DCE", 60, 0.5, 0.20, 0.0, 0.0001),
+    "m": ("DCE", 10, 1.0, 0.08, 1.5, 0.0),
+    "y": ("DCE", 10, 2.0, 0.08, 2.5, 0.0),
+    "p": ("DCE", 10, 2.0, 0.10, 2.5, 0.0),
+    "c": ("DCE", 10, 1.0, 0.08, 1.2, 0.0),
+    "pp": ("DCE", 5, 1.0, 0.08, 1.0, 0.0),
+    "l": ("DCE", 5, 1.0, 0.08, 1.0, 0.0),
+    "v": ("DCE", 5, 1.0, 0.08, 1.0, 0.0),
+    "eg": ("DCE", 10, 1.0, 0.08, 3.0, 0.0),
+    # 上海国际能源交易中心
+    "sc": ("INE", 1000, 0.1, 0.10, 20.0, 0.0),
+    # 中国金融期货交易所
+    "IF": ("CFFEX", 300, 0.2, 0.12, 0.0, 0.000023),
+    "IH": ("CFFEX", 300, 0.2, 0.12, 0.0, 0.000023),
+    "IC": ("CFFEX", 200, 0.2, 0.14, 0.0, 0.000023),
+    "IM": ("CFFEX", 200, 0.2, 0.14, 0.0, 0.000023),
+    "T": ("CFFEX", 10000, 0.005, 0.02, 3.0, 0.0),
+}
+
+_SPEC_CACHE = {}
+
+
+def parse_product(symbol):
+    """
+    从合约代码中解析交易所和品种代码
+
+    Args:
+        symbol: 合约代码，如 'SHFE.rb2401'、'CZCE.FG601' 或主连 'KQ.m@SHFE.rb'
+
+    Returns:
+        tuple: (交易所代码, 品种代码)
+    """
+    if "@" in symbol:
+        symbol = symbol.split("@", 1)[1]
+    if "." in symbol:
+        exchange, instrument = symbol.split(".", 1)
+    else:
+        exchange, instrument = "", symbol
+    match = re.match(r"[A-Za-z]+", instrument)
+    product = match.group(0) if match else instrument
+    return exchange, product
+
+
+def register_contract_spec(product, exchange, multiplier, price_tick, margin_rate,
+                           commission_per_lot=0.0, commission_rate=0.0):
+    """
+    注册或覆盖品种参数
+
+    Args:
+        product: 品种代码
+        exchange: 交易所代码
+        multiplier: 合约乘数
+        price_tick: 最小变动价位
+        margin_rate: 保证金率
+        commission_per_lot: 每手手续费
+        commission_rate: 手续费率
+    """
+    _CONTRACT_TABLE[product] = (exchange, multiplier, price_tick, margin_rate,
+                                commission_per_lot, commission_rate)
+    _SPEC_CACHE.clear()
+
+
+def get_contract_spec(symbol):
+    """
+    获取合约参数
+    找不到对应品种时返回乘数为1、最小变动价位为0.01的默认参数（适用于股票）
+
+    Args:
+        symbol: 合约代码
+
+    Returns:
+        ContractSpec实例
+    """
+    spec = _SPEC_CACHE.get(symbol)
+    if spec is not None:
+        return spec
+
+    exchange, product = parse_product(symbol)
+    row = _CONTRACT_TABLE.get(product)
+    if row is None:
+        # 交易所之间品种代码大小写不一致，退化为忽略大小写匹配
+        for key, value in _CONTRACT_TABLE.items():
+            if key.lower() == product.lower():
+                product, row = key, value
+                break
+
+    if row is None:
+        spec = ContractSpec(exchange, product)
+    else:
+        spec = ContractSpec(row[0], product, *row[1:])
+
+    _SPEC_CACHE[symbol] = spec
+    return spec
+
+
+def resolve_price_tick(symbol, api=None):
+    """
+    获取合约的最小变动价位
+    提供api时优先使用行情对象中的price_tick，取不到有效值时使用本地参数表
+
+    Args:
+        symbol: 合约代码
+        api: TqApi实例，默认为None（只使用本地参数表）
+
+    Returns:
+        float: 最小变动价位
+    """
+    if api is not None:
+        try:
+            tick = float(api.get_quote(symbol).price_tick)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            tick = float("nan")
+        if tick == tick and tick > 0:
+            return tick
+    return get_contract_spec(symbol).price_tick
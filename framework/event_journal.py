@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+事件日志模块
+记录信号、委托、成交和错误等结构化事件。
+交易循环中只向环形缓冲区追加一个元组，格式化和写文件由后台线程完成；
+未启用的级别对应的记录方法为空函数，不产生任何开销
+"""
+
+import atexit
+import collections
+import json
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class EventJournal:
+    """
+    结构化事件日志
+    通过 debug/info/warning/error 方法记录事件，每条事件包含事件类型、消息模板和字段，
+    后台线程将事件以JSON Lines格式写入文件，并可同时输出到控制台
+    """
+    def __init__(self, path=None, level=INFO, console=True, capacity=65536, flush_interval=0.2):
+        """
+        初始化事件日志
+
+        Args:
+            path: JSON Lines文件路径，默认为None（不写文件）
+            level: 记录级别，低于该级别的事件被忽略，默认为INFO
+            console: 是否输出到控制台，默认为True
+            capacity: 环形缓冲区容量，写入跟不上时丢弃最早的事件，默认为65536
+            flush_interval: 后台线程写出间隔，单位为秒，默认为0.2
+        """
+        self.flush_interval = flush_interval
+        self._buffer = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._file = None
+        self.configure(path, level, console)
+
+        self._thread = threading.Thread(target=self._run, name="EventJournalWriter", daemon=True)
+        self._thread.start()
+
+    def configure(self, path=None, level=INFO, console=True):
+        """
+        修改输出文件、记录级别和控制台输出，修改前先写出已缓冲的事件
+
+        Args:
+            path: JSON Lines文件路径，None表示不写文件
+            level: 记录级别
+            console: 是否输出到控制台
+        """
+        self.flush()
+        with self._lock:
+            if self._file:
+                self._file.close()
+            self.path = path
+            self.console = console
+            self._file = open(path, "a", encoding="utf-8") if path else None
+        self.set_level(level)
+
+    def set_level(self, level):
+        """
+        设置记录级别
+        未启用级别的记录方法替换为空函数
+
+        Args:
+            level: 记录级别
+        """
+        self.level = level
+        for name, value in [("debug", DEBUG), ("info", INFO), ("warning", WARNING), ("error", ERROR)]:
+            if value >= level:
+                setattr(self, name, self._make_logger(value))
+            else:
+                setattr(self, name, _noop)
+
+    def _make_logger(self, level):
+        append = self._buffer.append
+
+        def log(event, template, **fields):
+            """
+            记录一条事件
+
+            Args:
+                event: 事件类型，如 'signal'、'order'、'fill'、'error'
+                template: 消息模板，使用 str.format 语法引用字段
+                **fields: 事件字段
+            """
+            append((time.time(), level, event, template, fields))
+        return log
+
+    def is_enabled(self, level):
+        """
+        判断级别是否启用，用于跳过昂贵的字段计算
+        """
+        return level >= self.level
+
+    def flush(self):
+        """
+        将缓冲区中的事件全部写出
+        """
+        self._drain()
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        """
+        写出剩余事件并停止后台线程
+        """
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def _drain(self):
+        with self._lock:
+            buffer = self._buffer
+            while buffer:
+                timestamp, level, event, template, fields = buffer.popleft()
+                try:
+                    message = template.format(**fields)
+                except (KeyError, IndexError, ValueError) as e:
+                    message = f"{template} (格式化失败: {e})"
+                if self.console:
+                    print(message)
+                if self._file:
+                    record = {"time": timestamp, "level": LEVEL_NAMES.get(level, level),
+                              "event": event, "message": message}
+                    record.update(fields)
+                    self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+_default_journal = None
+
+
+def get_journal():
+    """
+    获取全局默认事件日志
+    默认只输出INFO及以上级别到控制台
+
+    Returns:
+        EventJournal实例
+    """
+    global _default_journal
+    if _default_journal is None:
+        _default_journal = EventJournal()
+    return _default_journal
+
+
+def configure_journal(path=None, level=INFO, console=True):
+    """
+    配置全局默认事件日志
+    已经持有默认日志的策略和框架对象会同时生效
+
+    Args:
+        path: JSON Lines文件路径，默认为None（不写文件）
+        level: 记录级别，默认为INFO
+        console: 是否输出到控制台，默认为True
+
+    Returns:
+        EventJournal实例
+    """
+    journal = get_journal()
+    journal.configure(path=path, level=level, console=console)
+    return journal
+
+
+def reset_journal(path=None, level=INFO, console=True):
+    """
+    丢弃从父进程继承的全局默认事件日志，重新创建一个
+    fork出的子进程中没有父进程的后台写出线程，继承的锁也可能正被该线程持有，
+    进程池的子进程需要在初始化时调用本函数，而不是configure_journal
+
+    Args:
+        path: JSON Lines文件路径，默认为None（不写文件）
+        level: 记录级别，默认为INFO
+        console: 是否输出到控制台，默认为True
+
+    Returns:
+        EventJournal实例
+    """
+    global _default_journal
+    inherited = _default_journal
+    _default_journal = EventJournal(path=path, level=level, console=console)
+    if inherited is not None and inherited._file:
+        # 父进程在创建进程池前已写出缓冲，这里只关闭子进程中的文件句柄
+        inherited._file.close()
+        inherited._file = None
+    return _default_journal
+
+
+@atexit.register
+def _close_default_journal():
+    if _default_journal is not None:
+        _default_journal.close()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+成交模拟模块
+为离线回测提供考虑下单延迟、买卖价差、成交量参与率以及手续费和保证金的成交模拟
+"""
+
+import numpy as np
+from framework.contracts import get_contract_spec
+
+# 成交结果的数据结构
+FILL_DTYPE = np.dtype([
+    ("order_id", np.int64),
+    ("arrival_index", np.int64),   # 委托到达交易所时对应的行情序号
+    ("fill_index", np.int64),      # 最后一笔成交所在的行情序号，未成交为-1
+    ("volume", np.int64),          # 带方向的成交手数
+    ("price", np.float64),         # 成交均价
+    ("commission", np.float64),    # 手续费
+    ("unfilled", np.int64),        # 未成交手数
+])
+
+
+class ExecutionSimulator:
+    """
+    成交模拟器
+    基于K线或Tick行情，对委托进行延迟、价差、成交量参与率限制下的撮合
+    所有撮合计算都以数组形式批量完成
+    """
+    def __init__(self, symbol, latency=0.0, participation_rate=0.1, spread_ticks=1.0,
+                 slippage_ticks=0.0, max_wait_bars=None, contract_spec=None):
+        """
+        初始化成交模拟器
+
+        Args:
+            symbol: 合约代码
+            latency: 下单延迟，单位为秒，默认为0
+            participation_rate: 每根K线（或每个Tick）最多可成交该期成交量的比例，默认为0.1
+            spread_ticks: 使用K线行情时假设的买卖价差，单位为最小变动价位，默认为1
+            slippage_ticks: 额外滑点，单位为最小变动价位，默认为0
+            max_wait_bars: 委托最多等待的行情数量，超过后未成交部分撤单，默认为None（不撤单）
+            contract_spec: 合约参数，默认为None（从合约参数表中查找）
+        """
+        self.symbol = symbol
+        self.latency = latency
+        self.participation_rate = participation_rate
+        self.spread_ticks = spread_ticks
+        self.slippage_ticks = slippage_ticks
+        self.max_wait_bars = max_wait_bars
+        self.spec = contract_spec or get_contract_spec(symbol)
+        # 行情数组
+        self.times = None
+        self.capacity = None
+        self.buy_price = None
+        self.sell_price = None
+        # 累计可成交量及累计成交金额，长度为行情数量+1，用于区间求和
+        self._cum_capacity = None
+        self._cum_buy_value = None
+        self._cum_sell_value = None
+
+    def load_market_data(self, data):
+        """
+        载入行情数据
+        包含 ask_price1/bid_price1 字段时按Tick处理，以对手价成交；否则按K线处理，以开盘价加减半个价差成交
+
+        Args:
+            data: 行情数据，pandas.DataFrame格式，需要包含datetime和volume字段
+        """
+        times = data["datetime"].to_numpy()
+        if np.issubdtype(times.dtype, np.datetime64):
+            times = times.astype("datetime64[ns]").astype(np.int64)
+        self.times = times.astype(np.int64)
+
+        tick = self.spec.price_tick
+        slippage = self.slippage_ticks * tick
+        volume = data["volume"].to_numpy(dtype=np.float64)
+
+        if "ask_price1" in data.columns and "bid_price1" in data.columns:
+            # Tick行情中的成交量为当日累计值，换日时累计值会归零
+            traded = np.diff(volume, prepend=0.0)
+            traded = np.where(traded < 0, volume, traded)
+            self.buy_price = data["ask_price1"].to_numpy(dtype=np.float64) + slippage
+            self.sell_price = data["bid_price1"].to_numpy(dtype=np.float64) - slippage
+        else:
+            traded = volume
+            half_spread = self.spread_ticks * tick / 2
+            open_price = data["open"].to_numpy(dtype=np.float64)
+            self.buy_price = open_price + half_spread + slippage
+            self.sell_price = open_price - half_spread - slippage
+
+        traded = np.nan_to_num(traded, nan=0.0)
+        self.capacity = np.floor(traded * self.participation_rate).astype(np.int64)
+
+        self._cum_capacity = np.concatenate(([0], np.cumsum(self.capacity)))
+        buy_value = np.nan_to_num(self.capacity * self.buy_price)
+        sell_value = np.nan_to_num(self.capacity * self.sell_price)
+        self._cum_buy_value = np.concatenate(([0.0], np.cumsum(buy_value)))
+        self._cum_sell_value = np.concatenate(([0.0], np.cumsum(sell_value)))
+
+    def arrival_index(self, order_times):
+        """
+        计算委托到达交易所后第一条可撮合行情的序号
+
+        Args:
+            order_times: 委托时间，纳秒时间戳（标量或数组）
+
+        Returns:
+            行情序号，等于行情数量时表示委托到达时行情已结束
+        """
+        latency_ns = np.int64(round(self.latency * 1e9))
+        return np.searchsorted(self.times, np.asarray(order_times, dtype=np.int64) + latency_ns, side="left")
+
+    def simulate(self, order_times, order_volumes):
+        """
+        批量撮合委托
+        每笔委托从到达时刻起依次占用各期行情的可成交量，直到全部成交、等待超时或行情结束。
+        各委托独立占用可成交量，不考虑委托之间的相互排队
+
+        Args:
+            order_times: 委托时间数组，纳秒时间戳
+            order_volumes: 委托手数数组，正数为买入，负数为卖出
+
+        Returns:
+            numpy结构化数组，字段见 FILL_DTYPE
+        """
+        if self.times is None:
+            raise ValueError("请先调用load_market_data载入行情数据")
+
+        volumes = np.asarray(order_volumes, dtype=np.int64)
+        n_bars = len(self.times)
+        need = np.abs(volumes)
+        is_buy = volumes > 0
+
+        arrival = self.arrival_index(order_times)
+        if self.max_wait_bars is None:
+            last = np.full(len(volumes), n_bars, dtype=np.int64)
+        else:
+            last = np.minimum(arrival + self.max_wait_bars, n_bars)
+
+        cum = self._cum_capacity
+        base = cum[arrival]
+        filled = np.minimum(need, cum[last] - base)
+
+        # 最后一笔成交所在的行情: 第一个累计可成交量覆盖委托量的位置
+        end = np.searchsorted(cum, base + filled, side="left") - 1
+        has_fill = filled > 0
+        end = np.where(has_fill, end, arrival)
+        end_safe = np.minimum(end, n_bars - 1)
+
+        # 完整占用的行情按累计金额求和，最后一期只成交剩余部分
+        cum_value = np.where(is_buy, self._cum_buy_value[end], self._cum_sell_value[end]) - \
+            np.where(is_buy, self._cum_buy_value[arrival], self._cum_sell_value[arrival])
+        full_volume = cum[end] - base
+        last_price = np.where(is_buy, self.buy_price[end_safe], self.sell_price[end_safe])
+        value = cum_value + (filled - full_volume) * last_price
+
+        fills = np.zeros(len(volumes), dtype=FILL_DTYPE)
+        fills["order_id"] = np.arange(len(volumes))
+        fills["arrival_index"] = arrival
+        fills["fill_index"] = np.where(has_fill, end, -1)
+        fills["volume"] = np.where(is_buy, filled, -filled)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fills["price"] = np.where(has_fill, value / np.maximum(filled, 1), np.nan)
+        fills["commission"] = np.where(has_fill, self.commission(fills["price"], filled), 0.0)
+        fills["unfilled"] = need - filled
+        return fills
+
+    def fills_at(self, fills, index):
+        """
+        将simulate的撮合结果拆分到单条行情上，供逐K线推进的离线回测使用
+        各条行情上的成交手数之和等于fills中的成交手数，按成交量加权的价格等于fills中的成交均价
+
+        Args:
+            fills: simulate返回的撮合结果（结构化数组或其中一条记录）
+            index: 行情序号
+
+        Returns:
+            tuple: (该条行情上带方向的成交手数, 成交价格)
+        """
+        cum = self._cum_capacity
+        arrival = fills["arrival_index"]
+        total = np.abs(fills["volume"])
+        is_buy = fills["volume"] > 0
+
+        # 委托到达之后至该条行情开始前、至该条行情结束时的累计成交手数
+        start = np.minimum(arrival, index)
+        before = np.minimum(total, cum[index] - cum[start])
+        through = np.minimum(total, cum[index + 1] - cum[start])
+        filled = np.where(arrival <= index, through - before, 0)
+        volume = np.where(is_buy, filled, -filled)
+        price = np.where(is_buy, self.buy_price[index], self.sell_price[index])
+        return volume, price
+
+    def commission(self, price, volume):
+        """
+        计算手续费
+
+        Args:
+            price: 成交价格（标量或数组）
+            volume: 成交手数（标量或数组）
+
+        Returns:
+            手续费
+        """
+        lots = np.abs(volume)
+        return lots * (self.spec.commission_per_lot +
+                       self.spec.commission_rate * price * self.spec.multiplier)
+
+    def margin(self, price, volume):
+        """
+        计算占用保证金
+
+        Args:
+            price: 价格（标量或数组）
+            volume: 持仓手数（标量或数组）
+
+        Returns:
+            保证金
+        """
+        return np.abs(volume) * price * self.spec.multiplier * self.spec.margin_rate
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+历史K线批量下载模块
+将合约列表和日期区间拆分为按合约、按时间段的下载块，由有限数量的线程并发下载，
+所有线程共用一个令牌桶限制请求频率，失败的请求按指数退避重试。
+每个下载块直接写入本地存储的一个K线分块，完成情况逐行追加到进度清单，中断后重新运行只下载未完成的块。
+
+数据来源可以替换：TqsdkBackend使用天勤的K线数据下载接口，FrameBackend从已有的K线数据中截取，用于测试。
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from framework.event_journal import get_journal
+
+# 北京时间与UTC的差，单位为纳秒
+_UTC_OFFSET = 8 * 3600 * 10 ** 9
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+    令牌按固定速率补充，最多积累burst个；没有令牌时预约下一个令牌并等待，多个线程按请求顺序依次获得令牌
+    """
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 最多积累的令牌数，默认为None（与rate相同，至少为1）
+            clock: 时钟函数，默认为time.monotonic
+            sleep: 等待函数，默认为time.sleep
+        """
+        if rate <= 0:
+            raise ValueError("令牌补充速率需要大于0")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        获取一个令牌，必要时等待
+
+        Returns:
+            float: 等待的秒数
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def plan_chunks(start_date, end_date, chunk_days=30):
+    """
+    将日期区间拆分为下载块
+
+    Args:
+        start_date: 开始日期（包含）
+        end_date: 结束日期（包含）
+        chunk_days: 每块的天数，默认为30
+
+    Returns:
+        list: (块开始日期, 块结束日期) 列表，日期为 'YYYY-MM-DD' 字符串，块结束日期不包含在块内
+    """
+    start = np.datetime64(start_date, "D")
+    stop = np.datetime64(end_date, "D") + 1
+    if stop <= start:
+        raise ValueError("结束日期需要不早于开始日期")
+    bounds = np.append(np.arange(start, stop, np.timedelta64(int(chunk_days), "D")), stop)
+    return [(str(a), str(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def chunk_key(symbol, duration, start, end):
+    """
+    下载块在进度清单中的键
+    """
+    return f"{symbol}|{int(duration)}|{start}|{end}"
+
+
+class FrameBackend:
+    """
+    从内存中的K线数据截取下载块，用于测试或在本地存储之间复制数据
+    """
+    def __init__(self, klines):
+        """
+        初始化数据来源
+
+        Args:
+            klines: 合约代码到K线数据（pandas.DataFrame，datetime为UTC纳秒时间戳）的映射
+        """
+        self.klines = klines
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol, duration, start, end):
+        """
+        获取北京时间 [start, end) 之间的K线
+
+        Args:
+            symbol: 合约代码
+            duration: K线周期，单位为秒
+            start: 开始日期，'YYYY-MM-DD'
+            end: 结束日期（不包含），'YYYY-MM-DD'
+
+        Returns:
+            pandas.DataFrame格式的K线数据
+        """
+        with self._lock:
+            self.calls += 1
+        if symbol not in self.klines:
+            raise ValueError(f"数据来源中没有合约: {symbol}")
+        klines = self.klines[symbol]
+        times = klines["datetime"].to_numpy().astype(np.int64)
+        lower = np.datetime64(start, "ns").astype(np.int64) - _UTC_OFFSET
+        upper = np.datetime64(end, "ns").astype(np.int64) - _UTC_OFFSET
+        return klines[(times >= lower) & (times < upper)].reset_index(drop=True)
+
+
+class TqsdkBackend:
+    """
+    天勤K线数据下载接口（TqApi.get_kline_data_series，需要天勤专业版权限）
+    TqApi只能在创建它的线程中使用，每个下载线程各自创建一个连接
+    """
+    def __init__(self, tq_account=None, tq_password=None):
+        """
+        初始化数据来源
+
+        Args:
+            tq_account: 天勤账户，默认为None（从环境变量TQ_ACCOUNT读取）
+            tq_password: 天勤密码，默认为None（从环境变量TQ_PASSWORD读取）
+        """
+        self.tq_account = tq_account or os.environ.get("TQ_ACCOUNT")
+        self.tq_password = tq_password or os.environ.get("TQ_PASSWORD")
+        self._local = threading.local()
+        self._apis = []
+        self._lock = threading.Lock()
+
+    def _api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            from tqsdk import TqApi, TqAuth
+
+            api = TqApi(auth=TqAuth(self.tq_account, self.tq_password))
+            self._local.api = api
+            with self._lock:
+                self._apis.append(api)
+        return api
+
+    def fetch(self, symbol, duration, start, end):
+        """
+        获取北京时间 [start, end) 之间的K线，参数见FrameBackend.fetch
+        """
+        return self._api().get_kline_data_series(
+            symbol=symbol, duration_seconds=int(duration),
+            start_dt=datetime.datetime.fromisoformat(start), end_dt=datetime.datetime.fromisoformat(end))
+
+    def close(self):
+        """
+        关闭全部连接
+        """
+        with self._lock:
+            apis, self._apis = self._apis, []
+        for api in apis:
+            api.close()
+
+
+class HistoryDownloader:
+    """
+    历史K线批量下载
+    """
+    def __init__(self, store, backend, workers=4, rate=5.0, burst=None, max_retries=3, backoff=1.0,
+                 chunk_days=30, manifest_path=None, sleep=time.sleep):
+        """
+        初始化下载器
+
+        Args:
+            store: LocalStore实例
+            backend: 数据来源，提供fetch(symbol, duration, start, end)方法
+            workers: 并发下载线程数，默认为4
+            rate: 每秒最多发出的请求数（含重试），默认为5.0
+            burst: 令牌桶容量，默认为None（与rate相同）
+            max_retries: 每块最多重试次数，默认为3
+            backoff: 第一次重试前等待的秒数，之后每次翻倍，默认为1.0
+            chunk_days: 每块的天数，默认为30
+            manifest_path: 进度清单路径，默认为None（本地存储下的downloads/manifest.jsonl）
+            sleep: 等待函数，默认为time.sleep
+        """
+        self.store = store
+        self.backend = backend
+        self.workers = max(1, int(workers))
+        self.limiter = TokenBucket(rate, burst, sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.chunk_days = chunk_days
+        self.manifest_path = manifest_path or os.path.join(store.root, "downloads", "manifest.jsonl")
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.journal = get_journal()
+
+    def load_manifest(self):
+        """
+        读取进度清单，同一个块以最后一条记录为准；中断时写了一半的最后一行被忽略
+
+        Returns:
+            dict: 块的键到记录的映射
+        """
+        entries = {}
+        if not os.path.isfile(self.manifest_path):
+            return entries
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["key"]] = entry
+        return entries
+
+    def _record(self, entry):
+        """
+        追加一条进度记录
+        """
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+
+    def plan(self, symbols, duration, start_date, end_date, resume=True):
+        """
+        列出需要下载的块
+
+        Args:
+            symbols: 合约代码列表
+            duration: K线周期，单位为秒
+            start_date: 开始日期（包含）
+            end_date: 结束日期（包含）
+            resume: 是否跳过进度清单中已完成的块，默认为True
+
+        Returns:
+            tuple: (待下载的块列表, 已完成而跳过的块数量)，块为 (合约代码, 块开始日期, 块结束日期)
+        """
+        done = {key for key, entry in self.load_manifest().items() if entry["status"] == "done"} if resume else set()
+        pending = []
+        skipped = 0
+        for symbol in symbols:
+            for start, end in plan_chunks(start_date, end_date, self.chunk_days):
+                if chunk_key(symbol, duration, start, end) in done:
+                    skipped += 1
+                else:
+                    pending.append((symbol, start, end))
+        return pending, skipped
+
+    def download_chunk(self, symbol, duration, start, end):
+        """
+        下载一个块并写入本地存储，失败时按指数退避重试
+
+        Returns:
+            int: 写入的K线数量
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                klines = self.backend.fetch(symbol, duration, start, end)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                self.journal.warning("download", "下载失败，{delay:g}秒后重试: {symbol} {start}~{end}: {error}",
+                                     symbol=symbol, start=start, end=end, delay=delay, error=str(e))
+                attempt += 1
+                self._sleep(delay)
+        rows = 0 if klines is None else len(klines)
+        if rows:
+            self.store.save_klines(symbol, duration, klines, chunk=f"{start.replace('-', '')}-{end.replace('-', '')}")
+        return rows
+
+    def run(self, symbols, duration, start_date, end_date, resume=True):
+        """
+        下载全部合约的历史K线
+
+        Args:
+            symbols: 合约代码列表
+            duration: K线周期，单位为秒
+            start_date: 开始日期（包含）
+            end_date: 结束日期（包含）
+            resume: 是否跳过进度清单中已完成的块，默认为True
+
+        Returns:
+            dict: 下载结果统计，包含done、skipped、failed、rows
+        """
+        pending, skipped = self.plan(symbols, duration, start_date, end_date, resume)
+        self.journal.info("download", "共 {total} 个下载块，跳过已完成 {skipped} 个，待下载 {pending} 个",
+                          total=len(pending) + skipped, skipped=skipped, pending=len(pending))
+        summary = {"done": 0, "skipped": skipped, "failed": 0, "rows": 0}
+        if not pending:
+            return summary
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+            futures = {executor.submit(self.download_chunk, symbol, duration, start, end): (symbol, start, end)
+                       for symbol, start, end in pending}
+            for future in as_completed(futures):
+                symbol, start, end = futures[future]
+                entry = {"key": chunk_key(symbol, duration, start, end), "symbol": symbol,
+                         "duration": int(duration), "start": start, "end": end,
+                         "finished_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+                error = future.exception()
+                if error is None:
+                    entry.update(status="done", rows=future.result())
+                    summary["done"] += 1
+                    summary["rows"] += entry["rows"]
+                else:
+                    entry.update(status="failed", error=str(error))
+                    summary["failed"] += 1
+                    self.journal.error("error", "下载失败: {symbol} {start}~{end}: {error}",
+                                       symbol=symbol, start=start, end=end, error=str(error))
+                self._record(entry)
+
+        self.journal.info("download", "下载结束: 完成 {done} 个，跳过 {skipped} 个，失败 {failed} 个，共 {rows} 根K线",
+                          **summary)
+        self.journal.flush()
+        return summary
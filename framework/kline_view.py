@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+K线列视图模块
+TqApi和离线回测API返回的K线序列底层是一块随行情原地更新的数组，
+这里直接持有各列的numpy视图，策略读取最新K线时只需一次数组下标访问，
+不再每次通过 iloc 构造整行的pandas对象
+"""
+
+# 默认提供视图的K线字段，序列中不存在的字段会被忽略
+VIEW_FIELDS = ["datetime", "open", "high", "low", "close", "volume", "open_oi", "close_oi"]
+
+
+class KlineView:
+    """
+    K线序列的列视图
+    各字段以同名属性提供只读numpy数组，如 view.close[-1] 为最新价格，view.high[-2] 为上一根K线的最高价。
+    视图与K线序列共享内存，序列原地更新时无需刷新；序列被整体替换或长度变化时需要调用refresh
+    """
+    def __init__(self, klines, fields=None):
+        """
+        初始化K线列视图
+
+        Args:
+            klines: K线序列，pandas.DataFrame格式
+            fields: 字段列表，默认为None（使用VIEW_FIELDS中序列包含的字段）
+        """
+        self.source = klines
+        if fields is None:
+            fields = [field for field in VIEW_FIELDS if field in klines.columns]
+        self.fields = list(fields)
+        self._last_datetime = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        重新获取各列的视图
+        """
+        self.columns = {field: self.source[field].to_numpy() for field in self.fields}
+        self.length = len(self.source)
+        for field, values in self.columns.items():
+            setattr(self, field, values)
+
+    def is_stale(self):
+        """
+        K线序列长度变化时视图需要刷新
+        """
+        return len(self.source) != self.length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def last(self, field="close"):
+        """
+        最后一根K线（当前K线）的字段值
+        """
+        return self.columns[field][-1]
+
+    def bar(self, index=-1):
+        """
+        单根K线的全部字段
+
+        Args:
+            index: K线位置，默认为-1（当前K线），-2为上一根已完成的K线
+
+        Returns:
+            dict: 字段名到数值的映射
+        """
+        return {field: values[index] for field, values in self.columns.items()}
+
+    def is_new_bar(self):
+        """
+        判断是否产生了新K线
+        最后一根K线的datetime与上次调用时不同则返回True，datetime为NaN（尚无数据）时返回False；
+        等价于 api.is_changing(klines.iloc[-1], "datetime")，但不需要构造整行对象
+
+        Returns:
+            bool: 是否产生了新K线
+        """
+        if self.length == 0:
+            return False
+        current = self.columns["datetime"][-1]
+        if current != current or current == self._last_datetime:
+            return False
+        self._last_datetime = current
+        return True
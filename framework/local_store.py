@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地数据存储模块
+在本地目录中保存K线数据和批量任务的结果，目录结构如下:
+
+    <root>/klines/<合约代码>/<K线周期>/<分块名>.npz   K线数据，按分块保存
+    <root>/results/<任务编号>/result.json             任务结果
+"""
+
+import json
+import os
+import numpy as np
+
+# K线数据保存的字段
+KLINE_FIELDS = ["datetime", "open", "high", "low", "close", "volume", "open_oi", "close_oi"]
+
+
+def atomic_write_json(path, data):
+    """
+    先写临时文件再替换，避免中断时留下不完整的文件
+
+    Args:
+        path: 文件路径
+        data: 可序列化为JSON的数据
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def slice_klines(klines, start_date=None, end_date=None):
+    """
+    按日期区间截取K线数据
+
+    Args:
+        klines: K线数据，pandas.DataFrame格式
+        start_date: 开始日期（包含），默认为None
+        end_date: 结束日期（包含），默认为None
+
+    Returns:
+        截取后的K线数据
+    """
+    if not start_date and not end_date:
+        return klines
+    import pandas as pd
+
+    times = klines["datetime"].to_numpy()
+    if not np.issubdtype(times.dtype, np.datetime64):
+        # 天勤K线时间为UTC纳秒时间戳，换算为北京时间后再比较日期
+        times = pd.to_datetime(times.astype(np.int64)) + pd.Timedelta(hours=8)
+    times = pd.DatetimeIndex(times)
+    mask = np.ones(len(klines), dtype=bool)
+    if start_date:
+        mask &= times >= pd.Timestamp(start_date)
+    if end_date:
+        mask &= times < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    return klines[mask].reset_index(drop=True)
+
+
+class LocalStore:
+    """
+    本地数据存储
+    """
+    def __init__(self, root="data"):
+        """
+        初始化本地数据存储
+
+        Args:
+            root: 存储根目录，默认为'data'
+        """
+        self.root = root
+
+    def kline_dir(self, symbol, duration):
+        """
+        获取K线数据目录
+        """
+        return os.path.join(self.root, "klines", symbol, str(int(duration)))
+
+    def save_klines(self, symbol, duration, klines, chunk="data"):
+        """
+        保存K线数据
+
+        Args:
+            symbol: 合约代码
+            duration: K线周期，单位为秒
+            klines: K线数据，pandas.DataFrame格式，持仓量字段可以为close_oi或open_interest
+            chunk: 分块名，同名分块会被覆盖，默认为'data'
+
+        Returns:
+            分块文件路径
+        """
+        directory = self.kline_dir(symbol, duration)
+        os.makedirs(directory, exist_ok=True)
+        arrays = {}
+        for field in KLINE_FIELDS:
+            if field in klines.columns:
+                arrays[field] = klines[field].to_numpy()
+            elif field == "close_oi" and "open_interest" in klines.columns:
+                arrays[field] = klines["open_interest"].to_numpy()
+        times = arrays["datetime"]
+        if np.issubdtype(times.dtype, np.datetime64):
+            arrays["datetime"] = times.astype("datetime64[ns]").astype(np.int64)
+
+        path = os.path.join(directory, f"{chunk}.npz")
+        tmp_path = os.path.join(directory, f"{chunk}.tmp.npz")
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    def list_kline_chunks(self, symbol, duration):
+        """
+        列出已保存的K线分块名
+        """
+        directory = self.kline_dir(symbol, duration)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory)
+                      if name.endswith(".npz") and not name.endswith(".tmp.npz"))
+
+    def load_klines(self, symbol, duration, start_date=None, end_date=None, compact=False, price_tick=None):
+        """
+        读取K线数据，合并全部分块并按时间排序去重
+
+        Args:
+            symbol: 合约代码
+            duration: K线周期，单位为秒
+            start_date: 开始日期（包含），默认为None
+            end_date: 结束日期（包含），默认为None
+            compact: 是否转换为紧凑数据类型（float32价格、int32成交量和持仓量），默认为False
+            price_tick: 紧凑模式下价格对齐的最小变动价位，默认为None（按合约参数表）
+
+        Returns:
+            pandas.DataFrame格式的K线数据，持仓量同时提供close_oi和open_interest字段
+        """
+        import pandas as pd
+
+        chunks = self.list_kline_chunks(symbol, duration)
+        if not chunks:
+            raise FileNotFoundError(f"本地没有 {symbol} 周期 {duration} 的K线数据")
+
+        frames = []
+        directory = self.kline_dir(symbol, duration)
+        for chunk in chunks:
+            with np.load(os.path.join(directory, f"{chunk}.npz")) as data:
+                frames.append(pd.DataFrame({name: data[name] for name in data.files}))
+        klines = pd.concat(frames, ignore_index=True)
+        klines = klines.drop_duplicates("datetime", keep="last").sort_values("datetime").reset_index(drop=True)
+        if "close_oi" in klines.columns:
+            klines["open_interest"] = klines["close_oi"]
+        klines = slice_klines(klines, start_date, end_date)
+        if compact:
+            from framework.compact import compact_klines
+
+            klines = compact_klines(klines, price_tick, symbol)
+        return klines
+
+    def result_dir(self, job_id):
+        """
+        获取任务结果目录，不存在时创建
+        """
+        directory = os.path.join(self.root, "results", job_id)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def has_result(self, job_id):
+        """
+        判断任务是否已经完成
+        """
+        return os.path.isfile(os.path.join(self.root, "results", job_id, "result.json"))
+
+    def save_result(self, job_id, result):
+        """
+        保存任务结果
+
+        Args:
+            job_id: 任务编号
+            result: 可序列化为JSON的结果
+        """
+        atomic_write_json(os.path.join(self.result_dir(job_id), "result.json"), result)
+
+    def load_result(self, job_id):
+        """
+        读取任务结果
+        """
+        with open(os.path.join(self.root, "results", job_id, "result.json"), encoding="utf-8") as f:
+            return json.load(f)
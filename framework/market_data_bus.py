@@ -0,0 +1,585 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享内存行情总线
+一个发布进程持有行情连接（TqApi或离线回放），把K线和行情快照写入 multiprocessing.shared_memory 中的环形缓冲区；
+多个策略进程通过订阅端读取，不再各自建立连接、各自保存一份完整的K线序列。
+
+每个K线序列或行情对象对应一块共享内存，头部为int64数组，之后为按行存放的float64环形缓冲区：
+    头部: [序号, 已写入行数, 容量, 字段数, 状态]
+    数据: 第n行写入第 n % 容量 行
+写入时序号先加1（奇数表示正在写入），写完后再加1；读取前后序号相同且为偶数时读到的是一致的数据，否则重读。
+K线序列的最后一行（当前K线）原地改写，新K线追加为新行。
+"""
+
+import hashlib
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+
+# K线字段，与离线回测API一致
+KLINE_COLUMNS = ["datetime", "open", "high", "low", "close", "volume", "open_oi", "close_oi"]
+# 行情快照字段，缺少的字段为NaN
+QUOTE_FIELDS = ["datetime", "last_price", "bid_price1", "ask_price1", "bid_volume1", "ask_volume1",
+                "highest", "lowest", "volume", "open_interest", "price_tick"]
+
+# 头部各字段的位置
+_SEQ, _COUNT, _CAPACITY, _COLUMNS, _STATE = range(5)
+_HEADER_SIZE = 8
+# 发布端已关闭
+_CLOSED = 1
+# 读取遇到正在写入时先空转重试的次数，之后每次重试前休眠的秒数
+_READ_SPINS = 100
+_READ_SLEEP = 1e-4
+
+
+class FeedClosed(Exception):
+    """
+    发布端已关闭且没有未读取的行情，由订阅端的wait_update抛出
+    """
+    pass
+
+
+def channel_name(bus, kind, symbol, duration_seconds=0):
+    """
+    共享内存块的名称，由总线名称、类型、品种和K线周期确定，发布端和订阅端各自计算
+
+    Args:
+        bus: 总线名称
+        kind: 'k'为K线序列，'q'为行情快照
+        symbol: 合约代码
+        duration_seconds: K线周期，单位为秒，行情快照为0
+
+    Returns:
+        str: 共享内存名称
+    """
+    digest = hashlib.sha1(f"{symbol}:{int(duration_seconds)}".encode()).hexdigest()[:12]
+    return f"{bus}_{kind}{digest}"
+
+
+def _attach(name):
+    """
+    连接已有的共享内存块
+    只连接的进程不登记到resource_tracker，否则进程退出时会删除发布端仍在使用的共享内存
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _Channel:
+    """
+    一块共享内存中的环形缓冲区
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((_HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        capacity, columns = int(self.header[_CAPACITY]), int(self.header[_COLUMNS])
+        self.data = np.ndarray((capacity, columns), dtype=np.float64, buffer=shm.buf, offset=_HEADER_SIZE * 8)
+
+    @classmethod
+    def create(cls, name, capacity, columns):
+        """
+        创建共享内存块，同名的旧共享内存块（上次未正常关闭）先删除
+        """
+        size = _HEADER_SIZE * 8 + capacity * columns * 8
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_CAPACITY] = capacity
+        header[_COLUMNS] = columns
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name), owner=False)
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    @property
+    def count(self):
+        return int(self.header[_COUNT])
+
+    @property
+    def closed(self):
+        return self.header[_STATE] == _CLOSED
+
+    def last_row(self):
+        count = self.count
+        return self.data[(count - 1) % self.capacity] if count else None
+
+    def write(self, rows, replace_last=False):
+        """
+        写入多行，replace_last为True时第一行改写当前最后一行
+        """
+        header = self.header
+        count = int(header[_COUNT])
+        header[_SEQ] += 1
+        if replace_last and count > 0 and len(rows):
+            self.data[(count - 1) % self.capacity] = rows[0]
+            rows = rows[1:]
+        if len(rows):
+            self.data[np.arange(count, count + len(rows)) % self.capacity] = rows[-self.capacity:]
+            header[_COUNT] = count + len(rows)
+        header[_SEQ] += 1
+
+    def read(self, start, limit=None, timeout=1.0):
+        """
+        读取第start行到最新一行的一致快照
+        遇到正在写入时重试，先空转再休眠，超过timeout仍未写完时认为发布端在写入中途退出
+
+        Args:
+            start: 起始行号，早于缓冲区中最早的一行时从最早的一行开始
+            limit: 最多读取最新的多少行，默认为None（不限）
+            timeout: 等待一次写入完成的最长时间，单位为秒，默认为1
+
+        Returns:
+            tuple: (序号, 已写入行数, 读取的行)
+
+        Raises:
+            FeedClosed: 超过timeout仍在写入
+        """
+        header = self.header
+        limit = self.capacity if limit is None else min(limit, self.capacity)
+        deadline = None
+        attempt = 0
+        while True:
+            seq = int(header[_SEQ])
+            if seq % 2 == 0:
+                count = int(header[_COUNT])
+                first = max(start, count - limit, 0)
+                rows = self.data[np.arange(first, count) % self.capacity]
+                if int(header[_SEQ]) == seq:
+                    return seq, count, rows
+            attempt += 1
+            if attempt <= _READ_SPINS:
+                continue
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise FeedClosed(f"共享内存{self.shm.name}超过{timeout}秒未完成写入，发布端可能已退出")
+            time.sleep(_READ_SLEEP)
+
+    def close(self):
+        self.header = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class MarketDataPublisher:
+    """
+    行情发布端
+    持有行情连接，每次wait_update之后把K线序列和行情快照的变化写入共享内存
+    """
+    def __init__(self, api, name="tqbus"):
+        """
+        初始化行情发布端
+
+        Args:
+            api: TqApi或OfflineApi实例
+            name: 总线名称，订阅端使用相同的名称连接，默认为'tqbus'
+        """
+        self.api = api
+        self.name = name
+        # (共享内存块, K线序列, 已发布的最后一根K线时间)
+        self._klines = []
+        # (共享内存块, 行情对象)
+        self._quotes = []
+
+    def add_kline_serial(self, symbol, duration_seconds, capacity=8192, data_length=None):
+        """
+        发布一个K线序列
+
+        Args:
+            symbol: 合约代码
+            duration_seconds: K线周期，单位为秒
+            capacity: 环形缓冲区行数，订阅端的序列长度不能超过它，默认为8192
+            data_length: 从api获取的K线序列长度，默认为None（与capacity相同，TqApi最多8964）
+        """
+        serial = self.api.get_kline_serial(symbol, duration_seconds,
+                                           data_length=data_length or min(capacity, 8964))
+        channel = _Channel.create(channel_name(self.name, "k", symbol, duration_seconds), capacity,
+                                  len(KLINE_COLUMNS))
+        entry = [channel, serial, None]
+        self._klines.append(entry)
+        self._publish_klines(entry)
+
+    def add_quote(self, symbol):
+        """
+        发布一个合约的行情快照
+
+        Args:
+            symbol: 合约代码
+        """
+        quote = self.api.get_quote(symbol)
+        channel = _Channel.create(channel_name(self.name, "q", symbol), 1, len(QUOTE_FIELDS))
+        self._quotes.append((channel, quote))
+        self._publish_quote(channel, quote)
+
+    def publish(self):
+        """
+        写入自上次发布以来的变化，在每次wait_update之后调用
+
+        Returns:
+            int: 有变化的K线序列和行情对象数量
+        """
+        changed = 0
+        for entry in self._klines:
+            changed += self._publish_klines(entry)
+        for channel, quote in self._quotes:
+            changed += self._publish_quote(channel, quote)
+        return changed
+
+    def _publish_klines(self, entry):
+        """
+        追加新K线并改写当前K线，没有变化时不写入
+        """
+        channel, serial, last_datetime = entry
+        datetimes = serial["datetime"].to_numpy(dtype=np.float64)
+        # 序列开头可能是尚无数据的NaN行
+        valid = np.flatnonzero(datetimes == datetimes)
+        if len(valid) == 0:
+            return 0
+        start = int(valid[0])
+        if last_datetime is not None:
+            # 从已发布的最后一根K线开始，它可能在本次更新中发生变化
+            start += int(np.searchsorted(datetimes[start:], last_datetime, side="left"))
+        if start >= len(datetimes):
+            return 0
+        # 只复制需要发布的行
+        rows = np.column_stack([serial[col].to_numpy(dtype=np.float64)[start:] if col in serial.columns
+                                else np.full(len(serial) - start, np.nan) for col in KLINE_COLUMNS])
+        replace_last = last_datetime is not None and rows[0, 0] == last_datetime
+        if replace_last and len(rows) == 1 and np.array_equal(rows[0], channel.last_row(), equal_nan=True):
+            return 0
+        channel.write(rows, replace_last)
+        entry[2] = rows[-1, 0]
+        return 1
+
+    def _publish_quote(self, channel, quote):
+        """
+        行情快照有变化时写入
+        """
+        row = np.array([_quote_value(quote, field) for field in QUOTE_FIELDS])
+        last = channel.last_row()
+        if last is not None and np.array_equal(row, last, equal_nan=True):
+            return 0
+        channel.write(row[None, :])
+        return 1
+
+    def run(self, max_updates=None):
+        """
+        循环等待行情并发布，回放结束（离线回测API抛出BacktestFinished）时返回
+
+        Args:
+            max_updates: 最多等待的行情次数，默认为None（不限）
+
+        Returns:
+            int: 等待的行情次数
+        """
+        from framework.offline_engine import BacktestFinished
+
+        updates = 0
+        try:
+            while max_updates is None or updates < max_updates:
+                self.api.wait_update()
+                self.publish()
+                updates += 1
+        except BacktestFinished:
+            pass
+        return updates
+
+    def mark_closed(self):
+        """
+        通知订阅端不会再有新的行情，共享内存仍然保留，订阅端读完之后由close删除
+        """
+        for channel in self._channels():
+            channel.header[_STATE] = _CLOSED
+
+    def close(self):
+        """
+        通知订阅端并删除全部共享内存
+        """
+        self.mark_closed()
+        for channel in self._channels():
+            channel.close()
+        self._klines = []
+        self._quotes = []
+
+    def _channels(self):
+        return [entry[0] for entry in self._klines] + [channel for channel, _ in self._quotes]
+
+
+def _quote_value(quote, field):
+    """
+    读取行情对象的字段，datetime转换为纳秒时间戳
+    """
+    value = getattr(quote, field, None)
+    if value is None:
+        return np.nan
+    if field == "datetime" and isinstance(value, str):
+        # 天勤行情的时间为 '2024-01-02 09:00:00.000000' 格式的北京时间字符串
+        return float(np.datetime64(value, "ns").astype(np.int64)) - 8 * 3600 * 10 ** 9 if value else np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _Serial:
+    """
+    订阅端的一个K线序列: 本进程只保存策略需要的最近data_length根K线
+    """
+    def __init__(self, channel, data_length):
+        import pandas as pd
+
+        self.channel = channel
+        self.array = np.full((data_length, len(KLINE_COLUMNS)), np.nan, order="F")
+        self.frame = pd.DataFrame(self.array, columns=KLINE_COLUMNS, copy=False)
+        self.seq = -1
+        self.count = 0
+        self.changed = False
+        self.new_bar = False
+
+    def sync(self):
+        """
+        读取共享内存中的新K线，只复制变化的行
+
+        Returns:
+            bool: 是否有变化
+        """
+        self.changed = self.new_bar = False
+        if int(self.channel.header[_SEQ]) == self.seq:
+            return False
+        array = self.array
+        length = len(array)
+        # 当前K线可能被改写，从本地最后一行开始读取
+        seq, count, rows = self.channel.read(max(self.count - 1, 0), limit=length)
+        self.seq = seq
+        if count == self.count and len(rows) and np.array_equal(rows[-1], array[-1], equal_nan=True):
+            return False
+        shift = count - self.count
+        if shift >= length:
+            array[:] = np.nan
+        elif shift > 0:
+            array[:length - shift] = array[shift:]
+        array[length - len(rows):] = rows
+        self.new_bar = shift > 0
+        self.count = count
+        self.changed = True
+        return True
+
+
+class MarketDataSubscriber:
+    """
+    行情订阅端
+    提供与TqApi相同的get_kline_serial、get_quote、wait_update和is_changing接口，
+    可以通过StrategyBase.set_data_source作为策略的行情来源
+    """
+    def __init__(self, name="tqbus", poll_interval=0.001):
+        """
+        初始化行情订阅端
+
+        Args:
+            name: 总线名称，与发布端一致，默认为'tqbus'
+            poll_interval: 等待新行情时的轮询间隔，单位为秒，默认为0.001
+        """
+        self.name = name
+        self.poll_interval = poll_interval
+        self._serials = []
+        self._quotes = []
+        self._by_frame = {}
+
+    def get_kline_serial(self, symbol, duration_seconds, data_length=200):
+        """
+        获取K线序列，发布端需要已发布该序列
+
+        Args:
+            symbol: 合约代码
+            duration_seconds: K线周期，单位为秒
+            data_length: K线序列长度，不能超过发布端的缓冲区行数，默认为200
+
+        Returns:
+            pandas.DataFrame，在wait_update中原地更新
+        """
+        try:
+            channel = _Channel.attach(channel_name(self.name, "k", symbol, duration_seconds))
+        except FileNotFoundError:
+            raise ValueError(f"行情总线{self.name}中没有K线序列: {symbol} {duration_seconds}秒")
+        capacity = channel.capacity
+        if data_length > capacity:
+            channel.close()
+            raise ValueError(f"K线序列长度{data_length}超过行情总线的缓冲区行数{capacity}")
+        serial = _Serial(channel, data_length)
+        serial.sync()
+        self._serials.append(serial)
+        self._by_frame[id(serial.frame)] = serial
+        return serial.frame
+
+    def get_quote(self, symbol):
+        """
+        获取行情对象，字段见QUOTE_FIELDS，在wait_update中原地更新
+        """
+        try:
+            channel = _Channel.attach(channel_name(self.name, "q", symbol))
+        except FileNotFoundError:
+            raise ValueError(f"行情总线{self.name}中没有行情: {symbol}")
+        quote = SimpleNamespace(instrument_id=symbol, **{field: np.nan for field in QUOTE_FIELDS})
+        entry = [channel, quote, -1, False]
+        self._quotes.append(entry)
+        self._sync_quote(entry)
+        return quote
+
+    def sync(self):
+        """
+        读取全部序列和行情的变化，不等待
+
+        Returns:
+            bool: 是否有变化
+        """
+        changed = False
+        for serial in self._serials:
+            changed |= serial.sync()
+        for entry in self._quotes:
+            changed |= self._sync_quote(entry)
+        return changed
+
+    def _sync_quote(self, entry):
+        channel, quote, seen, _ = entry
+        entry[3] = False
+        if int(channel.header[_SEQ]) == seen:
+            return False
+        seq, count, rows = channel.read(0)
+        entry[2] = seq
+        if count == 0:
+            return False
+        for field, value in zip(QUOTE_FIELDS, rows[-1].tolist()):
+            setattr(quote, field, int(value) if field == "datetime" and value == value else value)
+        entry[3] = True
+        return True
+
+    def wait_update(self, deadline=None):
+        """
+        等待新行情
+
+        Args:
+            deadline: 等待截止时间（time.time()的时间戳），默认为None（一直等待）
+
+        Returns:
+            bool: 有新行情时返回True，到达截止时间时返回False
+
+        Raises:
+            FeedClosed: 发布端已关闭且全部行情均已读取
+        """
+        while True:
+            if self.sync():
+                return True
+            channels = [serial.channel for serial in self._serials] + [entry[0] for entry in self._quotes]
+            if channels and all(channel.closed for channel in channels):
+                # 关闭标记可能晚于最后一次写入被看到，再读取一次
+                if self.sync():
+                    return True
+                raise FeedClosed(f"行情总线{self.name}已关闭")
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def is_changing(self, obj, key=None):
+        """
+        判断对象在最近一次wait_update中是否发生变化
+        K线序列的datetime字段只在新K线产生时变化
+        """
+        serial = self._by_frame.get(id(obj))
+        if serial is not None:
+            keys = [key] if isinstance(key, str) else (key or [])
+            return serial.new_bar if "datetime" in keys else serial.changed
+        for _, quote, _, changed in self._quotes:
+            if obj is quote:
+                return changed
+        return False
+
+    def close(self):
+        """
+        断开共享内存，不影响发布端和其他订阅端
+        """
+        for serial in self._serials:
+            serial.channel.close()
+        for entry in self._quotes:
+            entry[0].close()
+        self._serials = []
+        self._quotes = []
+        self._by_frame = {}
+
+
+class ReplayFeed:
+    """
+    本地回放行情源
+    用离线回测API回放K线数据并发布到行情总线，用于测试和多进程策略的离线演练
+    """
+    def __init__(self, klines, symbol, name="tqbus", duration_seconds=86400, capacity=8192, data_length=None):
+        """
+        初始化回放行情源
+
+        Args:
+            klines: K线数据，pandas.DataFrame格式
+            symbol: 合约代码
+            name: 总线名称，默认为'tqbus'
+            duration_seconds: 发布的K线周期，单位为秒，默认为86400
+            capacity: 环形缓冲区行数，默认为8192
+            data_length: 离线回测API的K线序列长度，默认为None（与capacity相同）
+        """
+        from framework.offline_engine import OfflineApi
+
+        self.api = OfflineApi(klines, symbol)
+        self.publisher = MarketDataPublisher(self.api, name)
+        self.publisher.add_kline_serial(symbol, duration_seconds, capacity, data_length or capacity)
+        self.publisher.add_quote(symbol)
+
+    def step(self):
+        """
+        推进一次行情并发布
+
+        Returns:
+            bool: 回放结束时返回False
+        """
+        from framework.offline_engine import BacktestFinished
+
+        try:
+            self.api.wait_update()
+        except BacktestFinished:
+            self.publisher.mark_closed()
+            return False
+        self.publisher.publish()
+        return True
+
+    def run(self, interval=0.0):
+        """
+        回放全部行情，结束后通知订阅端
+
+        Args:
+            interval: 每次推送之间的间隔，单位为秒，默认为0
+        """
+        while self.step():
+            if interval:
+                time.sleep(interval)
+
+    def close(self):
+        self.publisher.close()
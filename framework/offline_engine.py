@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线回测引擎
+使用本地K线数据模拟TqApi的常用接口，策略无需修改即可在本地回放行情
+成交由 ExecutionSimulator 按延迟、价差和成交量参与率撮合，每笔委托在下单时整体撮合，再按K线逐根计入持仓
+"""
+
+import numpy as np
+import pandas as pd
+from framework.execution_simulator import ExecutionSimulator
+from framework.event_journal import get_journal
+
+# 暴露给策略的K线字段
+KLINE_COLUMNS = ["datetime", "open", "high", "low", "close", "volume", "open_oi", "close_oi"]
+
+
+class BacktestFinished(Exception):
+    """
+    离线回测结束
+    与TqApi回测结束时的行为一致，由wait_update抛出
+    """
+    pass
+
+
+class _Entity:
+    """
+    行情/账户对象，以属性方式访问字段
+    """
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+class OfflineTargetPosTask:
+    """
+    离线回测中的目标持仓任务，接口与 tqsdk.TargetPosTask 一致
+    """
+    def __init__(self, api, symbol):
+        self.api = api
+        self.symbol = symbol
+
+    def set_target_volume(self, volume):
+        """
+        设置目标持仓手数
+
+        Args:
+            volume: 目标持仓手数，正数为多头，负数为空头
+        """
+        self.api._set_target_volume(int(volume))
+
+
+class OfflineApi:
+    """
+    离线回测API
+    每根K线分两次推送: 第一次为K线开盘（高低收均为开盘价，成交量为0），第二次为K线收盘，
+    与天勤按K线回测时的推送方式一致，策略在开盘时刻下达的委托在当根K线撮合
+    """
+    def __init__(self, klines, symbol, init_balance=100000, simulator=None):
+        """
+        初始化离线回测API
+
+        Args:
+            klines: K线数据，pandas.DataFrame格式，需要包含datetime, open, high, low, close, volume字段，
+                持仓量字段可以为close_oi或open_interest；不支持Tick行情（包含ask_price1/bid_price1字段）
+            symbol: 交易品种代码
+            init_balance: 初始资金，默认为100000
+            simulator: 成交模拟器，默认为None（使用默认参数的ExecutionSimulator）
+        """
+        if klines is None or len(klines) == 0:
+            raise ValueError("K线数据为空，无法进行离线回测")
+        if "ask_price1" in klines.columns or "bid_price1" in klines.columns:
+            # 回放和撮合都以K线为单位，Tick行情的累计成交量和盘口价格无法直接作为K线推送给策略
+            raise ValueError("离线回测只支持K线数据，Tick行情请先合成K线，或直接使用ExecutionSimulator撮合")
+        missing = [col for col in ["datetime", "open", "high", "low", "close", "volume"] if col not in klines.columns]
+        if missing:
+            raise ValueError(f"K线数据缺少字段: {', '.join(missing)}")
+
+        self.symbol = symbol
+        self.simulator = simulator or ExecutionSimulator(symbol)
+        self.simulator.load_market_data(klines)
+        self.spec = self.simulator.spec
+
+        self._data = self._normalize_klines(klines)
+        self._length = len(self._data["datetime"])
+        self._index = -1
+        self._phase = "close"
+        self._serials = []
+
+        # 目标持仓及当前委托的撮合结果（ExecutionSimulator.simulate返回的一条记录）
+        self._target = 0
+        self._order = None
+
+        # 持仓和账户
+        self._avg_price = 0.0
+        self._position = _Entity(pos=0, pos_long=0, pos_short=0, open_price_long=np.nan,
+                                 open_price_short=np.nan, float_profit=0.0)
+        self._account = _Entity(static_balance=float(init_balance), balance=float(init_balance),
+                                available=float(init_balance), margin=0.0, float_profit=0.0,
+                                position_profit=0.0, close_profit=0.0, commission=0.0)
+        self._quote = _Entity(instrument_id=symbol, datetime=None, last_price=np.nan,
+                              price_tick=self.spec.price_tick, volume_multiple=self.spec.multiplier)
+        self._account_changed = False
+        self.journal = get_journal()
+        # 成交记录，字段与天勤的成交对象一致
+        self._trades = {}
+
+    @staticmethod
+    def _normalize_klines(klines):
+        """
+        将K线数据整理为按字段存放的numpy数组
+        """
+        times = klines["datetime"].to_numpy()
+        if np.issubdtype(times.dtype, np.datetime64):
+            times = times.astype("datetime64[ns]").astype(np.int64)
+        data = {"datetime": times.astype(np.int64)}
+        for col in ["open", "high", "low", "close", "volume"]:
+            data[col] = klines[col].to_numpy(dtype=np.float64)
+        if "close_oi" in klines.columns:
+            oi = klines["close_oi"].to_numpy(dtype=np.float64)
+        elif "open_interest" in klines.columns:
+            oi = klines["open_interest"].to_numpy(dtype=np.float64)
+        else:
+            oi = np.zeros(len(klines))
+        data["close_oi"] = oi
+        data["open_oi"] = klines["open_oi"].to_numpy(dtype=np.float64) if "open_oi" in klines.columns \
+            else np.concatenate(([oi[0]], oi[:-1]))
+        return data
+
+    def get_kline_serial(self, symbol, duration_seconds, data_length=200):
+        """
+        获取K线序列
+        K线周期由回放数据决定，duration_seconds仅为保持与TqApi接口一致
+
+        Args:
+            symbol: 交易品种代码
+            duration_seconds: K线周期，单位为秒
+            data_length: K线序列长度，默认为200
+
+        Returns:
+            pandas.DataFrame，随回放推进原地更新
+        """
+        if symbol != self.symbol:
+            raise ValueError(f"离线回测数据中没有品种: {symbol}")
+        # 与TqApi一样以一块按列存储的数组作为序列的底层数据，回放时原地写入，策略持有的列视图始终有效
+        array = np.full((data_length, len(KLINE_COLUMNS)), np.nan, order="F")
+        serial = pd.DataFrame(array, columns=KLINE_COLUMNS, copy=False)
+        self._serials.append(array)
+        if self._index >= 0:
+            self._update_serial(array)
+        return serial
+
+    def get_quote(self, symbol):
+        """
+        获取行情对象
+        """
+        return self._quote
+
+    def get_account(self):
+        """
+        获取账户对象，返回的对象随回放推进原地更新
+        """
+        return self._account
+
+    def get_position(self, symbol=None):
+        """
+        获取持仓对象，返回的对象随回放推进原地更新
+        """
+        return self._position
+
+    def get_trade(self, trade_id=None):
+        """
+        获取成交记录
+
+        Args:
+            trade_id: 成交编号，默认为None（返回全部成交）
+
+        Returns:
+            成交编号到成交对象的字典，或单个成交对象
+        """
+        if trade_id is not None:
+            return self._trades[trade_id]
+        return self._trades
+
+    def create_target_pos_task(self, symbol):
+        """
+        创建目标持仓任务
+
+        Args:
+            symbol: 交易品种代码
+
+        Returns:
+            OfflineTargetPosTask实例
+        """
+        return OfflineTargetPosTask(self, symbol)
+
+    def wait_update(self, deadline=None):
+        """
+        推进一次行情
+        行情全部回放完毕后抛出 BacktestFinished
+        """
+        self._account_changed = False
+        if self._phase == "close":
+            if self._index + 1 >= self._length:
+                raise BacktestFinished("离线回测结束")
+            self._index += 1
+            self._phase = "open"
+            price = self._data["open"][self._index]
+        else:
+            self._phase = "close"
+            self._match_orders()
+            price = self._data["close"][self._index]
+
+        for array in self._serials:
+            self._update_serial(array)
+        self._quote.datetime = int(self._data["datetime"][self._index])
+        self._quote.last_price = price
+        self._mark_to_market(price)
+        return True
+
+    def is_changing(self, obj, key=None):
+        """
+        判断对象在最近一次wait_update中是否发生变化
+        账户和持仓对象在发生成交或价格变动时变化；K线的datetime字段只在新K线产生时变化
+        """
+        if obj is self._account or obj is self._position or obj is self._trades:
+            return self._account_changed
+        if self._index < 0:
+            return False
+        keys = [key] if isinstance(key, str) else (key or [])
+        if "datetime" in keys:
+            return self._phase == "open"
+        return True
+
+    def close(self):
+        """
+        关闭API，离线回测无需释放资源
+        """
+        pass
+
+    def _update_serial(self, array):
+        """
+        原地更新K线序列的底层数组，序列末尾为当前K线
+        """
+        length = len(array)
+        start = max(0, self._index + 1 - length)
+        pad = length - (self._index + 1 - start)
+        array[:pad] = np.nan
+        for j, col in enumerate(KLINE_COLUMNS):
+            array[pad:, j] = self._data[col][start:self._index + 1]
+        if self._phase == "open":
+            # 开盘时刻只能看到开盘价
+            open_price = self._data["open"][self._index]
+            last = array[-1]
+            for col in ["high", "low", "close"]:
+                last[KLINE_COLUMNS.index(col)] = open_price
+            last[KLINE_COLUMNS.index("volume")] = 0.0
+            last[KLINE_COLUMNS.index("close_oi")] = self._data["open_oi"][self._index]
+
+    def _set_target_volume(self, volume):
+        """
+        记录目标持仓，以目标持仓与实际持仓的差额作为一笔新委托整体撮合，未完成的旧委托被替换
+        """
+        self._target = volume
+        net = volume - self._position.pos
+        if net == 0:
+            self._order = None
+            return
+        order_time = self._data["datetime"][self._index] if self._phase == "open" \
+            else self._data["datetime"][self._index] + 1
+        self._order = self.simulator.simulate([order_time], [net])[0]
+
+    def _match_orders(self):
+        """
+        将当前委托在当前K线上的成交计入持仓
+        """
+        order = self._order
+        if order is None or self._index < order["arrival_index"]:
+            return
+        filled, price = self.simulator.fills_at(order, self._index)
+        if filled != 0:
+            self._apply_fill(int(filled), float(price))
+        if self._target == self._position.pos:
+            self._order = None
+        elif self.simulator.max_wait_bars is not None and \
+                self._index + 1 - order["arrival_index"] >= self.simulator.max_wait_bars:
+            # 超过最长等待时间，撤销剩余委托并以实际持仓作为目标
+            self._target = self._position.pos
+            self._order = None
+
+    def _apply_fill(self, volume, price):
+        """
+        根据成交更新持仓和平仓盈亏
+        """
+        multiplier = self.spec.multiplier
+        pos = self._position.pos
+        commission = float(self.simulator.commission(price, volume))
+
+        if pos == 0 or (pos > 0) == (volume > 0):
+            # 开仓或加仓
+            self._avg_price = (self._avg_price * abs(pos) + price * abs(volume)) / (abs(pos) + abs(volume))
+        else:
+            # 平仓，多余部分反向开仓
+            closing = min(abs(volume), abs(pos))
+            direction = 1 if pos > 0 else -1
+            self._account.close_profit += (price - self._avg_price) * closing * direction * multiplier
+            if abs(volume) > abs(pos):
+                self._avg_price = price
+            elif abs(volume) == abs(pos):
+                self._avg_price = 0.0
+
+        pos += volume
+        self._position.pos = pos
+        self._position.pos_long = max(pos, 0)
+        self._position.pos_short = max(-pos, 0)
+        self._position.open_price_long = self._avg_price if pos > 0 else np.nan
+        self._position.open_price_short = self._avg_price if pos < 0 else np.nan
+        self._account.commission += commission
+        trade_id = str(len(self._trades) + 1)
+        self._trades[trade_id] = _Entity(trade_id=trade_id, instrument_id=self.symbol,
+                                         direction="BUY" if volume > 0 else "SELL", volume=abs(volume),
+                                         price=price, commission=commission,
+                                         trade_date_time=int(self._data["datetime"][self._index]))
+        self.journal.debug("fill", "成交: {symbol} {volume}手, 价格: {price:.2f}, 手续费: {commission:.2f}",
+                           symbol=self.symbol, volume=volume, price=price, commission=commission)
+        self._account_changed = True
+
+    def _mark_to_market(self, price):
+        """
+        按最新价计算浮动盈亏、权益和保证金
+        """
+        pos = self._position.pos
+        float_profit = (price - self._avg_price) * pos * self.spec.multiplier if pos != 0 else 0.0
+        account = self._account
+        balance = account.static_balance + account.close_profit + float_profit - account.commission
+        if balance != account.balance:
+            self._account_changed = True
+        account.float_profit = float_profit
+        account.position_profit = float_profit
+        account.balance = balance
+        account.margin = float(self.simulator.margin(price, pos))
+        account.available = balance - account.margin
+        self._position.float_profit = float_profit
@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+策略参数优化模块
+在离线回测上搜索策略参数，比逐个回测整个参数网格少用大部分计算量。提供两种搜索方式:
+
+    逐轮减半（successive halving）: 第一轮在最近一小段K线上回测全部候选参数，按目标值保留前1/eta
+        进入下一轮，下一轮的K线长度乘以eta，直到最后一轮使用全部K线。大部分候选参数只在短区间上回测一次。
+    贝叶斯优化: 用高斯过程拟合已回测参数的目标值，按期望改进量（EI）选出下一批最有希望的参数，
+        全部回测都使用全部K线，适合参数之间有连续关系、单次回测较慢的情况。
+
+每次回测都是一次独立的QuantFramework离线回测，策略按参数重新创建；workers大于1时在进程池中并行运行，
+K线数据在每个进程启动时传入一次。目标值由回测结果计算，越大越好。
+"""
+
+import itertools
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from framework.event_journal import get_journal, reset_journal, WARNING
+
+
+class ParameterSpace:
+    """
+    参数空间
+    每个参数为候选值列表，或 (下限, 上限) 区间：整数区间包含两端，浮点数区间为连续取值
+    """
+    def __init__(self, space, constraint=None):
+        """
+        初始化参数空间
+
+        Args:
+            space: 参数名到候选值列表或 (下限, 上限) 的映射，如 {'short_period': (3, 20), 'method': ['triangle', 'even']}
+            constraint: 参数约束函数，接收参数字典，返回False的参数不参与搜索，
+                如 lambda p: p['short_period'] < p['long_period']，默认为None
+        """
+        if not space:
+            raise ValueError("参数空间不能为空")
+        self.names = list(space)
+        self.space = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                if len(values) != 2 or values[0] > values[1]:
+                    raise ValueError(f"参数{name}的区间需要为 (下限, 上限): {values}")
+            elif not values:
+                raise ValueError(f"参数{name}没有候选值")
+            self.space[name] = values if isinstance(values, tuple) else list(values)
+        self.constraint = constraint
+
+    def _is_range(self, name):
+        return isinstance(self.space[name], tuple)
+
+    def _is_continuous(self, name):
+        return self._is_range(name) and not all(isinstance(v, (int, np.integer)) for v in self.space[name])
+
+    def is_valid(self, params):
+        """
+        判断参数是否满足约束
+        """
+        return self.constraint is None or bool(self.constraint(params))
+
+    def key(self, params):
+        """
+        参数的可哈希表示
+        """
+        return tuple(params[name] for name in self.names)
+
+    def grid(self):
+        """
+        列出全部满足约束的参数组合，连续区间不能列出
+
+        Returns:
+            list: 参数字典列表
+        """
+        axes = []
+        for name in self.names:
+            if self._is_continuous(name):
+                raise ValueError(f"参数{name}为连续区间，不能列出全部组合")
+            values = self.space[name]
+            axes.append(range(values[0], values[1] + 1) if self._is_range(name) else values)
+        combinations = (dict(zip(self.names, values)) for values in itertools.product(*axes))
+        return [params for params in combinations if self.is_valid(params)]
+
+    def sample(self, count, rng, exclude=()):
+        """
+        随机抽取满足约束且互不相同的参数
+
+        Args:
+            count: 参数数量
+            rng: numpy随机数生成器
+            exclude: 不抽取的参数键集合，见key
+
+        Returns:
+            list: 参数字典列表，可选组合不足时少于count个
+        """
+        seen = set(exclude)
+        result = []
+        for _ in range(count * 20):
+            if len(result) >= count:
+                break
+            params = {}
+            for name in self.names:
+                values = self.space[name]
+                if self._is_continuous(name):
+                    params[name] = float(rng.uniform(values[0], values[1]))
+                elif self._is_range(name):
+                    params[name] = int(rng.integers(values[0], values[1] + 1))
+                else:
+                    params[name] = values[int(rng.integers(len(values)))]
+            key = self.key(params)
+            if key not in seen and self.is_valid(params):
+                seen.add(key)
+                result.append(params)
+        return result
+
+    def encode(self, params):
+        """
+        将参数映射到单位超立方体，用于代理模型
+        候选值列表按序号等距映射，区间按取值线性映射
+
+        Returns:
+            numpy数组: 每个参数一个0-1之间的坐标
+        """
+        x = np.zeros(len(self.names))
+        for i, name in enumerate(self.names):
+            values = self.space[name]
+            if self._is_range(name):
+                low, high = values
+                x[i] = (params[name] - low) / (high - low) if high > low else 0.0
+            else:
+                x[i] = values.index(params[name]) / (len(values) - 1) if len(values) > 1 else 0.0
+        return x
+
+
+class GaussianProcess:
+    """
+    高斯过程回归（RBF核）
+    目标值标准化后拟合，长度尺度在候选值中按边际似然选取
+    """
+    def __init__(self, length_scales=(0.05, 0.1, 0.2, 0.5, 1.0), noise=1e-4):
+        """
+        Args:
+            length_scales: 候选长度尺度（单位超立方体中的距离），默认为(0.05, 0.1, 0.2, 0.5, 1.0)
+            noise: 观测噪声方差（标准化后），默认为1e-4
+        """
+        self.length_scales = length_scales
+        self.noise = noise
+
+    @staticmethod
+    def _kernel(a, b, length_scale):
+        distances = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=-1)
+        return np.exp(-0.5 * distances / length_scale ** 2)
+
+    def fit(self, x, y):
+        """
+        拟合已观测的参数和目标值
+
+        Args:
+            x: 编码后的参数二维数组
+            y: 目标值数组
+        """
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.mean = y.mean()
+        self.std = y.std() or 1.0
+        target = (y - self.mean) / self.std
+        best = None
+        for length_scale in self.length_scales:
+            k = self._kernel(self.x, self.x, length_scale) + self.noise * np.eye(len(self.x))
+            try:
+                chol = np.linalg.cholesky(k)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, target))
+            # 对数边际似然（省略常数项）
+            likelihood = -0.5 * target @ alpha - np.log(np.diag(chol)).sum()
+            if best is None or likelihood > best[0]:
+                best = (likelihood, length_scale, chol, alpha)
+        if best is None:
+            raise ValueError("高斯过程拟合失败")
+        _, self.length_scale, self._chol, self._alpha = best
+        return self
+
+    def predict(self, x):
+        """
+        预测目标值的均值和标准差
+
+        Args:
+            x: 编码后的参数二维数组
+
+        Returns:
+            tuple: (均值数组, 标准差数组)
+        """
+        k = self._kernel(np.asarray(x, dtype=float), self.x, self.length_scale)
+        mean = k @ self._alpha
+        v = np.linalg.solve(self._chol, k.T)
+        variance = np.clip(1.0 - (v ** 2).sum(axis=0), 1e-12, None)
+        return self.mean + self.std * mean, self.std * np.sqrt(variance)
+
+
+_erf = np.vectorize(math.erf, otypes=[float])
+
+
+def expected_improvement(mean, std, best, xi=0.01):
+    """
+    期望改进量：目标值超过当前最优值best的期望
+
+    Args:
+        mean: 预测均值数组
+        std: 预测标准差数组
+        best: 当前最优目标值
+        xi: 探索系数，默认为0.01
+
+    Returns:
+        numpy数组: 期望改进量
+    """
+    std = np.maximum(std, 1e-12)
+    z = (mean - best - xi) / std
+    cdf = 0.5 * (1 + _erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return (mean - best - xi) * cdf + std * pdf
+
+
+def _strategy_class(strategy):
+    if isinstance(strategy, str):
+        from framework.batch_runner import load_strategy_class
+
+        return load_strategy_class(strategy)
+    return strategy
+
+
+def run_trial(strategy, params, symbol, klines, initial_capital=100000, simulator=None):
+    """
+    以给定参数运行一次离线回测
+
+    Args:
+        strategy: 策略类或 '模块.类名' 字符串
+        params: 策略参数字典
+        symbol: 合约代码
+        klines: K线数据，pandas.DataFrame格式
+        initial_capital: 初始资金，默认为100000
+        simulator: 成交模拟器，默认为None
+
+    Returns:
+        dict: 回测结果
+    """
+    from framework.quant_framework import QuantFramework
+
+    framework = QuantFramework()
+    framework.initialize(symbol, None, None, initial_capital)
+    framework.set_strategy(_strategy_class(strategy)(**params))
+    return framework.run_offline_backtest(klines, simulator)
+
+
+# 进程池中每个进程持有的K线数据
+_worker_klines = None
+
+
+def _init_worker(klines):
+    global _worker_klines
+    _worker_klines = klines
+    reset_journal(level=WARNING)
+
+
+def _tail(klines, bars):
+    return klines if bars >= len(klines) else klines.iloc[len(klines) - bars:].reset_index(drop=True)
+
+
+def _run_window(strategy, params, symbol, bars, initial_capital, simulator):
+    return run_trial(strategy, params, symbol, _tail(_worker_klines, bars), initial_capital, simulator)
+
+
+class StrategyOptimizer:
+    """
+    策略参数优化器
+    """
+    def __init__(self, strategy, space, symbol, klines, initial_capital=100000, objective="total_return",
+                 fixed_params=None, workers=1, simulator=None, seed=0):
+        """
+        初始化优化器
+
+        Args:
+            strategy: 策略类或 '模块.类名' 字符串，并行运行时需要可以在子进程中导入
+            space: ParameterSpace实例或参数空间字典
+            symbol: 合约代码
+            klines: K线数据，pandas.DataFrame格式
+            initial_capital: 初始资金，默认为100000
+            objective: 目标值，回测结果中的字段名或接收回测结果返回数值的函数，越大越好，默认为'total_return'
+            fixed_params: 不参与搜索的策略参数，默认为None
+            workers: 并行进程数，默认为1（在当前进程中运行）
+            simulator: 成交模拟器，默认为None
+            seed: 随机数种子，默认为0
+        """
+        self.strategy = strategy
+        self.space = space if isinstance(space, ParameterSpace) else ParameterSpace(space)
+        self.symbol = symbol
+        self.klines = klines
+        self.initial_capital = initial_capital
+        self.objective = objective
+        self.fixed_params = dict(fixed_params or {})
+        self.workers = max(1, int(workers))
+        self.simulator = simulator
+        self.rng = np.random.default_rng(seed)
+        self.journal = get_journal()
+        # 全部回测记录，每条包含params、bars、score、results（失败时为error）
+        self.history = []
+        self._scores = {}
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        关闭进程池
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def score(self, results):
+        """
+        由回测结果计算目标值
+        """
+        if callable(self.objective):
+            return float(self.objective(results))
+        return float(results[self.objective])
+
+    def evaluate(self, candidates, bars=None):
+        """
+        回测一批参数，相同参数和K线长度的回测只运行一次
+
+        Args:
+            candidates: 参数字典列表
+            bars: 使用最近多少根K线，默认为None（全部K线）
+
+        Returns:
+            list: 与candidates对应的目标值，回测失败时为-inf
+        """
+        bars = min(bars or len(self.klines), len(self.klines))
+        pending = []
+        for params in candidates:
+            key = (self.space.key(params), bars)
+            if key not in self._scores and key not in {k for k, _ in pending}:
+                pending.append((key, params))
+
+        if self.workers == 1 or len(pending) <= 1:
+            outcomes = []
+            for _, params in pending:
+                try:
+                    outcomes.append(run_trial(self.strategy, dict(self.fixed_params, **params), self.symbol,
+                                              _tail(self.klines, bars), self.initial_capital, self.simulator))
+                except Exception as e:
+                    outcomes.append(e)
+        else:
+            if self._executor is None:
+                self.journal.flush()
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                     initargs=(self.klines,))
+            futures = [self._executor.submit(_run_window, self.strategy, dict(self.fixed_params, **params),
+                                             self.symbol, bars, self.initial_capital, self.simulator)
+                       for _, params in pending]
+            outcomes = [future.exception() or future.result() for future in futures]
+
+        for (key, params), outcome in zip(pending, outcomes):
+            record = {"params": params, "bars": bars}
+            if isinstance(outcome, Exception):
+                record.update(score=-math.inf, error=str(outcome))
+                self.journal.warning("optimize", "回测失败: {params}: {error}", params=params, error=str(outcome))
+            else:
+                record.update(score=self.score(outcome), results=outcome)
+            self._scores[key] = record["score"]
+            self.history.append(record)
+        return [self._scores[(self.space.key(params), bars)] for params in candidates]
+
+    def warmup_bars(self, candidates):
+        """
+        候选参数中最长的预热K线数量（策略的warmup_bars）
+
+        Args:
+            candidates: 参数字典列表
+
+        Returns:
+            int: 预热K线数量
+        """
+        strategy = _strategy_class(self.strategy)
+        return max(strategy(**dict(self.fixed_params, **params)).warmup_bars() for params in candidates)
+
+    def _summary(self, best_params, best_score, full_evaluations):
+        """
+        汇总优化结果
+        """
+        total = len(self.klines)
+        bars = sum(record["bars"] for record in self.history)
+        summary = {
+            "best_params": dict(self.fixed_params, **best_params) if best_params is not None else None,
+            "best_score": best_score,
+            "evaluations": len(self.history),
+            "full_evaluations": full_evaluations,
+            "bars_evaluated": bars,
+            # 与在全部K线上回测同样多个候选参数相比的计算量
+            "cost_ratio": bars / (total * max(full_evaluations, 1)),
+        }
+        self.journal.info("optimize", "优化结束: 最优参数 {params}，目标值 {score:.6g}，共回测 {evaluations} 次，"
+                                      "计算量为逐个回测的 {ratio:.1%}",
+                          params=summary["best_params"], score=best_score, evaluations=len(self.history),
+                          ratio=summary["cost_ratio"])
+        return summary
+
+    def successive_halving(self, candidates=None, samples=None, min_bars=None, eta=3):
+        """
+        逐轮减半搜索
+        每一轮在最近bars根K线上回测剩余的候选参数，保留目标值最高的1/eta，下一轮bars乘以eta，
+        最后一轮使用全部K线。较短区间的回测需要包含策略的预热K线，第一轮至少使用候选参数中最长预热K线数量的2倍；
+        一轮中全部候选参数的目标值相同时（如区间内都没有交易）不淘汰，直接进入下一轮
+
+        Args:
+            candidates: 候选参数列表，默认为None（samples为None时为全部网格，否则随机抽取samples个）
+            samples: 随机抽取的候选参数数量，默认为None
+            min_bars: 第一轮使用的K线数量，默认为None（按候选数量和eta确定轮数，使最后一轮恰好使用全部K线），
+                小于预热K线数量的2倍时使用预热K线数量的2倍
+            eta: 每轮保留的比例的倒数，默认为3
+
+        Returns:
+            dict: 优化结果，包含best_params、best_score、evaluations、bars_evaluated、cost_ratio
+                （计算量与在全部K线上回测全部候选参数之比）
+        """
+        if eta < 2:
+            raise ValueError("eta需要不小于2")
+        if candidates is None:
+            candidates = self.space.grid() if samples is None else self.space.sample(samples, self.rng)
+        if not candidates:
+            raise ValueError("没有满足约束的候选参数")
+        total = len(self.klines)
+        if min_bars is None:
+            rounds = 1 + int(math.log(len(candidates)) / math.log(eta) + 1e-9)
+            min_bars = total // eta ** (rounds - 1)
+        # 预热K线之后至少还要有同样多的K线产生交易，否则目标值只反映候选参数的顺序
+        min_bars = max(min_bars, 2 * self.warmup_bars(candidates), 1)
+        bars = min(min_bars, total)
+        remaining = list(candidates)
+        while True:
+            scores = self.evaluate(remaining, bars)
+            order = sorted(range(len(remaining)), key=lambda i: -scores[i])
+            self.journal.info("optimize", "逐轮减半: {count} 个候选参数，最近 {bars} 根K线，最高目标值 {score:.6g}",
+                              count=len(remaining), bars=bars, score=scores[order[0]])
+            if bars >= total:
+                best = order[0]
+                return self._summary(remaining[best], scores[best], len(candidates))
+            if scores[order[0]] != scores[order[-1]]:
+                remaining = [remaining[i] for i in order[:max(1, math.ceil(len(remaining) / eta))]]
+            bars = min(total, bars * eta)
+
+    def bayesian(self, iterations=30, initial=None, pool=1000, batch=None):
+        """
+        贝叶斯优化
+        先在全部K线上回测initial个随机参数，之后每次用高斯过程拟合已有结果，从pool个随机参数中
+        选出期望改进量最高的batch个回测，直到回测iterations个参数
+
+        Args:
+            iterations: 回测的参数总数，默认为30
+            initial: 初始随机参数数量，默认为None（参数个数的2倍，至少为5）
+            pool: 每次评估期望改进量的随机参数数量，默认为1000
+            batch: 每次回测的参数数量，默认为None（与workers相同）
+
+        Returns:
+            dict: 优化结果，格式同successive_halving
+        """
+        batch = batch or self.workers
+        initial = initial or max(5, 2 * len(self.space.names))
+        evaluated = []
+        scores = []
+        proposals = self.space.sample(min(initial, iterations), self.rng)
+        gp = GaussianProcess()
+        while proposals:
+            scores.extend(self.evaluate(proposals))
+            evaluated.extend(proposals)
+            remaining = iterations - len(evaluated)
+            if remaining <= 0:
+                break
+            finite = np.isfinite(scores)
+            if not finite.any():
+                proposals = self.space.sample(min(batch, remaining), self.rng,
+                                              {self.space.key(p) for p in evaluated})
+                continue
+            x = np.array([self.space.encode(p) for p, ok in zip(evaluated, finite) if ok])
+            gp.fit(x, np.asarray(scores)[finite])
+            pool_params = self.space.sample(pool, self.rng, {self.space.key(p) for p in evaluated})
+            if not pool_params:
+                break
+            mean, std = gp.predict(np.array([self.space.encode(p) for p in pool_params]))
+            improvement = expected_improvement(mean, std, max(np.asarray(scores)[finite]))
+            order = np.argsort(-improvement)[:min(batch, remaining)]
+            proposals = [pool_params[i] for i in order]
+        best = int(np.argmax(scores))
+        return self._summary(evaluated[best], scores[best], len(evaluated))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+绩效跟踪模块
+在账户权益每次变化时增量更新峰值、回撤、回撤持续时间、持仓时间占比，
+并在每根K线结束时更新滚动收益率，每次更新的计算量和内存占用都是固定的
+"""
+
+import math
+import numpy as np
+
+
+class PerformanceTracker:
+    """
+    增量绩效跟踪
+    当前值保存为普通属性，策略可以在每次行情更新时直接读取用于风险控制
+    """
+    def __init__(self, window=20, periods_per_year=252):
+        """
+        初始化绩效跟踪
+
+        Args:
+            window: 滚动收益率的窗口长度（K线数），默认为20
+            periods_per_year: 每年的K线数量，用于年化，默认为252
+        """
+        self.window = window
+        self.periods_per_year = periods_per_year
+        self._returns = np.zeros(window)
+        self._balances = np.zeros(window)
+        self.reset(0.0)
+
+    def reset(self, balance, time=None):
+        """
+        以初始权益重置全部统计量
+
+        Args:
+            balance: 初始权益
+            time: 当前时间，纳秒时间戳，默认为None（以更新次数计时）
+        """
+        self.balance = balance
+        self.peak = balance
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.drawdown_duration = 0
+        self.max_drawdown_duration = 0
+        self.update_count = 0
+        self.exposed = False
+        # 未指定起始时间时以第一次更新的时间为起点
+        self._peak_time = time
+        self._last_time = time
+        self._total_time = 0
+        self._exposed_time = 0
+        # 滚动收益率环形缓冲区
+        self._period_balance = balance
+        self._pos = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def update(self, balance, time=None, exposed=False):
+        """
+        记录一次权益变化
+
+        Args:
+            balance: 当前权益
+            time: 当前时间，纳秒时间戳，默认为None（以更新次数计时）
+            exposed: 当前是否持仓
+
+        Returns:
+            当前回撤比例
+        """
+        self.update_count += 1
+        if time is None:
+            time = self.update_count
+        if self._last_time is None:
+            self._last_time = self._peak_time = time
+        elapsed = time - self._last_time
+        if elapsed > 0:
+            self._total_time += elapsed
+            if self.exposed:
+                self._exposed_time += elapsed
+            self._last_time = time
+        self.exposed = exposed
+        self.balance = balance
+
+        if balance >= self.peak:
+            self.peak = balance
+            self._peak_time = time
+            self.drawdown = 0.0
+            self.drawdown_duration = 0
+        else:
+            self.drawdown = (self.peak - balance) / self.peak if self.peak > 0 else 0.0
+            self.drawdown_duration = time - self._peak_time
+            if self.drawdown > self.max_drawdown:
+                self.max_drawdown = self.drawdown
+            if self.drawdown_duration > self.max_drawdown_duration:
+                self.max_drawdown_duration = self.drawdown_duration
+        return self.drawdown
+
+    def close_period(self):
+        """
+        结束一个K线周期，将该周期的收益率计入滚动窗口
+        """
+        prev = self._period_balance
+        ret = self.balance / prev - 1 if prev > 0 else 0.0
+        if self._count == self.window:
+            old = self._returns[self._pos]
+            self._sum -= old
+            self._sum_sq -= old * old
+        else:
+            self._count += 1
+        self._returns[self._pos] = ret
+        self._balances[self._pos] = prev
+        self._pos = (self._pos + 1) % self.window
+        self._sum += ret
+        self._sum_sq += ret * ret
+        self._period_balance = self.balance
+
+    @property
+    def exposure(self):
+        """
+        持仓时间占比
+        """
+        return self._exposed_time / self._total_time if self._total_time > 0 else 0.0
+
+    @property
+    def rolling_return(self):
+        """
+        滚动窗口内的累计收益率
+        """
+        if self._count == 0:
+            return 0.0
+        # 窗口内最早一个周期的期初权益
+        start = self._balances[self._pos if self._count == self.window else 0]
+        return self._period_balance / start - 1 if start > 0 else 0.0
+
+    @property
+    def rolling_volatility(self):
+        """
+        滚动窗口内单周期收益率的标准差，数据不足时为None
+        """
+        if self._count < 2:
+            return None
+        mean = self._sum / self._count
+        variance = (self._sum_sq - self._count * mean * mean) / (self._count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def rolling_sharpe(self):
+        """
+        滚动窗口内的年化夏普比率（无风险利率取0），数据不足或波动为0时为None
+        """
+        volatility = self.rolling_volatility
+        if not volatility:
+            return None
+        return self._sum / self._count / volatility * math.sqrt(self.periods_per_year)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+仓位管理与风险控制模块
+根据ATR或波动率目标计算目标手数，并按保证金占用和持仓敞口上限进行约束
+所有统计量均为增量更新，每根K线的计算量为O(1)
+"""
+
+import math
+import numpy as np
+
+
+class RollingATR:
+    """
+    增量计算的平均真实波幅（Wilder平滑）
+    """
+    def __init__(self, period=14):
+        """
+        初始化ATR
+
+        Args:
+            period: ATR周期，默认为14
+        """
+        self.period = period
+        self.value = None
+        self.count = 0
+        self._prev_close = None
+        self._sum = 0.0
+
+    def update(self, high, low, close):
+        """
+        使用一根已完成的K线更新ATR
+
+        Args:
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+
+        Returns:
+            当前ATR，数据不足时为None
+        """
+        if self._prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high, self._prev_close) - min(low, self._prev_close)
+        self._prev_close = close
+        self.count += 1
+
+        if self.count <= self.period:
+            # 前period根K线取简单平均作为初始值
+            self._sum += true_range
+            if self.count == self.period:
+                self.value = self._sum / self.period
+        else:
+            self.value += (true_range - self.value) / self.period
+        return self.value
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+
+class RollingVolatility:
+    """
+    增量计算的滚动收益率波动率
+    使用固定长度的环形缓冲区保存对数收益率，并维护和与平方和
+    """
+    def __init__(self, window=20):
+        """
+        初始化滚动波动率
+
+        Args:
+            window: 滚动窗口长度，默认为20
+        """
+        self.window = window
+        self._returns = np.zeros(window)
+        self._pos = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._prev_close = None
+
+    def update(self, close):
+        """
+        使用一根已完成K线的收盘价更新波动率
+
+        Args:
+            close: 收盘价
+
+        Returns:
+            当前单周期波动率，数据不足时为None
+        """
+        if self._prev_close is not None and self._prev_close > 0 and close > 0:
+            ret = math.log(close / self._prev_close)
+            old = self._returns[self._pos]
+            if self._count == self.window:
+                self._sum -= old
+                self._sum_sq -= old * old
+            else:
+                self._count += 1
+            self._returns[self._pos] = ret
+            self._pos = (self._pos + 1) % self.window
+            self._sum += ret
+            self._sum_sq += ret * ret
+        self._prev_close = close
+        return self.value
+
+    @property
+    def value(self):
+        if self._count < 2:
+            return None
+        mean = self._sum / self._count
+        variance = (self._sum_sq - self._count * mean * mean) / (self._count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def ready(self):
+        return self._count == self.window
+
+
+class PositionSizer:
+    """
+    仓位计算基类
+    子类实现target_volume方法，需要历史统计量的子类同时实现update方法
+    """
+    def update(self, high, low, close):
+        """
+        使用一根已完成的K线更新统计量
+
+        Args:
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+        """
+        pass
+
+    def target_volume(self, price, balance, spec):
+        """
+        计算目标持仓手数（不含方向）
+
+        Args:
+            price: 当前价格
+            balance: 账户权益
+            spec: 合约参数，ContractSpec实例
+
+        Returns:
+            目标手数，非负整数
+        """
+        raise NotImplementedError("子类必须实现target_volume方法")
+
+
+class FixedVolumeSizer(PositionSizer):
+    """
+    固定手数
+    """
+    def __init__(self, volume=1):
+        """
+        初始化固定手数仓位
+
+        Args:
+            volume: 固定手数，默认为1
+        """
+        self.volume = volume
+
+    def target_volume(self, price, balance, spec):
+        return self.volume
+
+
+class ATRSizer(PositionSizer):
+    """
+    ATR风险仓位
+    每笔交易承担的风险为账户权益的固定比例，单手风险为 ATR × 倍数 × 合约乘数
+    """
+    def __init__(self, risk_fraction=0.01, atr_period=14, atr_multiple=2.0, warmup_volume=1):
+        """
+        初始化ATR风险仓位
+
+        Args:
+            risk_fraction: 每笔交易承担的风险占权益的比例，默认为0.01
+            atr_period: ATR周期，默认为14
+            atr_multiple: 止损距离对应的ATR倍数，默认为2
+            warmup_volume: ATR数据不足时使用的手数，默认为1
+        """
+        self.risk_fraction = risk_fraction
+        self.atr_multiple = atr_multiple
+        self.warmup_volume = warmup_volume
+        self.atr = RollingATR(atr_period)
+
+    def update(self, high, low, close):
+        self.atr.update(high, low, close)
+
+    def target_volume(self, price, balance, spec):
+        if not self.atr.ready or self.atr.value <= 0:
+            return self.warmup_volume
+        risk_per_lot = self.atr.value * self.atr_multiple * spec.multiplier
+        return int(balance * self.risk_fraction // risk_per_lot)
+
+
+class VolatilityTargetSizer(PositionSizer):
+    """
+    波动率目标仓位
+    使持仓市值的年化波动率接近目标波动率
+    """
+    def __init__(self, target_volatility=0.15, window=20, periods_per_year=252, warmup_volume=1):
+        """
+        初始化波动率目标仓位
+
+        Args:
+            target_volatility: 目标年化波动率（相对于账户权益），默认为0.15
+            window: 波动率滚动窗口，默认为20
+            periods_per_year: 每年K线数量，日线为252
+            warmup_volume: 波动率数据不足时使用的手数，默认为1
+        """
+        self.target_volatility = target_volatility
+        self.periods_per_year = periods_per_year
+        self.warmup_volume = warmup_volume
+        self.volatility = RollingVolatility(window)
+
+    def update(self, high, low, close):
+        self.volatility.update(close)
+
+    def target_volume(self, price, balance, spec):
+        sigma = self.volatility.value
+        if not self.volatility.ready or not sigma:
+            return self.warmup_volume
+        annual_sigma = sigma * math.sqrt(self.periods_per_year)
+        notional_per_lot = price * spec.multiplier
+        return int(balance * self.target_volatility // (notional_per_lot * annual_sigma))
+
+
+class RiskManager:
+    """
+    风险控制
+    对目标手数施加单品种手数上限、单品种敞口上限、组合敞口上限和保证金占用上限
+    同一个实例可以在多个策略之间共享，用于控制组合层面的总敞口
+    """
+    def __init__(self, max_volume=None, max_symbol_exposure=None, max_portfolio_exposure=None,
+                 max_margin_ratio=None):
+        """
+        初始化风险控制
+
+        Args:
+            max_volume: 单品种最大手数，默认为None（不限制）
+            max_symbol_exposure: 单品种持仓市值占权益的最大比例，默认为None
+            max_portfolio_exposure: 所有品种持仓市值之和占权益的最大比例，默认为None
+            max_margin_ratio: 所有品种保证金之和占权益的最大比例，默认为None
+        """
+        self.max_volume = max_volume
+        self.max_symbol_exposure = max_symbol_exposure
+        self.max_portfolio_exposure = max_portfolio_exposure
+        self.max_margin_ratio = max_margin_ratio
+        # 各品种当前持仓市值和保证金
+        self.exposures = {}
+        self.margins = {}
+
+    def limit(self, symbol, volume, price, balance, spec):
+        """
+        按风险限制约束目标手数，并登记约束后的敞口
+
+        Args:
+            symbol: 交易品种代码
+            volume: 目标手数（不含方向）
+            price: 当前价格
+            balance: 账户权益
+            spec: 合约参数，ContractSpec实例
+
+        Returns:
+            约束后的目标手数
+        """
+        notional_per_lot = price * spec.multiplier
+        margin_per_lot = notional_per_lot * spec.margin_rate
+        caps = [volume]
+
+        if self.max_volume is not None:
+            caps.append(self.max_volume)
+        if notional_per_lot > 0 and balance > 0:
+            if self.max_symbol_exposure is not None:
+                caps.append(balance * self.max_symbol_exposure // notional_per_lot)
+            if self.max_portfolio_exposure is not None:
+                others = sum(v for s, v in self.exposures.items() if s != symbol)
+                caps.append((balance * self.max_portfolio_exposure - others) // notional_per_lot)
+            if self.max_margin_ratio is not None:
+                others = sum(v for s, v in self.margins.items() if s != symbol)
+                caps.append((balance * self.max_margin_ratio - others) // margin_per_lot)
+
+        allowed = max(int(min(caps)), 0)
+        self.exposures[symbol] = allowed * notional_per_lot
+        self.margins[symbol] = allowed * margin_per_lot
+        return allowed
+
+    def release(self, symbol):
+        """
+        平仓后释放品种登记的敞口和保证金
+
+        Args:
+            symbol: 交易品种代码
+        """
+        self.exposures.pop(symbol, None)
+        self.margins.pop(symbol, None)
@@ -6,8 +6,20 @@
 提供回测、策略运行的基本结构
 """
 
-from datetime import date
-from tqsdk import TqApi, TqAuth, TqBacktest, TqSim
+import os
+import shutil
+import time
+from itertools import islice
+import numpy as np
+from framework.contracts import get_contract_spec
+from framework.position_sizing import FixedVolumeSizer
+from framework.performance_tracker import PerformanceTracker
+from framework.event_journal import get_journal
+from framework.local_store import slice_klines
+from framework.kline_view import KlineView
+from framework.runtime_metrics import StrategyInstruments, get_metrics
+
+# tqsdk、pandas和离线回测引擎只在用到时导入，只做计算的进程无需加载网络和数据处理库
 
 class QuantFramework:
     """
@@ -24,6 +36,7 @@ class QuantFramework:
         self.end_date = None
         self.initial_capital = None
         self.auth = None
+        self.journal = get_journal()
     
     def initialize(self, symbol, start_date, end_date, initial_capital=100000, tq_account=None, tq_password=None):
         """
@@ -44,6 +57,7 @@ class QuantFramework:
         
         # 设置认证信息
         if tq_account and tq_password:
+            from tqsdk import TqAuth
             self.auth = TqAuth(tq_account, tq_password)
         else:
             self.auth = None
@@ -67,11 +81,15 @@ class QuantFramework:
         if not self.symbol or not self.start_date or not self.end_date:
             raise ValueError("请先初始化回测参数")
         
-        print(f"开始回测 {self.symbol} 策略...")
-        print(f"回测区间: {self.start_date} 至 {self.end_date}")
-        print(f"初始资金: {self.initial_capital}")
+        self.journal.info("backtest", "开始回测 {symbol} 策略...", symbol=self.symbol)
+        self.journal.info("backtest", "回测区间: {start} 至 {end}", start=self.start_date, end=self.end_date)
+        self.journal.info("backtest", "初始资金: {capital}", capital=self.initial_capital)
+        
+        from tqsdk.exceptions import BacktestFinished
         
         try:
+            from tqsdk import TqApi, TqBacktest, TqSim
+            
             # 创建API实例，设置回测模式
             self.api = TqApi(
                 TqSim(init_balance=self.initial_capital), 
@@ -88,29 +106,150 @@ class QuantFramework:
             # 输出回测结果
             self._output_results()
             
+        except BacktestFinished:
+            # 记录最后的成交和权益后输出回测结果
+            self.strategy.finalize_performance()
+            self._output_results()
         except Exception as e:
-            print(f"回测过程中出现错误: {e}")
+            # 记录后继续抛出，批量任务据此将任务标记为失败
+            self.journal.error("error", "回测过程中出现错误: {error}", error=str(e))
+            raise
         finally:
             # 关闭API实例
             if self.api:
                 self.api.close()
+            self._close_trade_journal()
+            self.journal.flush()
+    
+    def run_offline_backtest(self, klines, simulator=None, cache=None):
+        """
+        使用本地K线数据运行离线回测
+        成交由ExecutionSimulator模拟，不需要连接天勤服务器
+        
+        Args:
+            klines: K线数据，pandas.DataFrame格式
+            simulator: 成交模拟器，默认为None（使用默认参数）
+            cache: 结果缓存ResultCache，默认为None（不使用缓存）。命中缓存时直接返回结果，
+                不创建api；策略挂载了成交与权益记录时，从缓存中复制记录文件
+        
+        Returns:
+            dict: 回测结果
+        """
+        if not self.strategy:
+            raise ValueError("请先设置交易策略")
+        
+        if not self.symbol:
+            raise ValueError("请先初始化回测参数")
+        
+        klines = self._slice_klines(klines)
+        if cache is None:
+            return self._run_offline(klines, simulator)
+        
+        from framework.result_cache import backtest_cache_key
+        
+        key = backtest_cache_key(self.strategy, self.symbol, self.start_date, self.end_date,
+                                 self.initial_capital, klines, simulator)
+        trade_journal = self.strategy.trade_journal
+        computed = []
+        
+        def compute(directory):
+            computed.append(directory)
+            if trade_journal is None:
+                # 未挂载记录时在缓存条目中保存一份，计算完成后卸下
+                from framework.trade_journal import TradeJournal
+                self.strategy.attach_trade_journal(TradeJournal(os.path.join(directory, "journal"),
+                                                                metadata={"symbol": self.symbol}))
+            try:
+                results = self._run_offline(klines, simulator)
+            finally:
+                if trade_journal is None:
+                    self.strategy.trade_journal = None
+            if trade_journal is not None and trade_journal.directory:
+                shutil.copytree(trade_journal.directory, os.path.join(directory, "journal"))
+            return results
+        
+        results = cache.get_or_compute(key, compute)
+        if not computed:
+            # 命中缓存
+            cached_journal = os.path.join(cache.entry_dir(key), "journal")
+            if trade_journal is not None and trade_journal.directory and os.path.isdir(cached_journal):
+                shutil.copytree(cached_journal, trade_journal.directory, dirs_exist_ok=True)
+            self._output_results(results)
+            self.journal.flush()
+        return results
+    
+    def _run_offline(self, klines, simulator):
+        """
+        运行离线回测并返回结果
+        """
+        from framework.offline_engine import OfflineApi, BacktestFinished
+        
+        self.api = OfflineApi(klines, self.symbol, init_balance=self.initial_capital, simulator=simulator)
+        try:
+            self.strategy.initialize(self.api, self.symbol)
+            self.strategy.run()
+        except BacktestFinished:
+            # 记录最后一根K线收盘时的成交和权益
+            self.strategy.finalize_performance()
+        finally:
+            self.api.close()
+            self._close_trade_journal()
+        
+        self._output_results()
+        self.journal.flush()
+        return self.get_results()
+    
+    def _slice_klines(self, klines):
+        """
+        按回测区间截取K线数据
+        """
+        return slice_klines(klines, self.start_date, self.end_date)
+    
+    def _close_trade_journal(self):
+        """
+        回测结束后写出策略的成交与权益记录
+        """
+        if self.strategy.trade_journal is not None:
+            self.strategy.trade_journal.close()
     
-    def _output_results(self):
+    def get_results(self):
+        """
+        获取回测结果
+        
+        Returns:
+            dict: 包含最终资金、总收益率、最大回撤和交易次数
+        """
+        if not self.api:
+            return {}
+        account = self.api.get_account()
+        total_return = 0
+        if self.initial_capital > 0:
+            total_return = (account.balance - self.initial_capital) / self.initial_capital
+        return {
+            "final_balance": float(account.balance),
+            "total_return": float(total_return),
+            "max_drawdown": float(self.strategy.max_drawdown),
+            "trade_count": int(self.strategy.trade_count),
+        }
+    
+    def _output_results(self, results=None):
         """
         输出回测结果
+        
+        Args:
+            results: 回测结果，默认为None（从api读取）
         """
-        if self.api:
-            # 获取账户信息
-            account = self.api.get_account()
-            print(f"\n回测结果:")
-            print(f"最终资金: {account.balance:.2f}")
-            print(f"最大回撤: {(self.strategy.max_drawdown * 100):.2f}%")
-            print(f"交易次数: {self.strategy.trade_count}")
+        if results is None and self.api:
+            results = self.get_results()
+        if results:
+            self.journal.info("result", "\n回测结果:")
+            self.journal.info("result", "最终资金: {final_balance:.2f}", final_balance=results['final_balance'])
+            self.journal.info("result", "最大回撤: {max_drawdown:.2%}", max_drawdown=results['max_drawdown'])
+            self.journal.info("result", "交易次数: {trade_count}", trade_count=results['trade_count'])
             
             # 计算收益率
             if self.initial_capital > 0:
-                total_return = (account.balance - self.initial_capital) / self.initial_capital * 100
-                print(f"总收益率: {total_return:.2f}%")
+                self.journal.info("result", "总收益率: {total_return:.2%}", total_return=results['total_return'])
 
 class StrategyBase:
     """
@@ -126,6 +265,34 @@ class StrategyBase:
         self.trade_count = 0
         self.max_drawdown = 0
         self.highest_balance = 0
+        self.target_pos = None
+        self.position = 0
+        self.contract_spec = None
+        # 仓位计算和风险控制，默认为固定1手
+        self.position_sizer = FixedVolumeSizer(1)
+        self.risk_manager = None
+        self.journal = get_journal()
+        # 绩效跟踪，策略可以读取其中的回撤等指标用于风险控制
+        self.performance = PerformanceTracker()
+        self._account = None
+        self._last_bar_datetime = None
+        # K线序列及其列视图
+        self.klines = None
+        self._bars = None
+        # 行情数据源，默认为None（使用api）；多进程运行时可以设置为行情总线的订阅端
+        self.data_source = None
+        # 运行时指标，调用enable_metrics后在initialize中创建
+        self.metrics_registry = None
+        self.instruments = None
+        # 成交与权益记录
+        self.trade_journal = None
+        self._trades = None
+        self._recorded_trades = 0
+        self._journal_position = 0
+        # 状态快照，挂载后在initialize之后第一次wait_update返回时恢复
+        self.snapshot = None
+        self._restore_pending = False
+        self._state_changed = False
         
     def initialize(self, api, symbol):
         """
@@ -137,7 +304,252 @@ class StrategyBase:
         """
         self.api = api
         self.symbol = symbol
-        self.highest_balance = api.get_account().balance
+        self.contract_spec = get_contract_spec(symbol)
+        # 账户对象由api原地更新，只需获取一次
+        self._account = api.get_account()
+        self.highest_balance = self._account.balance
+        self.performance.reset(self._account.balance)
+        self._last_bar_datetime = None
+        if self.trade_journal is not None:
+            self._trades = api.get_trade()
+            self._recorded_trades = 0
+            self._journal_position = 0
+        if self.metrics_registry is not None:
+            self.instruments = StrategyInstruments(self.metrics_registry, type(self).__name__, symbol)
+        self._restore_pending = self.snapshot is not None
+        self._state_changed = False
+        
+    def attach_trade_journal(self, journal):
+        """
+        挂载成交与权益记录
+        
+        Args:
+            journal: TradeJournal实例
+        """
+        self.trade_journal = journal
+
+    def warmup_bars(self):
+        """
+        产生第一个交易信号前需要的K线数量，参数优化在较短区间上回测时以此为下限
+
+        Returns:
+            int: 预热K线数量，默认为0
+        """
+        return 0
+
+    def attach_snapshot(self, snapshot):
+        """
+        挂载状态快照，在initialize之前调用
+        之后持仓变化时立即保存快照，新K线产生时按快照的间隔保存；
+        initialize之后第一次wait_update返回时从快照恢复状态（见restore_snapshot）
+        
+        Args:
+            snapshot: framework.state_snapshot.StateSnapshot实例
+        """
+        self.snapshot = snapshot
+        
+    def get_state(self):
+        """
+        获取需要保存到快照中的策略状态
+        子类应扩展此方法，加入指标、信号和筹码分布等增量计算的状态，使恢复后只需计入快照之后的K线
+        
+        Returns:
+            dict: 可以pickle的状态
+        """
+        return {
+            "position": self.position,
+            "trade_count": self.trade_count,
+            "highest_balance": self.highest_balance,
+            "max_drawdown": self.max_drawdown,
+            "last_bar_datetime": self._last_bar_datetime,
+            "performance": self.performance,
+            "position_sizer": self.position_sizer,
+        }
+        
+    def set_state(self, state):
+        """
+        从快照中的状态恢复，子类扩展get_state时应同时扩展此方法
+        
+        Args:
+            state: get_state返回的状态
+        """
+        self.position = state["position"]
+        self.trade_count = state["trade_count"]
+        self.highest_balance = state["highest_balance"]
+        self.max_drawdown = state["max_drawdown"]
+        self._last_bar_datetime = state["last_bar_datetime"]
+        self.performance = state["performance"]
+        self.position_sizer = state["position_sizer"]
+        
+    def restore_snapshot(self):
+        """
+        从快照恢复策略状态，并以账户中的实际持仓为准核对持仓
+        挂载了快照时在initialize之后第一次wait_update返回时自动调用，此时子类的initialize已经完成
+        
+        Returns:
+            bool: 恢复了状态时返回True
+        """
+        self._restore_pending = False
+        if self.snapshot is None:
+            return False
+        payload = self.snapshot.load(self)
+        if payload is None:
+            return False
+        self.set_state(payload["state"])
+        self.journal.info("snapshot", "从快照恢复策略状态: {symbol} 持仓 {position}手，快照保存于 {age:.0f} 秒前",
+                          symbol=self.symbol, position=self.position, age=time.time() - payload["saved_at"])
+        position = self._account_position()
+        if position is not None and position != self.position:
+            self.journal.warning("snapshot", "快照持仓 {saved}手与账户持仓 {actual}手不一致，以账户持仓为准",
+                                 saved=self.position, actual=position)
+            self.position = position
+        return True
+        
+    def _account_position(self):
+        """
+        账户中的实际净持仓，api不提供持仓时返回None
+        """
+        get_position = getattr(self.api, "get_position", None)
+        if get_position is None:
+            return None
+        pos = getattr(get_position(self.symbol), "pos", None)
+        return None if pos is None or pos != pos else int(pos)
+        
+    def enable_metrics(self, registry=None):
+        """
+        启用运行时指标，在initialize之前调用
+        wait_update记录唤醒次数、等待时间和两次唤醒之间的处理耗时，update_performance记录新K线
+
+        Args:
+            registry: MetricsRegistry实例，默认为None（全局注册表）
+        """
+        self.metrics_registry = registry or get_metrics()
+        if self.symbol is not None:
+            self.instruments = StrategyInstruments(self.metrics_registry, type(self).__name__, self.symbol)
+        
+    def set_data_source(self, source):
+        """
+        设置行情数据源
+        设置后get_kline_serial和wait_update使用数据源的行情，api只用于账户和委托
+
+        Args:
+            source: 提供get_kline_serial、wait_update和is_changing接口的对象，
+                如framework.market_data_bus.MarketDataSubscriber；为None时恢复使用api
+        """
+        self.data_source = source
+        
+    def get_kline_serial(self, symbol, duration_seconds, data_length=200):
+        """
+        从行情数据源获取K线序列，策略应使用此方法代替api.get_kline_serial
+        
+        Args:
+            symbol: 交易品种代码
+            duration_seconds: K线周期，单位为秒
+            data_length: K线序列长度，默认为200
+        
+        Returns:
+            K线序列，pandas.DataFrame格式
+        """
+        source = self.data_source if self.data_source is not None else self.api
+        return source.get_kline_serial(symbol, duration_seconds, data_length=data_length)
+        
+    def wait_update(self, deadline=None):
+        """
+        等待行情更新，策略应使用此方法代替api.wait_update
+        设置了行情数据源时等待数据源的新行情，之后不阻塞地处理api（TqApi）上的账户和委托更新
+        
+        Args:
+            deadline: 等待截止时间（time.time()的时间戳），默认为None（一直等待）
+        
+        Returns:
+            bool: 有新行情时返回True
+        """
+        instruments = self.instruments
+        if instruments is None:
+            updated = self._wait_update(deadline)
+        else:
+            started = instruments.before_wait()
+            try:
+                updated = self._wait_update(deadline)
+            finally:
+                instruments.after_wait(started)
+        if self._restore_pending:
+            self.restore_snapshot()
+        return updated
+        
+    def _wait_update(self, deadline):
+        source = self.data_source
+        if source is None or source is self.api:
+            return self.api.wait_update(deadline=deadline)
+        updated = source.wait_update(deadline)
+        if self.api is not None:
+            self.api.wait_update(deadline=time.time())
+        return updated
+        
+    def set_position_sizer(self, sizer, risk_manager=None):
+        """
+        设置仓位计算和风险控制
+        
+        Args:
+            sizer: 仓位计算实例，PositionSizer的子类
+            risk_manager: 风险控制实例，默认为None（不限制）
+        """
+        self.position_sizer = sizer
+        self.risk_manager = risk_manager
+        
+    def update_position_sizer(self, high, low, close):
+        """
+        使用一根已完成的K线更新仓位计算所需的统计量
+        
+        Args:
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+        """
+        if not (np.isnan(high) or np.isnan(low) or np.isnan(close)):
+            self.position_sizer.update(high, low, close)
+        
+    def set_target_direction(self, direction, price):
+        """
+        根据信号方向设置目标持仓
+        目标手数由仓位计算得出，再经过风险控制约束
+        
+        Args:
+            direction: 信号方向，1为做多，-1为做空，0为平仓
+            price: 当前价格
+        
+        Returns:
+            带方向的目标持仓手数
+        """
+        volume = 0
+        if direction != 0:
+            balance = self.api.get_account().balance
+            volume = self.position_sizer.target_volume(price, balance, self.contract_spec)
+            if self.risk_manager is not None:
+                volume = self.risk_manager.limit(self.symbol, volume, price, balance, self.contract_spec)
+        elif self.risk_manager is not None:
+            self.risk_manager.release(self.symbol)
+        target = direction * volume
+        self.journal.debug("order", "设置目标持仓: {symbol} {target}手", symbol=self.symbol, target=target,
+                           price=price)
+        self.target_pos.set_target_volume(target)
+        self.position = target
+        self._state_changed = True
+        return target
+        
+    def create_target_pos_task(self):
+        """
+        创建目标持仓任务
+        离线回测API提供自己的目标持仓任务，其他情况使用天勤的TargetPosTask
+        
+        Returns:
+            目标持仓任务实例
+        """
+        factory = getattr(self.api, "create_target_pos_task", None)
+        if factory is not None:
+            return factory(self.symbol)
+        from tqsdk import TargetPosTask
+        return TargetPosTask(self.api, self.symbol)
         
     def run(self):
         """
@@ -146,19 +558,102 @@ class StrategyBase:
         """
         raise NotImplementedError("子类必须实现run方法")
         
+    @property
+    def bars(self):
+        """
+        当前K线序列的列视图，如 self.bars.close[-1]
+        视图在K线序列被替换或长度变化时重新获取，行情原地更新时无需刷新；没有K线序列时为None
+        """
+        klines = self.klines
+        if klines is None:
+            return None
+        view = self._bars
+        if view is None or view.source is not klines or view.is_stale():
+            view = self._bars = KlineView(klines)
+        return view
+    
     def update_performance(self):
         """
         更新策略性能指标
+        应在每次wait_update之后调用：账户权益变化时增量更新回撤等指标，可以捕捉K线内部的回撤；
+        新K线产生时结束上一个周期的滚动收益率，并写入成交与权益记录
         """
-        if self.api:
-            account = self.api.get_account()
-            
-            # 更新最高资金
-            if account.balance > self.highest_balance:
-                self.highest_balance = account.balance
-            
-            # 计算最大回撤
-            if self.highest_balance > 0:
-                current_drawdown = (self.highest_balance - account.balance) / self.highest_balance
-                if current_drawdown > self.max_drawdown:
-                    self.max_drawdown = current_drawdown
\ No newline at end of file
+        account = self._account
+        if account is None:
+            return
+        
+        time = None
+        new_bar = False
+        bars = self.bars
+        if bars is not None and len(bars) > 0:
+            time = bars.datetime[-1]
+            if time == time:
+                time = int(time)
+                new_bar = time != self._last_bar_datetime
+            else:
+                time = None
+        
+        if self.api.is_changing(account, "balance") or new_bar:
+            self._update_tracker(account, time)
+        
+        if new_bar:
+            if self._last_bar_datetime is not None:
+                self.performance.close_period()
+            self._last_bar_datetime = time
+            if self.instruments is not None:
+                self.instruments.on_bar(time)
+        
+        if self.trade_journal is not None:
+            self._record_journal(account, new_bar)
+        
+        if self.snapshot is not None and (new_bar or self._state_changed):
+            # 持仓变化时立即保存，新K线按间隔保存
+            self.snapshot.maybe_save(self, force=self._state_changed)
+            self._state_changed = False
+    
+    def finalize_performance(self):
+        """
+        回测结束时更新性能指标，并写入最后的成交和权益
+        """
+        account = self._account
+        if account is None:
+            return
+        self._update_tracker(account, self._last_bar_datetime)
+        self.performance.close_period()
+        if self.trade_journal is not None:
+            self._record_journal(account, True)
+        if self.snapshot is not None:
+            self.snapshot.save(self)
+    
+    def _update_tracker(self, account, time):
+        """
+        将当前权益计入绩效跟踪，并同步最高资金和最大回撤
+        """
+        tracker = self.performance
+        tracker.update(account.balance, time, self.position != 0)
+        self.highest_balance = tracker.peak
+        self.max_drawdown = tracker.max_drawdown
+    
+    def _record_journal(self, account, record_equity):
+        """
+        将新增成交写入成交与权益记录，record_equity为True时同时写入当前权益
+        """
+        if self._trades is not None and len(self._trades) > self._recorded_trades:
+            for trade in islice(self._trades.values(), self._recorded_trades, None):
+                volume = trade.volume if trade.direction == "BUY" else -trade.volume
+                commission = getattr(trade, "commission", None)
+                if commission is None:
+                    spec = self.contract_spec
+                    commission = trade.volume * (spec.commission_per_lot +
+                                                 spec.commission_rate * trade.price * spec.multiplier)
+                self._journal_position += volume
+                self.trade_journal.record_trade(trade.trade_date_time, volume, trade.price, commission,
+                                                self._journal_position)
+            self._recorded_trades = len(self._trades)
+        
+        bars = self.bars
+        if record_equity and bars is not None and len(bars) > 0:
+            datetime = bars.datetime[-1]
+            price = bars.close[-1]
+            if datetime == datetime:
+                self.trade_journal.record_equity(int(datetime), account.balance, self._journal_position, price)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+回测结果缓存模块
+按内容寻址缓存回测和筹码分布的计算结果：缓存键由策略类源码、framework和analysis_tools的全部源码、
+策略参数、品种和日期区间以及输入K线数据的指纹计算，任何一项变化都会得到新的缓存键。
+每个缓存条目是一个目录，包含结果 result.json 以及计算时写入的成交与权益记录等文件，
+总大小超过上限时按最近使用时间淘汰。
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from framework.event_journal import get_journal
+from framework.local_store import atomic_write_json
+
+# 参与K线指纹计算的字段
+FINGERPRINT_FIELDS = ["datetime", "open", "high", "low", "close", "volume", "open_oi", "close_oi", "open_interest"]
+
+# 运行时对象，不属于策略参数
+_RUNTIME_ATTRIBUTES = {"api", "journal", "target_pos", "trade_journal", "klines", "_bars", "data_source",
+                       "metrics_registry", "instruments", "snapshot"}
+
+RESULT_FILE = "result.json"
+
+# 源码全部计入指纹的包，策略可能直接或间接使用其中的任何模块
+SOURCE_PACKAGES = ["framework", "analysis_tools"]
+
+
+def data_fingerprint(klines):
+    """
+    计算K线数据的指纹
+
+    Args:
+        klines: K线数据，pandas.DataFrame格式
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256(str(len(klines)).encode())
+    for field in FINGERPRINT_FIELDS:
+        if field in klines.columns:
+            digest.update(field.encode())
+            digest.update(np.ascontiguousarray(klines[field].to_numpy()).tobytes())
+    return digest.hexdigest()
+
+
+def describe_object(obj, classes=None, depth=2):
+    """
+    提取对象的类名和参数属性，用于计算缓存键
+    只保留标量、列表和字典等可序列化的属性，嵌套对象最多展开depth层
+
+    Args:
+        obj: 任意对象
+        classes: 集合，收集遇到的类，用于计算源码指纹，默认为None
+        depth: 嵌套对象展开层数，默认为2
+
+    Returns:
+        可序列化为JSON的描述
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (list, tuple)):
+        return [describe_object(value, classes, depth) for value in obj]
+    if isinstance(obj, dict):
+        return {str(key): describe_object(value, classes, depth) for key, value in sorted(obj.items(), key=str)}
+    if isinstance(obj, np.ndarray) or callable(obj):
+        return None
+
+    cls = type(obj)
+    if classes is not None:
+        classes.add(cls)
+    description = {"__class__": f"{cls.__module__}.{cls.__qualname__}"}
+    if depth > 0 and hasattr(obj, "__dict__"):
+        for key, value in sorted(vars(obj).items()):
+            if key not in _RUNTIME_ATTRIBUTES:
+                description[key] = describe_object(value, classes, depth - 1)
+    return description
+
+
+def source_tree_fingerprint(packages=None):
+    """
+    计算包目录下全部Python源码的指纹
+
+    Args:
+        packages: 包名列表，默认为None（使用SOURCE_PACKAGES）
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for package in packages or SOURCE_PACKAGES:
+        spec = importlib.util.find_spec(package)
+        for root in (spec.submodule_search_locations or []) if spec else []:
+            for directory, dirnames, filenames in os.walk(root):
+                dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+                for filename in sorted(f for f in filenames if f.endswith(".py")):
+                    path = os.path.join(directory, filename)
+                    digest.update(os.path.relpath(path, root).replace(os.sep, "/").encode("utf-8"))
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def code_fingerprint(*objects):
+    """
+    计算类（包括其全部基类）或模块源码的指纹
+    SOURCE_PACKAGES中全部模块的源码总是计入，策略类所在模块之外的依赖变化同样会使缓存失效
+
+    Args:
+        *objects: 类或模块
+
+    Returns:
+        str: 十六进制摘要
+    """
+    sources = {source_tree_fingerprint()}
+    for obj in objects:
+        for item in (obj.__mro__ if inspect.isclass(obj) else (obj,)):
+            if item is object:
+                continue
+            try:
+                sources.add(inspect.getsource(item))
+            except (OSError, TypeError):
+                # 内置类型或交互环境中定义的类没有源码，使用名称代替
+                sources.add(getattr(item, "__qualname__", repr(item)))
+    digest = hashlib.sha256()
+    for source in sorted(sources):
+        digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def make_cache_key(kind, code, params, klines=None, **fields):
+    """
+    计算缓存键
+
+    Args:
+        kind: 计算类型，如 'backtest'、'chip'
+        code: 源码指纹
+        params: 参数描述
+        klines: 输入K线数据，默认为None
+        **fields: 其他参与计算的字段，如品种和日期区间
+
+    Returns:
+        str: 缓存键
+    """
+    payload = {
+        "kind": kind,
+        "code": code,
+        "params": params,
+        "data": data_fingerprint(klines) if klines is not None else None,
+        "fields": fields,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def backtest_cache_key(strategy, symbol, start_date, end_date, initial_capital, klines, simulator=None):
+    """
+    计算离线回测的缓存键
+    策略参数取自新建策略实例的属性，仓位计算和风险控制对象的参数一并计入；
+    策略类以及framework和analysis_tools中任何源码的变化都会使缓存失效
+
+    Returns:
+        str: 缓存键
+    """
+    classes = set()
+    params = {
+        "strategy": describe_object(strategy, classes),
+        "simulator": describe_object(simulator, classes),
+    }
+    code = code_fingerprint(*classes)
+    return make_cache_key("backtest", code, params, klines, symbol=symbol, start_date=start_date,
+                          end_date=end_date, initial_capital=initial_capital)
+
+
+class ResultCache:
+    """
+    按内容寻址的结果缓存
+    """
+    def __init__(self, root="data/cache", max_bytes=1 << 30):
+        """
+        初始化结果缓存
+
+        Args:
+            root: 缓存目录，默认为'data/cache'
+            max_bytes: 缓存总大小上限，单位为字节，默认为1GB
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.journal = get_journal()
+        os.makedirs(root, exist_ok=True)
+
+    def entry_dir(self, key):
+        """
+        获取缓存条目目录
+        """
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """
+        读取缓存结果，命中时更新最近使用时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            dict: 缓存的结果，未命中时返回None
+        """
+        path = os.path.join(self.entry_dir(key), RESULT_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def get_or_compute(self, key, compute):
+        """
+        读取缓存结果，未命中时计算并写入缓存
+
+        Args:
+            key: 缓存键
+            compute: 计算函数，参数为条目目录，可在其中写入成交记录、图表等文件，返回可序列化为JSON的结果
+
+        Returns:
+            dict: 结果
+        """
+        result = self.get(key)
+        if result is not None:
+            self.journal.info("cache", "命中缓存: {key}", key=key[:12])
+            return result
+
+        # 先在临时目录中计算，完成后整体改名，中断或并发时不会留下不完整的条目
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            result = compute(staging)
+            atomic_write_json(os.path.join(staging, RESULT_FILE), result)
+            try:
+                os.rename(staging, self.entry_dir(key))
+            except OSError:
+                # 其他进程已经写入相同的条目
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+        return result
+
+    def entries(self):
+        """
+        列出缓存条目
+
+        Returns:
+            list: (缓存键, 大小, 最近使用时间) 列表
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            directory = self.entry_dir(name)
+            result_path = os.path.join(directory, RESULT_FILE)
+            if name.startswith(".") or not os.path.isfile(result_path):
+                continue
+            size = 0
+            for parent, _, files in os.walk(directory):
+                size += sum(os.path.getsize(os.path.join(parent, file)) for file in files)
+            entries.append((name, size, os.path.getmtime(result_path)))
+        return entries
+
+    def evict(self):
+        """
+        总大小超过上限时，按最近使用时间从旧到新删除条目
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """
+        删除全部缓存条目
+        """
+        for key, _, _ in self.entries():
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+回测稳健性检验模块
+对一次回测的收益序列做块自助重采样（保留短期相关性）或打乱交易顺序，生成大量模拟路径，
+统计最大回撤、夏普比率和期末权益的分布，用于判断参数表现是否依赖于某一条历史路径。
+模拟路径以二维数组（路径数 × 周期数）批量计算，可按批分配到多个进程。
+"""
+
+import math
+import numpy as np
+
+# 路径统计指标
+STATISTICS = ["max_drawdown", "sharpe", "terminal_equity"]
+
+
+def journal_returns(equity):
+    """
+    由权益记录计算逐K线收益率
+    同一时间的多条记录只保留最后一条
+
+    Args:
+        equity: 权益记录，EQUITY_DTYPE结构化数组或RunJournal实例
+
+    Returns:
+        numpy数组: 逐K线收益率
+    """
+    equity = getattr(equity, "equity", equity)
+    datetimes = np.asarray(equity["datetime"])
+    keep = np.append(datetimes[1:] != datetimes[:-1], True)
+    balances = np.asarray(equity["balance"], dtype=float)[keep]
+    return balances[1:] / balances[:-1] - 1
+
+
+def segment_returns(equity):
+    """
+    将权益记录按持仓变化切分为交易段，计算每段的收益率
+    一段从持仓变化开始，到下一次持仓变化为止，空仓段不计入；打乱这些收益率的顺序即打乱交易顺序
+
+    Args:
+        equity: 权益记录，EQUITY_DTYPE结构化数组或RunJournal实例
+
+    Returns:
+        numpy数组: 各交易段的收益率
+    """
+    equity = getattr(equity, "equity", equity)
+    balances = np.asarray(equity["balance"], dtype=float)
+    positions = np.asarray(equity["position"])
+    if len(balances) < 2:
+        return np.zeros(0)
+    # 每条记录的持仓从上一条记录延续到本条记录
+    changes = np.flatnonzero(positions[1:] != positions[:-1]) + 1
+    bounds = np.concatenate(([0], changes, [len(balances) - 1]))
+    bounds = np.unique(bounds)
+    starts, ends = bounds[:-1], bounds[1:]
+    held = positions[starts] != 0
+    return balances[ends[held]] / balances[starts[held]] - 1
+
+
+def block_bootstrap_paths(returns, n_paths, block_size=20, rng=None):
+    """
+    循环块自助重采样
+    每条路径由随机起点的连续块拼接而成，长度与原序列相同，块超出序列末尾时从开头接续
+
+    Args:
+        returns: 原始收益率序列
+        n_paths: 路径数量
+        block_size: 块长度，默认为20
+        rng: numpy随机数生成器，默认为None（新建）
+
+    Returns:
+        numpy数组: 形状为 (n_paths, len(returns)) 的收益率路径
+    """
+    returns = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng() if rng is None else rng
+    length = len(returns)
+    block_size = max(1, min(int(block_size), length))
+    blocks = -(-length // block_size)
+    starts = rng.integers(0, length, size=(n_paths, blocks))
+    index = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :length] % length
+    return returns[index]
+
+
+def shuffle_paths(returns, n_paths, rng=None):
+    """
+    打乱收益率顺序，每条路径是原序列的一个随机排列
+
+    Args:
+        returns: 原始收益率序列，通常为各交易段的收益率
+        n_paths: 路径数量
+        rng: numpy随机数生成器，默认为None（新建）
+
+    Returns:
+        numpy数组: 形状为 (n_paths, len(returns)) 的收益率路径
+    """
+    returns = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng() if rng is None else rng
+    return rng.permuted(np.broadcast_to(returns, (n_paths, len(returns))), axis=1)
+
+
+def path_statistics(paths, initial_capital=1.0, periods_per_year=252):
+    """
+    计算每条收益率路径的最大回撤、年化夏普比率和期末权益
+
+    Args:
+        paths: 收益率路径，形状为 (路径数, 周期数)
+        initial_capital: 初始资金，默认为1.0
+        periods_per_year: 每年的周期数，用于年化夏普比率，默认为252
+
+    Returns:
+        dict: 指标名到数组的映射，数组长度为路径数；收益率波动为0时夏普比率为NaN
+    """
+    paths = np.atleast_2d(np.asarray(paths, dtype=float))
+    equity = np.cumprod(1 + paths, axis=1)
+    # 初始资金也是回撤的起点
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    max_drawdown = ((peaks - equity) / peaks).max(axis=1, initial=0.0)
+
+    mean = paths.mean(axis=1)
+    std = paths.std(axis=1, ddof=1) if paths.shape[1] > 1 else np.zeros(len(paths))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * math.sqrt(periods_per_year), np.nan)
+    terminal = equity[:, -1] if paths.shape[1] else np.ones(len(paths))
+    return {
+        "max_drawdown": max_drawdown,
+        "sharpe": sharpe,
+        "terminal_equity": terminal * initial_capital,
+    }
+
+
+def _simulate_chunk(returns, method, n_paths, block_size, seed, initial_capital, periods_per_year):
+    """
+    生成一批路径并计算统计量，供进程池调用
+    """
+    rng = np.random.default_rng(seed)
+    if method == "bootstrap":
+        paths = block_bootstrap_paths(returns, n_paths, block_size, rng)
+    elif method == "shuffle":
+        paths = shuffle_paths(returns, n_paths, rng)
+    else:
+        raise ValueError(f"不支持的重采样方法: {method}")
+    return path_statistics(paths, initial_capital, periods_per_year)
+
+
+def simulate(returns, n_paths=10000, method="bootstrap", block_size=20, seed=None, workers=1,
+             chunk_size=1000, initial_capital=1.0, periods_per_year=252):
+    """
+    运行稳健性模拟
+    路径按批生成，每批使用由seed派生的独立随机数，结果与进程数无关
+
+    Args:
+        returns: 收益率序列，'bootstrap'时通常为逐K线收益率，'shuffle'时通常为各交易段的收益率
+        n_paths: 路径数量，默认为10000
+        method: 'bootstrap'为循环块自助重采样，'shuffle'为打乱顺序
+        block_size: 块自助重采样的块长度，默认为20
+        seed: 随机种子，默认为None
+        workers: 并行进程数，默认为1（在当前进程中计算）
+        chunk_size: 每批路径数，限制单批内存占用，默认为1000
+        initial_capital: 初始资金，默认为1.0
+        periods_per_year: 每年的周期数，默认为252
+
+    Returns:
+        dict: 指标名到数组的映射，数组长度为n_paths
+    """
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    if len(returns) == 0:
+        raise ValueError("收益率序列为空，无法进行稳健性模拟")
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(returns, method, size, block_size, child, initial_capital, periods_per_year)
+             for size, child in zip(sizes, seeds)]
+
+    if workers == 1 or len(tasks) <= 1:
+        chunks = [_simulate_chunk(*task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            chunks = list(executor.map(_simulate_chunk, *zip(*tasks)))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in STATISTICS}
+
+
+def summarize(statistics, observed=None, percentiles=(5, 25, 50, 75, 95)):
+    """
+    汇总模拟结果的分布
+
+    Args:
+        statistics: simulate返回的指标数组
+        observed: 原始路径的指标（path_statistics的结果），给出时计算模拟路径中不优于原始路径的比例，默认为None
+        percentiles: 百分位数列表，默认为(5, 25, 50, 75, 95)
+
+    Returns:
+        dict: 各指标的均值和百分位数，可直接序列化为JSON
+    """
+    summary = {}
+    for name in STATISTICS:
+        values = np.asarray(statistics[name], dtype=float)
+        values = values[np.isfinite(values)]
+        entry = {"mean": float(values.mean()) if len(values) else None}
+        for p in percentiles:
+            entry[f"p{p}"] = float(np.percentile(values, p)) if len(values) else None
+        if observed is not None and len(values):
+            actual = float(np.asarray(observed[name]).ravel()[0])
+            # 回撤越小越好，其余指标越大越好
+            worse = values >= actual if name == "max_drawdown" else values <= actual
+            entry["observed"] = actual
+            entry["observed_rank"] = float(worse.mean())
+        summary[name] = entry
+    return summary
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行时指标模块
+按策略和合约统计wait_update唤醒次数、等待时间、每次行情更新的处理耗时和K线数量，
+通过本地HTTP端口以Prometheus文本格式提供，也可以定期写入快照文件。
+
+记录指标只是对普通整数的加法：计数器加1，耗时直方图按纳秒数的二进制位数（log2）选择桶后加1，
+不加锁、不分配对象，每次记录的开销在1微秒以内。每个指标只由一个线程（策略线程）写入，
+导出线程读取时可能看到稍旧的值，但不会读到不一致的对象。
+"""
+
+import os
+import threading
+import time
+from framework.local_store import atomic_write_json
+
+# 直方图桶数，第i个桶统计二进制位数为i（即小于2**i纳秒）的耗时
+HISTOGRAM_BUCKETS = 65
+
+
+class Counter:
+    """
+    单调递增的计数器
+    """
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    """
+    可以任意设置的数值，提供function时在导出时调用它取值
+    """
+    __slots__ = ("value", "function")
+
+    def __init__(self, function=None):
+        self.value = 0.0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class Histogram:
+    """
+    以纳秒为单位的耗时直方图，桶的上界为2的幂
+    """
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, nanoseconds):
+        """
+        记录一次耗时
+
+        Args:
+            nanoseconds: 非负整数纳秒数，如 time.perf_counter_ns() 之差
+        """
+        self.buckets[nanoseconds.bit_length()] += 1
+        self.count += 1
+        self.sum += nanoseconds
+
+    def quantile(self, q):
+        """
+        估计分位数，返回所在桶的上界（纳秒），没有记录时返回None
+        """
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            cumulative += n
+            if n and cumulative >= target:
+                return 2 ** i
+        return 2 ** (HISTOGRAM_BUCKETS - 1)
+
+
+_FACTORIES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+    同名指标按标签区分，注册时加锁，记录时不加锁
+    """
+    def __init__(self):
+        # 指标名 -> [类型, 说明, {标签元组: 指标}]
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels, *args):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = [kind, help, {}]
+            elif family[0] != kind:
+                raise ValueError(f"指标{name}已注册为{family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = _FACTORIES[kind](*args)
+            return metric
+
+    def counter(self, name, help="", **labels):
+        """
+        获取或注册计数器
+
+        Args:
+            name: 指标名，如 'strategy_wakeups_total'
+            help: 指标说明
+            **labels: 标签，如 strategy='MovingAverageStrategy', symbol='CZCE.FG401'
+
+        Returns:
+            Counter实例
+        """
+        return self._get("counter", name, help, labels)
+
+    def gauge(self, name, help="", function=None, **labels):
+        """
+        获取或注册数值指标，参数见counter
+
+        Args:
+            function: 导出时调用的取值函数，默认为None（使用set设置的值）
+
+        Returns:
+            Gauge实例
+        """
+        return self._get("gauge", name, help, labels, function)
+
+    def histogram(self, name, help="", **labels):
+        """
+        获取或注册耗时直方图，参数见counter；导出时换算为秒
+
+        Returns:
+            Histogram实例
+        """
+        return self._get("histogram", name, help, labels)
+
+    def _collect(self):
+        with self._lock:
+            return [(name, kind, help, list(metrics.items()))
+                    for name, (kind, help, metrics) in sorted(self._families.items())]
+
+    def snapshot(self):
+        """
+        全部指标的当前值
+
+        Returns:
+            dict: 指标名到 {type, help, samples} 的映射，可直接序列化为JSON；
+                直方图的样本包含count、sum（秒）、p50、p99（秒，桶上界）和非空的桶
+        """
+        result = {}
+        for name, kind, help, metrics in self._collect():
+            samples = []
+            for key, metric in metrics:
+                sample = {"labels": dict(key)}
+                if kind == "histogram":
+                    p50, p99 = metric.quantile(0.5), metric.quantile(0.99)
+                    sample.update(count=metric.count, sum=metric.sum / 1e9,
+                                  p50=p50 / 1e9 if p50 is not None else None,
+                                  p99=p99 / 1e9 if p99 is not None else None,
+                                  buckets={str(2 ** i): n for i, n in enumerate(metric.buckets) if n})
+                elif kind == "gauge":
+                    sample["value"] = metric.get()
+                else:
+                    sample["value"] = metric.value
+                samples.append(sample)
+            result[name] = {"type": kind, "help": help, "samples": samples}
+        result["timestamp"] = time.time()
+        return result
+
+    def to_prometheus(self):
+        """
+        Prometheus文本格式的全部指标
+        """
+        lines = []
+        for name, kind, help, metrics in self._collect():
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in metrics:
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+                if kind != "histogram":
+                    value = metric.get() if kind == "gauge" else metric.value
+                    lines.append(f"{name}{{{labels}}} {_format(value)}" if labels else f"{name} {_format(value)}")
+                    continue
+                prefix = labels + "," if labels else ""
+                buckets = list(metric.buckets)
+                count = sum(buckets)
+                cumulative = 0
+                last = max((i for i, n in enumerate(buckets) if n), default=0)
+                for i in range(last + 1):
+                    cumulative += buckets[i]
+                    lines.append(f'{name}_bucket{{{prefix}le="{_format(2 ** i / 1e9)}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {count}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {_format(metric.sum / 1e9)}")
+                lines.append(f"{name}_count{suffix} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value):
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _resident_memory():
+    """
+    进程常驻内存字节数，不支持/proc的系统上为峰值常驻内存
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def register_process_metrics(registry):
+    """
+    注册进程内存和CPU时间指标，导出时取值
+    """
+    registry.gauge("process_resident_memory_bytes", "进程常驻内存字节数", _resident_memory)
+    registry.gauge("process_cpu_seconds", "进程累计CPU时间（秒）", time.process_time)
+
+
+class StrategyInstruments:
+    """
+    单个策略的运行时指标，由StrategyBase在wait_update和update_performance中记录
+    """
+    def __init__(self, registry, strategy_name, symbol):
+        """
+        Args:
+            registry: MetricsRegistry实例
+            strategy_name: 策略名，作为strategy标签
+            symbol: 合约代码，作为symbol标签
+        """
+        labels = {"strategy": strategy_name, "symbol": symbol}
+        self.wakeups = registry.counter("strategy_wakeups_total", "wait_update返回次数", **labels)
+        self.bars = registry.counter("strategy_bars_total", "处理的新K线数量", **labels)
+        self.wait = registry.histogram("strategy_wait_seconds", "wait_update等待行情的时间", **labels)
+        self.processing = registry.histogram("strategy_update_seconds",
+                                             "两次wait_update之间处理一次行情更新的时间", **labels)
+        self.last_bar = registry.gauge("strategy_last_bar_timestamp_seconds",
+                                       "最新K线的开始时间（UTC秒），与当前时间之差为行情延迟", **labels)
+        self.last_wakeup = None
+
+    def before_wait(self):
+        """
+        wait_update之前调用，记录上一次行情更新的处理耗时
+
+        Returns:
+            int: 当前时间（纳秒）
+        """
+        now = time.perf_counter_ns()
+        if self.last_wakeup is not None:
+            self.processing.observe(now - self.last_wakeup)
+        return now
+
+    def after_wait(self, started):
+        """
+        wait_update返回之后调用
+        """
+        now = time.perf_counter_ns()
+        self.wait.observe(now - started)
+        self.wakeups.value += 1
+        self.last_wakeup = now
+
+    def on_bar(self, bar_datetime):
+        """
+        新K线产生时调用
+
+        Args:
+            bar_datetime: K线开始时间，UTC纳秒时间戳
+        """
+        self.bars.value += 1
+        if bar_datetime is not None:
+            self.last_bar.value = bar_datetime / 1e9
+
+
+class MetricsServer:
+    """
+    以Prometheus文本格式提供指标的本地HTTP服务，GET /metrics 返回全部指标，GET /snapshot 返回JSON
+    """
+    def __init__(self, registry=None, host="127.0.0.1", port=9108):
+        """
+        Args:
+            registry: MetricsRegistry实例，默认为None（全局注册表）
+            host: 监听地址，默认为'127.0.0.1'（只允许本机访问）
+            port: 监听端口，默认为9108，为0时由系统分配
+        """
+        self.registry = registry or get_metrics()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        在后台线程中启动服务
+
+        Returns:
+            int: 实际监听的端口
+        """
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path in ("/", "/metrics"):
+                    body = registry.to_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/snapshot":
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        """
+        停止服务
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join(timeout=5)
+            self._server = self._thread = None
+
+
+class SnapshotWriter:
+    """
+    定期将指标快照写入JSON文件（先写临时文件再替换）
+    """
+    def __init__(self, path, registry=None, interval=10.0):
+        """
+        Args:
+            path: 快照文件路径
+            registry: MetricsRegistry实例，默认为None（全局注册表）
+            interval: 写入间隔，单位为秒，默认为10
+        """
+        self.path = path
+        self.registry = registry or get_metrics()
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def write(self):
+        """
+        立即写入一次快照
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        atomic_write_json(self.path, self.registry.snapshot())
+
+    def start(self):
+        """
+        在后台线程中定期写入
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="MetricsSnapshotWriter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        """
+        停止定期写入，并写入最后一次快照
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.write()
+
+
+_default_registry = None
+
+
+def get_metrics():
+    """
+    获取全局指标注册表，首次获取时注册进程指标
+
+    Returns:
+        MetricsRegistry实例
+    """
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = MetricsRegistry()
+        register_process_metrics(_default_registry)
+    return _default_registry
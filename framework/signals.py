@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易信号描述模块
+用表达式描述均线、交叉、阈值和多条序列的排列等信号，同一个表达式可以按两种方式计算:
+对整段K线历史向量化计算，用于离线分析和验证；对逐根完成的K线增量计算，用于实盘和回测循环，
+每根K线的计算量与历史长度无关。两种方式对同一段K线得到完全相同的结果。
+
+示例:
+
+    close = Field("close")
+    short_ma, long_ma = SMA(close, 5), SMA(close, 20)
+    signals = SignalEvaluator(buy=CrossAbove(short_ma, long_ma), sell=CrossBelow(short_ma, long_ma))
+    history = signals.evaluate(klines)        # {'buy': 布尔数组, 'sell': 布尔数组}
+    values = signals.commit(bar)              # 计入一根完成的K线，返回该K线上的信号
+"""
+
+import operator
+import numpy as np
+
+_COMPARE_OPERATORS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+
+def _wrap(value):
+    """
+    将数值包装为常数表达式
+    """
+    return value if isinstance(value, Expression) else Const(value)
+
+
+class Expression:
+    """
+    信号表达式基类
+    子类实现三个方法: _vector 向量化计算整段历史，_step 根据已计入的状态计算当前K线的值，
+    _commit 在K线完成后更新状态
+    """
+    children = ()
+
+    def __gt__(self, other):
+        return Compare(self, ">", other)
+
+    def __lt__(self, other):
+        return Compare(self, "<", other)
+
+    def __ge__(self, other):
+        return Compare(self, ">=", other)
+
+    def __le__(self, other):
+        return Compare(self, "<=", other)
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __bool__(self):
+        # 连续比较 a > b > c 会被Python拆成 (a > b) and (b > c)，需要改用Ordered
+        raise ValueError("信号表达式不能直接作为布尔值使用，多条序列的排列请使用Ordered，逻辑组合请使用 & | ~")
+
+    def evaluate(self, data):
+        """
+        对整段K线历史向量化计算
+
+        Args:
+            data: K线数据，pandas.DataFrame或字段名到数组的字典
+
+        Returns:
+            numpy数组
+        """
+        return evaluate(self, data)
+
+    def _initial_state(self):
+        return None
+
+    def _vector(self, inputs, data):
+        raise NotImplementedError
+
+    def _step(self, state, inputs, bar):
+        raise NotImplementedError
+
+    def _commit(self, state, inputs, value):
+        pass
+
+
+class Field(Expression):
+    """
+    K线字段，如 Field("close")
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def _vector(self, inputs, data):
+        return np.asarray(data[self.name], dtype=float)
+
+    def _step(self, state, inputs, bar):
+        return float(bar[self.name])
+
+
+class Const(Expression):
+    """
+    常数，用于阈值比较
+    """
+    def __init__(self, value):
+        self.value = float(value)
+
+    def _vector(self, inputs, data):
+        return self.value
+
+    def _step(self, state, inputs, bar):
+        return self.value
+
+
+class SMA(Expression):
+    """
+    简单移动平均，窗口内有NaN或数据不足period根时为NaN
+    两种计算方式都用累计和之差除以周期，结果逐位相同
+    """
+    def __init__(self, series, period):
+        if period < 1:
+            raise ValueError("均线周期需要大于0")
+        self.series = _wrap(series)
+        self.period = int(period)
+        self.children = (self.series,)
+
+    def _vector(self, inputs, data):
+        values = np.asarray(inputs[0], dtype=float)
+        missing = np.isnan(values)
+        totals = np.cumsum(np.where(missing, 0.0, values))
+        nan_counts = np.cumsum(missing)
+        result = np.full(len(values), np.nan)
+        n = self.period
+        if len(values) >= n:
+            window = totals[n - 1:] - np.concatenate(([0.0], totals[:-n]))
+            nans = nan_counts[n - 1:] - np.concatenate(([0], nan_counts[:-n]))
+            result[n - 1:] = np.where(nans == 0, window / n, np.nan)
+        return result
+
+    def _initial_state(self):
+        # 最近period根K线的累计和与累计NaN数量，环形缓冲区
+        return {"total": 0.0, "nans": 0, "count": 0,
+                "totals": np.zeros(self.period), "nan_counts": np.zeros(self.period, dtype=np.int64)}
+
+    def _accumulate(self, state, value):
+        if value != value:
+            return state["total"], state["nans"] + 1
+        return state["total"] + value, state["nans"]
+
+    def _step(self, state, inputs, bar):
+        n = self.period
+        if state["count"] < n - 1:
+            return np.nan
+        total, nans = self._accumulate(state, inputs[0])
+        if state["count"] >= n:
+            # 最早一格是n根K线之前的累计值，计入本根K线时将被覆盖
+            slot = state["count"] % n
+            total -= state["totals"][slot]
+            nans -= state["nan_counts"][slot]
+        return total / n if nans == 0 else np.nan
+
+    def _commit(self, state, inputs, value):
+        total, nans = self._accumulate(state, inputs[0])
+        slot = state["count"] % self.period
+        state["totals"][slot] = total
+        state["nan_counts"][slot] = nans
+        state["total"], state["nans"] = total, nans
+        state["count"] += 1
+
+
+class Compare(Expression):
+    """
+    两条序列或序列与阈值的比较，任一侧为NaN时为False
+    """
+    def __init__(self, left, op, right):
+        if op not in _COMPARE_OPERATORS:
+            raise ValueError(f"不支持的比较运算: {op}")
+        self.left = _wrap(left)
+        self.right = _wrap(right)
+        self.op = op
+        self.children = (self.left, self.right)
+
+    def _vector(self, inputs, data):
+        return np.asarray(_COMPARE_OPERATORS[self.op](inputs[0], inputs[1]), dtype=bool)
+
+    def _step(self, state, inputs, bar):
+        return bool(_COMPARE_OPERATORS[self.op](inputs[0], inputs[1]))
+
+
+class _Previous(Expression):
+    """
+    需要上一根K线取值的表达式基类，状态为各子表达式在上一根完成K线上的值
+    """
+    def _initial_state(self):
+        return {"prev": [np.nan] * len(self.children)}
+
+    def _commit(self, state, inputs, value):
+        state["prev"] = list(inputs)
+
+    @staticmethod
+    def _shift(values):
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 0:
+            # 常数的上一根K线取值不变
+            return values
+        shifted = np.empty_like(values)
+        if len(values):
+            shifted[0] = np.nan
+            shifted[1:] = values[:-1]
+        return shifted
+
+
+class CrossAbove(_Previous):
+    """
+    上穿: 上一根K线 a <= b，当前K线 a > b
+    """
+    def __init__(self, a, b):
+        self.a = _wrap(a)
+        self.b = _wrap(b)
+        self.children = (self.a, self.b)
+
+    def _cross(self, a, b, prev_a, prev_b):
+        return (prev_a <= prev_b) & (a > b)
+
+    def _vector(self, inputs, data):
+        a, b = inputs
+        return np.asarray(self._cross(a, b, self._shift(a), self._shift(b)), dtype=bool)
+
+    def _step(self, state, inputs, bar):
+        prev_a, prev_b = state["prev"]
+        return bool(self._cross(inputs[0], inputs[1], prev_a, prev_b))
+
+
+class CrossBelow(CrossAbove):
+    """
+    下穿: 上一根K线 a >= b，当前K线 a < b
+    """
+    def _cross(self, a, b, prev_a, prev_b):
+        return (prev_a >= prev_b) & (a < b)
+
+
+class Ordered(Expression):
+    """
+    多条序列的严格排列，默认 series[0] > series[1] > ...；descending=False 时为 series[0] < series[1] < ...
+    """
+    def __init__(self, *series, descending=True):
+        if len(series) < 2:
+            raise ValueError("排列至少需要两条序列")
+        self.series = tuple(_wrap(s) for s in series)
+        self.descending = descending
+        self.children = self.series
+
+    def _vector(self, inputs, data):
+        compare = operator.gt if self.descending else operator.lt
+        result = np.asarray(compare(inputs[0], inputs[1]), dtype=bool)
+        for left, right in zip(inputs[1:-1], inputs[2:]):
+            result = result & compare(left, right)
+        return result
+
+    def _step(self, state, inputs, bar):
+        compare = operator.gt if self.descending else operator.lt
+        return all(compare(left, right) for left, right in zip(inputs[:-1], inputs[1:]))
+
+
+class Became(Expression):
+    """
+    条件刚刚成立: 当前K线成立且上一根K线不成立，第一根K线之前视为不成立
+    """
+    def __init__(self, condition):
+        self.condition = condition
+        self.children = (condition,)
+
+    def _initial_state(self):
+        return {"prev": False}
+
+    def _vector(self, inputs, data):
+        condition = np.asarray(inputs[0], dtype=bool)
+        prev = np.zeros_like(condition)
+        prev[1:] = condition[:-1]
+        return condition & ~prev
+
+    def _step(self, state, inputs, bar):
+        return bool(inputs[0]) and not state["prev"]
+
+    def _commit(self, state, inputs, value):
+        state["prev"] = bool(inputs[0])
+
+
+class And(Expression):
+    def __init__(self, left, right):
+        self.children = (left, right)
+
+    def _vector(self, inputs, data):
+        return np.asarray(inputs[0], dtype=bool) & np.asarray(inputs[1], dtype=bool)
+
+    def _step(self, state, inputs, bar):
+        return bool(inputs[0]) and bool(inputs[1])
+
+
+class Or(Expression):
+    def __init__(self, left, right):
+        self.children = (left, right)
+
+    def _vector(self, inputs, data):
+        return np.asarray(inputs[0], dtype=bool) | np.asarray(inputs[1], dtype=bool)
+
+    def _step(self, state, inputs, bar):
+        return bool(inputs[0]) or bool(inputs[1])
+
+
+class Not(Expression):
+    def __init__(self, condition):
+        self.children = (condition,)
+
+    def _vector(self, inputs, data):
+        return ~np.asarray(inputs[0], dtype=bool)
+
+    def _step(self, state, inputs, bar):
+        return not inputs[0]
+
+
+def _topological_order(expressions):
+    """
+    按依赖顺序列出表达式树中的全部节点，共用的子表达式只出现一次
+    """
+    order = []
+    seen = set()
+
+    def visit(node):
+        if id(node) in seen:
+            return
+        seen.add(id(node))
+        for child in node.children:
+            visit(child)
+        order.append(node)
+
+    for expression in expressions:
+        visit(expression)
+    return order
+
+
+def _fields(*expressions):
+    """
+    表达式用到的K线字段名
+    """
+    return sorted({node.name for node in _topological_order(expressions) if isinstance(node, Field)})
+
+
+def evaluate(expression, data, cache=None):
+    """
+    对整段K线历史向量化计算表达式
+
+    Args:
+        expression: 信号表达式
+        data: K线数据，pandas.DataFrame或字段名到数组的字典
+        cache: 字典，保存已计算的子表达式，多个表达式共用子表达式时传入同一个字典，默认为None
+
+    Returns:
+        numpy数组
+    """
+    cache = {} if cache is None else cache
+    for node in _topological_order([expression]):
+        if id(node) not in cache:
+            cache[id(node)] = node._vector([cache[id(child)] for child in node.children], data)
+    return cache[id(expression)]
+
+
+class SignalEvaluator:
+    """
+    一组命名信号的计算器
+    evaluate 向量化计算整段历史，commit/peek 逐K线增量计算，两者结果一致
+    """
+    def __init__(self, **signals):
+        """
+        初始化信号计算器
+
+        Args:
+            **signals: 信号名到表达式的映射，如 buy=CrossAbove(a, b)
+        """
+        if not signals:
+            raise ValueError("至少需要一个信号")
+        self.signals = {name: _wrap(expression) for name, expression in signals.items()}
+        self._nodes = _topological_order(self.signals.values())
+        index = {id(node): i for i, node in enumerate(self._nodes)}
+        self._children = [[index[id(child)] for child in node.children] for node in self._nodes]
+        self._outputs = {name: index[id(expression)] for name, expression in self.signals.items()}
+        self.fields = _fields(*self.signals.values())
+        self.reset()
+
+    def reset(self):
+        """
+        清空增量计算状态
+        """
+        self._states = [node._initial_state() for node in self._nodes]
+        self.bar_count = 0
+        self.last_datetime = None
+
+    def get_state(self):
+        """
+        获取增量计算状态，用于保存快照
+
+        Returns:
+            dict: 可以pickle的状态
+        """
+        return {"states": self._states, "bar_count": self.bar_count, "last_datetime": self.last_datetime}
+
+    def set_state(self, state):
+        """
+        恢复get_state保存的增量计算状态，之后catch_up只计入last_datetime之后的K线
+
+        Args:
+            state: get_state返回的状态
+        """
+        if len(state["states"]) != len(self._nodes):
+            raise ValueError("信号状态与表达式不一致")
+        self._states = state["states"]
+        self.bar_count = state["bar_count"]
+        self.last_datetime = state["last_datetime"]
+
+    def evaluate(self, data):
+        """
+        对整段K线历史向量化计算全部信号
+
+        Args:
+            data: K线数据，pandas.DataFrame或字段名到数组的字典
+
+        Returns:
+            dict: 信号名到数组的映射
+        """
+        cache = {}
+        return {name: evaluate(expression, data, cache) for name, expression in self.signals.items()}
+
+    def _step(self, bar):
+        values = []
+        for node, state, children in zip(self._nodes, self._states, self._children):
+            values.append(node._step(state, [values[i] for i in children], bar))
+        return values
+
+    def peek(self, bar):
+        """
+        计算尚未完成的K线上的信号，不改变状态
+
+        Args:
+            bar: 当前K线，字段名到数值的映射（字典或pandas行）
+
+        Returns:
+            dict: 信号名到取值的映射
+        """
+        values = self._step(bar)
+        return {name: values[i] for name, i in self._outputs.items()}
+
+    def commit(self, bar):
+        """
+        计入一根已完成的K线并返回该K线上的信号
+
+        Args:
+            bar: 已完成的K线，字段名到数值的映射（字典或pandas行）
+
+        Returns:
+            dict: 信号名到取值的映射
+        """
+        values = self._step(bar)
+        for node, state, children, value in zip(self._nodes, self._states, self._children, values):
+            node._commit(state, [values[i] for i in children], value)
+        self.bar_count += 1
+        return {name: values[i] for name, i in self._outputs.items()}
+
+    def catch_up(self, klines):
+        """
+        计入K线序列中尚未计入的已完成K线（最后一根视为未完成）
+        首次调用时计入序列中已有的全部历史，之后通常每次只计入一根
+
+        Args:
+            klines: K线序列，pandas.DataFrame或字段名到数组的字典，需要包含datetime字段
+
+        Returns:
+            dict: 最后一根计入的K线上的信号，没有新完成的K线时返回None
+        """
+        datetimes = np.asarray(klines["datetime"])
+        end = len(datetimes) - 1
+        if end <= 0:
+            return None
+        completed = datetimes[:end]
+        pending = ~np.isnan(completed) if completed.dtype.kind == "f" else np.ones(end, dtype=bool)
+        if self.last_datetime is not None:
+            pending &= completed > self.last_datetime
+        # 从最后一根已完成的K线向前，直到遇到无效或已计入的K线
+        stale = np.flatnonzero(~pending)
+        start = stale[-1] + 1 if len(stale) else 0
+        if start >= end:
+            return None
+
+        columns = {field: np.asarray(klines[field], dtype=float)[start:end] for field in self.fields}
+        values = None
+        for row in range(end - start):
+            values = self.commit({field: column[row] for field, column in columns.items()})
+        self.last_datetime = completed[-1]
+        return values
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+策略状态快照模块
+实盘运行时定期将策略状态（持仓、交易次数、回撤统计、仓位计算统计量，以及子类加入的指标和筹码分布等
+增量计算状态）写入本地快照文件。进程重启后从快照恢复，信号和筹码分布只需计入快照之后的K线，
+不需要从头重新计算。
+
+快照用pickle保存，先写临时文件并落盘后再替换，中断时不会留下不完整的文件。
+快照中记录策略类、合约和策略参数，与当前策略不一致时不恢复。只应读取本程序写入的快照文件。
+"""
+
+import inspect
+import os
+import pickle
+import time
+from framework.event_journal import get_journal
+
+# 快照格式版本，格式变化时递增，旧版本的快照不恢复
+SNAPSHOT_VERSION = 1
+
+
+def strategy_params(strategy):
+    """
+    策略的构造参数：构造函数中与策略属性同名的参数
+
+    Args:
+        strategy: 策略实例
+
+    Returns:
+        dict: 参数名到取值的映射
+    """
+    signature = inspect.signature(type(strategy).__init__)
+    return {name: getattr(strategy, name) for name in signature.parameters
+            if name != "self" and hasattr(strategy, name)}
+
+
+def strategy_name(strategy):
+    """
+    策略类的完整名称
+    """
+    cls = type(strategy)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class StateSnapshot:
+    """
+    策略状态快照文件
+    """
+    def __init__(self, path, interval=60.0, clock=time.time):
+        """
+        初始化快照
+
+        Args:
+            path: 快照文件路径
+            interval: 新K线产生时保存快照的最短间隔，单位为秒，默认为60；持仓变化时总是立即保存
+            clock: 时钟函数，默认为time.time
+        """
+        self.path = path
+        self.interval = interval
+        self._clock = clock
+        self.last_saved = None
+        self.save_count = 0
+        self.journal = get_journal()
+
+    def save(self, strategy):
+        """
+        立即保存策略状态
+
+        Args:
+            strategy: StrategyBase实例
+        """
+        payload = {
+            "version": SNAPSHOT_VERSION,
+            "strategy": strategy_name(strategy),
+            "symbol": strategy.symbol,
+            "params": strategy_params(strategy),
+            "saved_at": time.time(),
+            "state": strategy.get_state(),
+        }
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_saved = self._clock()
+        self.save_count += 1
+
+    def maybe_save(self, strategy, force=False):
+        """
+        距上次保存超过interval或force为True时保存
+
+        Returns:
+            bool: 保存了快照时返回True
+        """
+        if not force and self.last_saved is not None and self._clock() - self.last_saved < self.interval:
+            return False
+        self.save(strategy)
+        return True
+
+    def load(self, strategy=None):
+        """
+        读取快照
+
+        Args:
+            strategy: 提供时检查快照的策略类、合约和参数是否与之一致，默认为None
+
+        Returns:
+            dict: 快照内容，包含state和saved_at等字段；文件不存在、损坏或与策略不一致时返回None
+        """
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            self.journal.warning("snapshot", "快照文件无法读取: {path}: {error}", path=self.path, error=str(e))
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+            self.journal.warning("snapshot", "快照格式版本不一致，不恢复: {path}", path=self.path)
+            return None
+        if strategy is not None:
+            expected = {"strategy": strategy_name(strategy), "symbol": strategy.symbol,
+                        "params": strategy_params(strategy)}
+            for key, value in expected.items():
+                if payload.get(key) != value:
+                    self.journal.warning("snapshot", "快照的{key}与当前策略不一致，不恢复: {saved} != {current}",
+                                         key=key, saved=payload.get(key), current=value)
+                    return None
+        return payload
+
+    def remove(self):
+        """
+        删除快照文件
+        """
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+成交与权益记录模块
+使用预分配的numpy结构化数组记录每笔成交和每根K线的权益，写满后追加写入磁盘，
+回测结束后可以通过内存映射按需读取，适合批量分析大量回测结果
+"""
+
+import json
+import os
+import numpy as np
+
+# 成交记录字段
+TRADE_DTYPE = np.dtype([
+    ("datetime", np.int64),     # 成交时间，纳秒时间戳
+    ("volume", np.int64),       # 带方向的成交手数
+    ("price", np.float64),      # 成交价格
+    ("commission", np.float64), # 手续费
+    ("position", np.int64),     # 成交后的持仓
+])
+
+# 权益记录字段
+EQUITY_DTYPE = np.dtype([
+    ("datetime", np.int64),     # K线时间，纳秒时间戳
+    ("balance", np.float64),    # 账户权益
+    ("position", np.int64),     # 持仓手数
+    ("price", np.float64),      # 最新价
+])
+
+META_FILE = "meta.json"
+
+
+class ColumnBuffer:
+    """
+    结构化数组缓冲区
+    指定文件路径时，缓冲区写满后追加写入文件，内存占用固定为一个缓冲区；
+    未指定文件路径时，缓冲区按倍数扩容并保存在内存中
+    """
+    def __init__(self, dtype, path=None, chunk_size=65536):
+        """
+        初始化缓冲区
+
+        Args:
+            dtype: numpy结构化数据类型
+            path: 数据文件路径，默认为None（仅保存在内存中）
+            chunk_size: 缓冲区记录数，默认为65536
+        """
+        self.dtype = np.dtype(dtype)
+        self.path = path
+        self._buffer = np.zeros(chunk_size, dtype=self.dtype)
+        self._size = 0
+        self._flushed = 0
+        if path:
+            # 新建空文件，之后只追加写入
+            open(path, "wb").close()
+
+    def __len__(self):
+        return self._flushed + self._size
+
+    def append(self, values):
+        """
+        追加一条记录
+
+        Args:
+            values: 按字段顺序排列的元组
+        """
+        if self._size == len(self._buffer):
+            if self.path:
+                self.flush()
+            else:
+                self._buffer = np.resize(self._buffer, len(self._buffer) * 2)
+        self._buffer[self._size] = values
+        self._size += 1
+
+    def flush(self):
+        """
+        将缓冲区中的记录追加写入文件
+        """
+        if not self.path or self._size == 0:
+            return
+        with open(self.path, "ab") as f:
+            f.write(self._buffer[:self._size].tobytes())
+        self._flushed += self._size
+        self._size = 0
+
+    def to_array(self):
+        """
+        获取全部记录
+
+        Returns:
+            numpy结构化数组，写入文件的部分以只读内存映射方式返回
+        """
+        if not self.path:
+            return self._buffer[:self._size]
+        self.flush()
+        return _open_memmap(self.path, self.dtype)
+
+
+def _open_memmap(path, dtype):
+    """
+    以只读内存映射方式打开记录文件，空文件返回空数组
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class TradeJournal:
+    """
+    成交与权益记录
+    """
+    def __init__(self, directory=None, chunk_size=65536, metadata=None):
+        """
+        初始化成交与权益记录
+
+        Args:
+            directory: 保存目录，默认为None（仅保存在内存中）
+            chunk_size: 每次写盘的记录数，默认为65536
+            metadata: 附加的回测信息，如品种、策略参数，保存在meta.json中
+        """
+        self.directory = directory
+        self.metadata = metadata or {}
+        trade_path = equity_path = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            trade_path = os.path.join(directory, "trades.bin")
+            equity_path = os.path.join(directory, "equity.bin")
+        self._trades = ColumnBuffer(TRADE_DTYPE, trade_path, chunk_size)
+        self._equity = ColumnBuffer(EQUITY_DTYPE, equity_path, chunk_size)
+
+    def record_trade(self, datetime, volume, price, commission, position):
+        """
+        记录一笔成交
+
+        Args:
+            datetime: 成交时间，纳秒时间戳
+            volume: 带方向的成交手数
+            price: 成交价格
+            commission: 手续费
+            position: 成交后的持仓
+        """
+        self._trades.append((datetime, volume, price, commission, position))
+
+    def record_equity(self, datetime, balance, position, price):
+        """
+        记录一个权益点
+
+        Args:
+            datetime: K线时间，纳秒时间戳
+            balance: 账户权益
+            position: 持仓手数
+            price: 最新价
+        """
+        self._equity.append((datetime, balance, position, price))
+
+    @property
+    def trades(self):
+        return self._trades.to_array()
+
+    @property
+    def equity(self):
+        return self._equity.to_array()
+
+    def close(self):
+        """
+        写出缓冲区并保存元数据
+        """
+        if not self.directory:
+            return
+        self._trades.flush()
+        self._equity.flush()
+        meta = dict(self.metadata)
+        meta["trade_count"] = len(self._trades)
+        meta["equity_count"] = len(self._equity)
+        tmp_path = os.path.join(self.directory, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, os.path.join(self.directory, META_FILE))
+
+
+class RunJournal:
+    """
+    已保存的单次回测记录
+    元数据和记录文件在首次访问时才读取，记录以内存映射方式打开
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._meta = None
+
+    @property
+    def name(self):
+        return os.path.basename(os.path.normpath(self.directory))
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            with open(os.path.join(self.directory, META_FILE), encoding="utf-8") as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    @property
+    def trades(self):
+        return _open_memmap(os.path.join(self.directory, "trades.bin"), TRADE_DTYPE)
+
+    @property
+    def equity(self):
+        return _open_memmap(os.path.join(self.directory, "equity.bin"), EQUITY_DTYPE)
+
+    def __repr__(self):
+        return f"RunJournal({self.directory})"
+
+
+def load_journals(root):
+    """
+    列出目录下所有已完成的回测记录，不读取记录内容
+
+    Args:
+        root: 回测记录的根目录，每个子目录为一次回测
+
+    Returns:
+        list: RunJournal实例列表
+    """
+    if not os.path.isdir(root):
+        return []
+    journals = []
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        if os.path.isfile(os.path.join(directory, META_FILE)):
+            journals.append(RunJournal(directory))
+    return journals
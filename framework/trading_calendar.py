@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+期货交易日历模块
+按品种的交易时段模板和交易所节假日预先生成全部交易时段的起止时间（UTC纳秒时间戳，与天勤K线的datetime一致），
+保存为有序的int64数组。查询时间所属交易日、K线收盘时间和两个时间之间的K线数量都是一次searchsorted，
+可以对整列时间戳批量计算；生成的日历可以缓存为npz文件。
+
+夜盘属于下一个交易日：交易日D的夜盘在上一个交易日的晚上开始，两者之间有节假日（周末以外的休市日）时没有夜盘。
+"""
+
+import hashlib
+import os
+import numpy as np
+from framework.contracts import get_contract_spec
+
+# 北京时间与UTC的差，单位为纳秒
+_UTC_OFFSET = 8 * 3600 * 10 ** 9
+_MINUTE = 60 * 10 ** 9
+
+# 日盘交易时段模板，单位为北京时间当日的分钟数
+DAY_SESSIONS = {
+    "commodity": [(9 * 60, 10 * 60 + 15), (10 * 60 + 30, 11 * 60 + 30), (13 * 60 + 30, 15 * 60)],
+    "index": [(9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60)],
+    "bond": [(9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60 + 15)],
+}
+
+# 品种使用的日盘模板，未列出的品种使用商品期货模板
+_DAY_TEMPLATE = {"IF": "index", "IH": "index", "IC": "index", "IM": "index",
+                 "T": "bond", "TF": "bond", "TS": "bond", "TL": "bond"}
+
+# 夜盘时段，结束时间小于开始时间表示跨过午夜；值为None的品种没有夜盘。
+# 未列出的品种无法确定交易时段，需要先用register_trading_sessions注册
+_NIGHT_0100 = (21 * 60, 60)
+_NIGHT_0230 = (21 * 60, 150)
+_NIGHT_2300 = (21 * 60, 23 * 60)
+NIGHT_SESSIONS = {
+    # 上海期货交易所、上海国际能源交易中心
+    "cu": _NIGHT_0100, "al": _NIGHT_0100, "zn": _NIGHT_0100, "pb": _NIGHT_0100, "ni": _NIGHT_0100,
+    "sn": _NIGHT_0100, "ss": _NIGHT_0100, "ao": _NIGHT_0100, "bc": _NIGHT_0100,
+    "au": _NIGHT_0230, "ag": _NIGHT_0230, "sc": _NIGHT_0230,
+    "rb": _NIGHT_2300, "hc": _NIGHT_2300, "ru": _NIGHT_2300, "fu": _NIGHT_2300, "bu": _NIGHT_2300,
+    "sp": _NIGHT_2300, "br": _NIGHT_2300, "nr": _NIGHT_2300, "lu": _NIGHT_2300,
+    "wr": None, "ec": None,
+    # 大连商品交易所
+    "a": _NIGHT_2300, "b": _NIGHT_2300, "m": _NIGHT_2300, "y": _NIGHT_2300, "p": _NIGHT_2300,
+    "c": _NIGHT_2300, "cs": _NIGHT_2300, "rr": _NIGHT_2300, "i": _NIGHT_2300, "j": _NIGHT_2300,
+    "jm": _NIGHT_2300, "l": _NIGHT_2300, "v": _NIGHT_2300, "pp": _NIGHT_2300, "eg": _NIGHT_2300,
+    "eb": _NIGHT_2300, "pg": _NIGHT_2300,
+    "jd": None, "lh": None, "fb": None, "bb": None, "lg": None,
+    # 郑州商品交易所
+    "FG": _NIGHT_2300, "SA": _NIGHT_2300, "MA": _NIGHT_2300, "TA": _NIGHT_2300, "SR": _NIGHT_2300,
+    "CF": _NIGHT_2300, "CY": _NIGHT_2300, "OI": _NIGHT_2300, "RM": _NIGHT_2300, "ZC": _NIGHT_2300,
+    "PF": _NIGHT_2300, "SH": _NIGHT_2300, "PX": _NIGHT_2300, "PR": _NIGHT_2300,
+    "AP": None, "CJ": None, "UR": None, "PK": None, "SM": None, "SF": None, "WH": None, "PM": None,
+    "RI": None, "LR": None, "JR": None, "RS": None,
+    # 广州期货交易所
+    "si": None, "lc": None, "ps": None,
+    # 中国金融期货交易所
+    "IF": None, "IH": None, "IC": None, "IM": None, "T": None, "TF": None, "TS": None, "TL": None,
+}
+
+# 交易所休市日（周末以外），调休的周六周日同样休市，无需列出
+_HOLIDAYS = {
+    "2022-01-03", "2022-01-31", "2022-02-01", "2022-02-02", "2022-02-03", "2022-02-04",
+    "2022-04-04", "2022-04-05", "2022-05-02", "2022-05-03", "2022-05-04", "2022-06-03",
+    "2022-09-12", "2022-10-03", "2022-10-04", "2022-10-05", "2022-10-06", "2022-10-07",
+    "2023-01-02", "2023-01-23", "2023-01-24", "2023-01-25", "2023-01-26", "2023-01-27",
+    "2023-04-05", "2023-05-01", "2023-05-02", "2023-05-03", "2023-06-22", "2023-06-23",
+    "2023-09-29", "2023-10-02", "2023-10-03", "2023-10-04", "2023-10-05", "2023-10-06",
+    "2024-01-01", "2024-02-09", "2024-02-12", "2024-02-13", "2024-02-14", "2024-02-15",
+    "2024-02-16", "2024-04-04", "2024-04-05", "2024-05-01", "2024-05-02", "2024-05-03",
+    "2024-06-10", "2024-09-16", "2024-09-17", "2024-10-01", "2024-10-02", "2024-10-03",
+    "2024-10-04", "2024-10-07",
+    "2025-01-01", "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-03",
+    "2025-02-04", "2025-04-04", "2025-05-01", "2025-05-02", "2025-05-05", "2025-06-02",
+    "2025-10-01", "2025-10-02", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08",
+}
+
+_CALENDAR_CACHE = {}
+
+
+def register_holidays(dates):
+    """
+    补充交易所休市日，内置休市日表之外的年份需要在使用前注册
+
+    Args:
+        dates: 日期列表，如 ['2026-01-01']
+    """
+    _HOLIDAYS.update(str(np.datetime64(date, "D")) for date in dates)
+    _CALENDAR_CACHE.clear()
+
+
+def register_trading_sessions(product, night_session=None, day_template="commodity"):
+    """
+    注册或覆盖品种的交易时段
+
+    Args:
+        product: 品种代码
+        night_session: 夜盘时段 (开始, 结束)，单位为北京时间当日的分钟数，默认为None（没有夜盘）
+        day_template: 日盘模板，DAY_SESSIONS中的名称，默认为'commodity'
+    """
+    if day_template not in DAY_SESSIONS:
+        raise ValueError(f"不支持的日盘模板: {day_template}")
+    NIGHT_SESSIONS[product] = night_session
+    if day_template == "commodity":
+        _DAY_TEMPLATE.pop(product, None)
+    else:
+        _DAY_TEMPLATE[product] = day_template
+    _CALENDAR_CACHE.clear()
+
+
+def session_template(symbol):
+    """
+    获取品种的交易时段模板
+
+    Args:
+        symbol: 合约代码或品种代码
+
+    Returns:
+        tuple: (日盘时段列表, 夜盘时段或None)，单位为北京时间当日的分钟数
+    """
+    product = get_contract_spec(symbol).product
+    if product not in NIGHT_SESSIONS:
+        raise ValueError(f"品种{product}没有交易时段信息，请先用register_trading_sessions注册")
+    return DAY_SESSIONS[_DAY_TEMPLATE.get(product, "commodity")], NIGHT_SESSIONS[product]
+
+
+def build_sessions(day_sessions, night_session, start, end, holidays=()):
+    """
+    生成区间内全部交易时段的起止时间
+
+    Args:
+        day_sessions: 日盘时段列表
+        night_session: 夜盘时段，None为没有夜盘
+        start: 开始日期（包含）
+        end: 结束日期（包含）
+        holidays: 休市日列表
+
+    Returns:
+        tuple: (交易日数组, 时段开始时间数组, 时段结束时间数组, 各时段所属交易日的序号数组)
+    """
+    holidays = np.array(sorted(holidays), dtype="datetime64[D]")
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    days = days[np.is_busday(days, holidays=holidays)]
+    base = days.astype("datetime64[ns]").astype(np.int64) - _UTC_OFFSET
+
+    segments = [(base + a * _MINUTE, base + b * _MINUTE, np.ones(len(days), dtype=bool)) for a, b in day_sessions]
+    if night_session is not None and len(days):
+        # 夜盘在上一个交易日的晚上，两个交易日之间只隔周末时才有夜盘
+        previous = np.busday_offset(days, -1, roll="forward", holidays=holidays)
+        has_night = np.busday_count(previous, days) == 1
+        prev_base = previous.astype("datetime64[ns]").astype(np.int64) - _UTC_OFFSET
+        a, b = night_session
+        night_end = b + (24 * 60 if b <= a else 0)
+        segments.insert(0, (prev_base + a * _MINUTE, prev_base + night_end * _MINUTE, has_night))
+
+    opens = np.stack([segment[0] for segment in segments], axis=1)
+    closes = np.stack([segment[1] for segment in segments], axis=1)
+    present = np.stack([segment[2] for segment in segments], axis=1)
+    session_days = np.broadcast_to(np.arange(len(days))[:, None], opens.shape)
+    return days, opens[present], closes[present], session_days[present]
+
+
+class TradingCalendar:
+    """
+    交易日历
+    时间参数和返回值均为UTC纳秒时间戳（int64），可以是单个数值或数组
+    """
+    def __init__(self, trading_days, opens, closes, session_days):
+        """
+        初始化交易日历，通常使用for_symbol创建
+
+        Args:
+            trading_days: 交易日数组，datetime64[D]
+            opens: 各交易时段的开始时间，有序int64数组
+            closes: 各交易时段的结束时间
+            session_days: 各交易时段所属交易日在trading_days中的序号
+        """
+        self.trading_days = np.asarray(trading_days, dtype="datetime64[D]")
+        self.opens = np.asarray(opens, dtype=np.int64)
+        self.closes = np.asarray(closes, dtype=np.int64)
+        self.session_days = np.asarray(session_days, dtype=np.int64)
+        if len(self.opens) == 0:
+            raise ValueError("日历区间内没有交易时段")
+        # 各交易日第一个时段的开始时间和最后一个时段的结束时间
+        first = np.flatnonzero(np.diff(self.session_days, prepend=-1) != 0)
+        self.day_opens = self.opens[first]
+        self.day_closes = np.append(self.closes[first[1:] - 1], self.closes[-1])
+        self._bar_counts = {}
+
+    @classmethod
+    def for_symbol(cls, symbol, start="2022-01-01", end="2025-12-31", cache_dir=None):
+        """
+        按品种的交易时段模板创建交易日历，同一进程中相同参数的日历只生成一次
+
+        Args:
+            symbol: 合约代码或品种代码
+            start: 开始日期，默认为'2022-01-01'
+            end: 结束日期，默认为'2025-12-31'
+            cache_dir: npz缓存目录，默认为None（不缓存到文件）
+
+        Returns:
+            TradingCalendar实例
+        """
+        day_sessions, night_session = session_template(symbol)
+        holidays = sorted(_HOLIDAYS)
+        key = hashlib.sha1(repr((day_sessions, night_session, str(start), str(end), holidays))
+                           .encode()).hexdigest()[:16]
+        calendar = _CALENDAR_CACHE.get(key)
+        if calendar is not None:
+            return calendar
+
+        path = os.path.join(cache_dir, f"calendar_{key}.npz") if cache_dir else None
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                calendar = cls(data["trading_days"], data["opens"], data["closes"], data["session_days"])
+        else:
+            calendar = cls(*build_sessions(day_sessions, night_session, start, end, holidays))
+            if path:
+                calendar.save(path)
+        _CALENDAR_CACHE[key] = calendar
+        return calendar
+
+    def save(self, path):
+        """
+        保存为npz文件，先写临时文件再替换
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, trading_days=self.trading_days, opens=self.opens, closes=self.closes,
+                 session_days=self.session_days)
+        os.replace(tmp_path, path)
+
+    def _segment(self, times):
+        """
+        时间所在的交易时段，休市时间返回之后的第一个时段；晚于最后一个时段时为时段数量
+        """
+        return np.searchsorted(self.closes, times, side="right")
+
+    def is_trading(self, times):
+        """
+        是否处于交易时段内（包含开始时间，不包含结束时间）
+        """
+        times = np.asarray(times, dtype=np.int64)
+        segment = np.minimum(self._segment(times), len(self.opens) - 1)
+        return (times >= self.opens[segment]) & (times < self.closes[segment])
+
+    def trading_day(self, times):
+        """
+        时间所属的交易日，夜盘属于下一个交易日，休市时间属于之后的第一个交易日
+
+        Returns:
+            datetime64[D]，超出日历范围时为NaT
+        """
+        segment = self._segment(np.asarray(times, dtype=np.int64))
+        inside = segment < len(self.opens)
+        days = self.trading_days[self.session_days[np.minimum(segment, len(self.opens) - 1)]]
+        return np.where(inside, days, np.datetime64("NaT"))
+
+    def session_bounds(self, times):
+        """
+        时间所在（休市时为之后第一个）交易时段的起止时间
+
+        Returns:
+            tuple: (开始时间, 结束时间)
+        """
+        segment = np.minimum(self._segment(np.asarray(times, dtype=np.int64)), len(self.opens) - 1)
+        return self.opens[segment], self.closes[segment]
+
+    def next_bar_close(self, times, duration_seconds):
+        """
+        时间所在K线的收盘时间
+        日内K线按北京时间的整周期对齐（自然小时），同一交易日内跨过休市的整周期为一根K线，
+        在其中最后一个交易时段结束时或整周期结束时收盘，如商品期货10:00的小时线包含10:00-10:15和10:30-11:00；
+        日线及以上在交易日最后一个时段结束时收盘
+
+        Args:
+            times: 时间（通常为K线的datetime）
+            duration_seconds: K线周期，单位为秒
+
+        Returns:
+            int64: 收盘时间，超出日历范围时为最后一个时段的结束时间
+        """
+        times = np.asarray(times, dtype=np.int64)
+        segment = np.minimum(self._segment(times), len(self.opens) - 1)
+        if duration_seconds >= 86400:
+            return self.day_closes[self.session_days[segment]]
+        duration = int(duration_seconds) * 10 ** 9
+        _, _, tail_closes = self._segment_bars(duration)
+        start = np.maximum(times, self.opens[segment])
+        boundary = ((start + _UTC_OFFSET) // duration + 1) * duration - _UTC_OFFSET
+        # 时段的最后一个整周期与之后的时段共用时，收盘时间取共用该整周期的最后一个时段的结束时间
+        return np.where(boundary >= self.closes[segment], np.minimum(boundary, tail_closes[segment]), boundary)
+
+    def is_bar_final(self, bar_datetimes, duration_seconds, now):
+        """
+        K线是否已经收盘
+
+        Args:
+            bar_datetimes: K线的开始时间
+            duration_seconds: K线周期，单位为秒
+            now: 当前时间
+
+        Returns:
+            bool或布尔数组
+        """
+        return np.asarray(now, dtype=np.int64) >= self.next_bar_close(bar_datetimes, duration_seconds)
+
+    def bar_position(self, times, duration_seconds):
+        """
+        日历开始到给定时间之前开始的K线数量
+
+        Args:
+            times: 时间
+            duration_seconds: K线周期，单位为秒
+
+        Returns:
+            int64: K线数量
+        """
+        times = np.asarray(times, dtype=np.int64)
+        if duration_seconds >= 86400:
+            return np.searchsorted(self.day_opens, times, side="left")
+        duration = int(duration_seconds) * 10 ** 9
+        cells, shared, _ = self._segment_bars(duration)
+        counts = cells - shared
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+        segment = self._segment(times)
+        inside = np.minimum(segment, len(self.opens) - 1)
+        first_cells = (self.opens + _UTC_OFFSET) // duration
+        # 时段内在给定时间之前开始的整周期: 第一个从时段开始，之后按整周期对齐；
+        # 与上一个时段共用的第一个整周期已经计入上一个时段
+        started = -((-(times + _UTC_OFFSET)) // duration) - first_cells[inside]
+        started = np.where(times > self.opens[inside], np.clip(started, 0, cells[inside]) - shared[inside], 0)
+        return cumulative[segment] + np.where(segment < len(self.opens), started, 0)
+
+    def bars_between(self, start, end, duration_seconds):
+        """
+        开始时间（包含）到结束时间（不包含）之间开始的K线数量
+
+        Args:
+            start: 开始时间
+            end: 结束时间
+            duration_seconds: K线周期，单位为秒
+
+        Returns:
+            int64: K线数量
+        """
+        return self.bar_position(end, duration_seconds) - self.bar_position(start, duration_seconds)
+
+    def _segment_bars(self, duration):
+        """
+        各交易时段覆盖的整周期数量、第一个整周期是否与同一交易日的上一个时段共用，
+        以及最后一个整周期所在K线的收盘时间，按周期缓存
+        """
+        cached = self._bar_counts.get(duration)
+        if cached is None:
+            first = (self.opens + _UTC_OFFSET) // duration
+            last = -((-(self.closes + _UTC_OFFSET)) // duration)
+            shared = np.zeros(len(first), dtype=np.int64)
+            shared[1:] = (self.session_days[1:] == self.session_days[:-1]) & (first[1:] == last[:-1] - 1)
+            # 共用的整周期在下一个时段结束时收盘，下一个时段还有之后的整周期时在整周期结束时收盘；从后向前传递
+            cells = last - first
+            tail_closes = self.closes.copy()
+            for i in np.flatnonzero(shared)[::-1]:
+                tail_closes[i - 1] = tail_closes[i] if cells[i] == 1 else (first[i] + 1) * duration - _UTC_OFFSET
+            cached = self._bar_counts[duration] = (cells, shared, tail_closes)
+        return cached
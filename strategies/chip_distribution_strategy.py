@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+筹码分布策略模块
+实现基于获利比例和成本区间突破的交易策略
+"""
+
+from framework.quant_framework import StrategyBase
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+from analysis_tools.chip_compact import CompactChipDistribution
+
+class ChipDistributionStrategy(StrategyBase):
+    """
+    筹码分布策略
+    价格向上突破成本区间上沿且获利比例较高时做多，
+    价格向下跌破成本区间下沿且获利比例较低时做空。
+    筹码分布随K线增量更新，每根K线只处理新完成的一根K线
+    """
+    def __init__(self, profit_ratio_high=0.9, profit_ratio_low=0.1, cost_low_percentile=15,
+                 cost_high_percentile=85, method='triangle', decay_coefficient=1, min_bars=20,
+                 kline_period=60*60*24, compact_chips=False):
+        """
+        初始化筹码分布策略
+
+        Args:
+            profit_ratio_high: 做多所需的最低获利比例，默认为0.9
+            profit_ratio_low: 做空所需的最高获利比例，默认为0.1
+            cost_low_percentile: 成本区间下沿的百分位，默认为15
+            cost_high_percentile: 成本区间上沿的百分位，默认为85
+            method: 筹码分布算法，'triangle'为三角形分布，'even'为均匀分布
+            decay_coefficient: 历史衰减系数，默认为1
+            min_bars: 开始交易前至少需要的K线数量，默认为20
+            kline_period: K线周期，单位为秒，默认为日线(60*60*24)
+            compact_chips: 是否以float32网格保存筹码分布（CompactChipDistribution），默认为False
+        """
+        super().__init__()
+        self.profit_ratio_high = profit_ratio_high
+        self.profit_ratio_low = profit_ratio_low
+        self.cost_low_percentile = cost_low_percentile
+        self.cost_high_percentile = cost_high_percentile
+        self.method = method
+        self.decay_coefficient = decay_coefficient
+        self.min_bars = min_bars
+        self.kline_period = kline_period
+        self.compact_chips = compact_chips
+        self.klines = None
+        self.chip = None
+        self.bar_count = 0
+        self.profit_ratio = None
+        self.cost_low = None
+        self.cost_high = None
+        self._last_chip_datetime = None
+
+    def initialize(self, api, symbol):
+        """
+        初始化策略
+
+        Args:
+            api: TqApi实例
+            symbol: 交易品种代码
+        """
+        super().initialize(api, symbol)
+
+        # 获取K线数据
+        self.klines = self.get_kline_serial(symbol, self.kline_period)
+
+        # 创建目标持仓任务
+        self.target_pos = self.create_target_pos_task()
+
+        # 筹码分布状态，价格网格间距取合约的最小变动价位
+        chip_class = CompactChipDistribution if self.compact_chips else ChipDistributionWithIncrement
+        self.chip = chip_class.for_symbol(symbol, api)
+        self.chip.decay_coefficient = self.decay_coefficient
+        self.bar_count = 0
+        self._last_chip_datetime = None
+
+        # 打印策略参数
+        self.journal.info("strategy", "筹码分布策略参数: 获利比例阈值={low}/{high}, 成本区间=COST({cost_low})~COST({cost_high})",
+                          low=self.profit_ratio_low, high=self.profit_ratio_high,
+                          cost_low=self.cost_low_percentile, cost_high=self.cost_high_percentile)
+
+    def warmup_bars(self):
+        """
+        筹码分布至少计入min_bars根K线后才开始交易
+        """
+        return self.min_bars
+
+    def get_state(self):
+        """
+        策略状态，包含筹码分布和已计入的最后一根K线
+        """
+        state = super().get_state()
+        state.update(chip=self.chip, bar_count=self.bar_count, last_chip_datetime=self._last_chip_datetime,
+                     profit_ratio=self.profit_ratio, cost_low=self.cost_low, cost_high=self.cost_high)
+        return state
+
+    def set_state(self, state):
+        """
+        恢复策略状态，之后只将快照之后的K线计入筹码分布
+        """
+        super().set_state(state)
+        self.chip = state["chip"]
+        self.bar_count = state["bar_count"]
+        self._last_chip_datetime = state["last_chip_datetime"]
+        self.profit_ratio = state["profit_ratio"]
+        self.cost_low = state["cost_low"]
+        self.cost_high = state["cost_high"]
+
+    def run(self):
+        """
+        运行策略
+        """
+        while True:
+            # 等待K线更新
+            self.wait_update()
+
+            # 如果产生了新K线
+            bars = self.bars
+            if bars.is_new_bar():
+                # 使用上一根已完成的K线更新筹码分布和仓位统计量
+                self._update_chip_state()
+                self.update_position_sizer(bars.high[-2], bars.low[-2], bars.close[-2])
+
+                if self.bar_count >= self.min_bars:
+                    current_price = bars.close[-1]
+                    direction = self.on_bar(current_price)
+                    if direction > 0:
+                        self._buy_signal(current_price)
+                    elif direction < 0:
+                        self._sell_signal(current_price)
+
+            # 每次行情更新都计入绩效，捕捉K线内部的回撤
+            self.update_performance()
+
+    def _update_chip_state(self):
+        """
+        将尚未计入筹码分布的已完成K线增量计入
+        首次调用时计入K线序列中已有的全部历史，之后每根K线只计入一根
+        """
+        bars = self.bars
+        datetimes = bars.datetime
+        # 从倒数第二根（最后一根已完成的K线）向前找到上次处理的位置
+        start = len(bars) - 1
+        while start > 0:
+            dt = datetimes[start - 1]
+            if dt != dt or (self._last_chip_datetime is not None and dt <= self._last_chip_datetime):
+                break
+            start -= 1
+
+        end = len(bars) - 1
+        if start >= end:
+            return
+        # 一次计入全部未处理的K线，首次调用时的整段历史也只需一次向量化计算
+        self.bar_count += self.chip.replay_bars(bars.high[start:end], bars.low[start:end], bars.close[start:end],
+                                                bars.volume[start:end], bars.close_oi[start:end], self.method)
+        self._last_chip_datetime = datetimes[end - 1]
+
+    def on_bar(self, price):
+        """
+        根据当前筹码状态计算交易方向
+
+        Args:
+            price: 当前价格
+
+        Returns:
+            交易方向，1为做多，-1为做空，0为不操作
+        """
+        self.profit_ratio, (self.cost_low, self.cost_high) = self.chip.get_chip_metrics(
+            price, [self.cost_low_percentile, self.cost_high_percentile])
+
+        # 向上突破成本区间且大部分筹码获利
+        if price > self.cost_high and self.profit_ratio >= self.profit_ratio_high:
+            return 1
+
+        # 向下跌破成本区间且大部分筹码亏损
+        if price < self.cost_low and self.profit_ratio <= self.profit_ratio_low:
+            return -1
+
+        return 0
+
+    def _buy_signal(self, current_price):
+        """
+        买入信号处理
+        """
+        if self.position <= 0:
+            previous = self.position
+            volume = self.set_target_direction(1, current_price)
+            # 风险控制约束后目标手数为0且原本没有持仓时不算交易
+            if self.position != previous:
+                self.journal.info("signal", "筹码突破: 买入 {symbol}, 价格: {price:.2f}, 获利比例: {profit_ratio:.2%}, 目标持仓: {volume}手",
+                                  symbol=self.symbol, price=current_price, profit_ratio=self.profit_ratio, volume=volume)
+                self.trade_count += 1
+
+    def _sell_signal(self, current_price):
+        """
+        卖出信号处理
+        """
+        if self.position >= 0:
+            previous = self.position
+            volume = self.set_target_direction(-1, current_price)
+            # 风险控制约束后目标手数为0且原本没有持仓时不算交易
+            if self.position != previous:
+                self.journal.info("signal", "筹码跌破: 卖出 {symbol}, 价格: {price:.2f}, 获利比例: {profit_ratio:.2%}, 目标持仓: {volume}手",
+                                  symbol=self.symbol, price=current_price, profit_ratio=self.profit_ratio, volume=volume)
+                self.trade_count += 1
@@ -7,7 +7,9 @@
 
 from datetime import date
 from tqsdk import TqApi, TqAuth, TqBacktest, TqSim, TargetPosTask
-from tqsdk.ta import MA
+from framework.event_journal import get_journal
+from framework.kline_view import KlineView
+from framework.signals import Field, SMA, CrossAbove, CrossBelow, SignalEvaluator
 
 # 策略参数
 SYMBOL = "SHFE.FG2401"  # 玻璃期货，上海期货交易所，使用具体合约代码
@@ -23,9 +25,11 @@ def run_strategy():
     '''
     运行策略
     '''
-    print(f"开始回测 {SYMBOL} 均线交叉策略...")
-    print(f"参数: 短周期={SHORT_PERIOD}, 长周期={LONG_PERIOD}")
-    print(f"回测区间: {BACKTEST_START_DATE} 至 {BACKTEST_END_DATE}")
+    journal = get_journal()
+    journal.info("backtest", "开始回测 {symbol} 均线交叉策略...", symbol=SYMBOL)
+    journal.info("backtest", "参数: 短周期={short_period}, 长周期={long_period}",
+                 short_period=SHORT_PERIOD, long_period=LONG_PERIOD)
+    journal.info("backtest", "回测区间: {start} 至 {end}", start=BACKTEST_START_DATE, end=BACKTEST_END_DATE)
     
     # 创建API实例，设置回测模式
     # 注意：使用天勤量化SDK需要注册天勤账户，请在以下网址注册：https://account.shinnytech.com/
@@ -37,10 +41,13 @@ def run_strategy():
     
     # 获取玻璃期货的K线数据
     klines = api.get_kline_serial(SYMBOL, 60*60*24)  # 日线
+    bars = KlineView(klines)  # 各列的numpy视图，随行情原地更新
     
-    # 计算均线
-    short_ma = MA(klines, SHORT_PERIOD)
-    long_ma = MA(klines, LONG_PERIOD)
+    # 均线交叉信号，在每根完成的K线上增量计算
+    close = Field("close")
+    short_ma = SMA(close, SHORT_PERIOD)
+    long_ma = SMA(close, LONG_PERIOD)
+    signals = SignalEvaluator(buy=CrossAbove(short_ma, long_ma), sell=CrossBelow(short_ma, long_ma))
     
     # 创建 TargetPosTask 用于自动调整持仓
     target_pos = TargetPosTask(api, SYMBOL)
@@ -53,27 +60,28 @@ def run_strategy():
         # 等待K线更新
         api.wait_update()
         
-        # 如果K线最后一根发生变化
-        if api.is_changing(klines.iloc[-1], "datetime"):
+        # 如果产生了新K线
+        if bars.is_new_bar():
             # 计算信号
-            short_ma_value = short_ma.iloc[-1]
-            long_ma_value = long_ma.iloc[-1]
-            short_ma_prev = short_ma.iloc[-2]
-            long_ma_prev = long_ma.iloc[-2]
+            values = signals.catch_up(bars)
+            if values is None:
+                continue
             
             # 金叉信号: 短周期均线从下方穿过长周期均线
-            if short_ma_prev <= long_ma_prev and short_ma_value > long_ma_value:
+            if values["buy"]:
                 # 买入信号
                 if position <= 0:
-                    print(f"金叉信号: 买入 {SYMBOL}, 价格: {klines.iloc[-1].close}")
+                    journal.info("signal", "金叉信号: 买入 {symbol}, 价格: {price}", symbol=SYMBOL,
+                                 price=bars.close[-1])
                     target_pos.set_target_volume(1)  # 设置目标持仓为1手
                     position = 1
             
             # 死叉信号: 短周期均线从上方穿过长周期均线
-            elif short_ma_prev >= long_ma_prev and short_ma_value < long_ma_value:
+            elif values["sell"]:
                 # 卖出信号
                 if position >= 0:
-                    print(f"死叉信号: 卖出 {SYMBOL}, 价格: {klines.iloc[-1].close}")
+                    journal.info("signal", "死叉信号: 卖出 {symbol}, 价格: {price}", symbol=SYMBOL,
+                                 price=bars.close[-1])
                     target_pos.set_target_volume(-1)  # 设置目标持仓为-1手
                     position = -1
     
@@ -84,4 +92,6 @@ if __name__ == "__main__":
     try:
         run_strategy()
     except Exception as e:
-        print(f"策略运行出错: {e}")
\ No newline at end of file
+        get_journal().error("error", "策略运行出错: {error}", error=str(e))
+    finally:
+        get_journal().flush()
\ No newline at end of file
@@ -6,9 +6,8 @@
 实现基于均线交叉的交易策略
 """
 
-from tqsdk import TargetPosTask
-from tqsdk.ta import MA
 from framework.quant_framework import StrategyBase
+from framework.signals import Field, SMA, CrossAbove, CrossBelow, Ordered, Became, SignalEvaluator
 
 class MovingAverageStrategy(StrategyBase):
     """
@@ -29,10 +28,12 @@ class MovingAverageStrategy(StrategyBase):
         self.long_period = long_period
         self.kline_period = kline_period
         self.klines = None
-        self.short_ma = None
-        self.long_ma = None
-        self.target_pos = None
-        self.position = 0
+        close = Field("close")
+        self.short_ma = SMA(close, short_period)
+        self.long_ma = SMA(close, long_period)
+        # 金叉买入，死叉卖出
+        self.signals = SignalEvaluator(buy=CrossAbove(self.short_ma, self.long_ma),
+                                       sell=CrossBelow(self.short_ma, self.long_ma))
         
     def initialize(self, api, symbol):
         """
@@ -45,59 +46,69 @@ class MovingAverageStrategy(StrategyBase):
         super().initialize(api, symbol)
         
         # 获取K线数据
-        self.klines = api.get_kline_serial(symbol, self.kline_period)
+        self.klines = self.get_kline_serial(symbol, self.kline_period)
+        self.signals.reset()
         
         # 创建TargetPosTask用于自动调整持仓
-        self.target_pos = TargetPosTask(api, symbol)
+        self.target_pos = self.create_target_pos_task()
         
         # 打印策略参数
-        print(f"均线策略参数: 短周期={self.short_period}, 长周期={self.long_period}")
+        self.journal.info("strategy", "均线策略参数: 短周期={short_period}, 长周期={long_period}",
+                          short_period=self.short_period, long_period=self.long_period)
         
+    def warmup_bars(self):
+        """
+        长周期均线形成后还需要一根K线才能判断交叉
+        """
+        return self.long_period + 1
+        
+    def get_state(self):
+        """
+        策略状态，包含信号的增量计算状态
+        """
+        state = super().get_state()
+        state["signals"] = self.signals.get_state()
+        return state
+    
+    def set_state(self, state):
+        """
+        恢复策略状态，之后只计入快照之后的K线
+        """
+        super().set_state(state)
+        self.signals.set_state(state["signals"])
+    
     def run(self):
         """
         运行策略
         """
         while True:
             # 等待K线更新
-            self.api.wait_update()
+            self.wait_update()
+            
+            # 如果产生了新K线
+            bars = self.bars
+            if bars.is_new_bar():
+                # 使用上一根已完成的K线更新仓位统计量
+                self.update_position_sizer(bars.high[-2], bars.low[-2], bars.close[-2])
+                
+                # 在新完成的K线上增量计算信号，数据不足时均线为NaN，不产生信号
+                values = self.signals.catch_up(bars)
+                if values is not None:
+                    self._generate_signals(values)
             
-            # 如果K线最后一根发生变化
-            if self.api.is_changing(self.klines.iloc[-1], "datetime"):
-                # 确保有足够的数据计算均线
-                if len(self.klines) >= self.long_period:
-                    # 计算均线
-                    self.short_ma = MA(self.klines, self.short_period)
-                    self.long_ma = MA(self.klines, self.long_period)
-                    
-                    # 计算信号
-                    self._generate_signals()
-                    
-                # 更新性能指标
-                self.update_performance()
+            # 每次行情更新都计入绩效，捕捉K线内部的回撤
+            self.update_performance()
     
-    def _generate_signals(self):
+    def _generate_signals(self, values):
         """
-        生成交易信号
+        根据信号执行交易
+
+        Args:
+            values: 最后一根完成K线上的信号，包含buy和sell
         """
-        # 确保均线数据有效
-        if len(self.short_ma) < 2 or len(self.long_ma) < 2:
-            return
-        
-        # 获取当前和前一期的均线值
-        try:
-            short_ma_value = self.short_ma.iloc[-1]
-            long_ma_value = self.long_ma.iloc[-1]
-            short_ma_prev = self.short_ma.iloc[-2]
-            long_ma_prev = self.long_ma.iloc[-2]
-        except IndexError:
-            return
-        
-        # 金叉信号: 短周期均线从下方穿过长周期均线
-        if short_ma_prev <= long_ma_prev and short_ma_value > long_ma_value:
+        if values["buy"]:
             self._buy_signal()
-        
-        # 死叉信号: 短周期均线从上方穿过长周期均线
-        elif short_ma_prev >= long_ma_prev and short_ma_value < long_ma_value:
+        elif values["sell"]:
             self._sell_signal()
     
     def _buy_signal(self):
@@ -105,22 +116,30 @@ class MovingAverageStrategy(StrategyBase):
         买入信号处理
         """
         if self.position <= 0:
-            current_price = self.klines.iloc[-1].close
-            print(f"金叉信号: 买入 {self.symbol}, 价格: {current_price:.2f}")
-            self.target_pos.set_target_volume(1)  # 设置目标持仓为1手
-            self.position = 1
-            self.trade_count += 1
+            current_price = self.bars.close[-1]
+            # 目标手数由仓位计算和风险控制决定
+            previous = self.position
+            volume = self.set_target_direction(1, current_price)
+            # 风险控制约束后目标手数为0且原本没有持仓时不算交易
+            if self.position != previous:
+                self.journal.info("signal", "金叉信号: 买入 {symbol}, 价格: {price:.2f}, 目标持仓: {volume}手",
+                                  symbol=self.symbol, price=current_price, volume=volume)
+                self.trade_count += 1
     
     def _sell_signal(self):
         """
         卖出信号处理
         """
         if self.position >= 0:
-            current_price = self.klines.iloc[-1].close
-            print(f"死叉信号: 卖出 {self.symbol}, 价格: {current_price:.2f}")
-            self.target_pos.set_target_volume(-1)  # 设置目标持仓为-1手
-            self.position = -1
-            self.trade_count += 1
+            current_price = self.bars.close[-1]
+            # 目标手数由仓位计算和风险控制决定
+            previous = self.position
+            volume = self.set_target_direction(-1, current_price)
+            # 风险控制约束后目标手数为0且原本没有持仓时不算交易
+            if self.position != previous:
+                self.journal.info("signal", "死叉信号: 卖出 {symbol}, 价格: {price:.2f}, 目标持仓: {volume}手",
+                                  symbol=self.symbol, price=current_price, volume=volume)
+                self.trade_count += 1
 
 class MultipleMovingAverageStrategy(StrategyBase):
     """
@@ -143,11 +162,15 @@ class MultipleMovingAverageStrategy(StrategyBase):
         self.long_period = long_period
         self.kline_period = kline_period
         self.klines = None
-        self.short_ma = None
-        self.mid_ma = None
-        self.long_ma = None
-        self.target_pos = None
-        self.position = 0
+        close = Field("close")
+        self.short_ma = SMA(close, short_period)
+        self.mid_ma = SMA(close, mid_period)
+        self.long_ma = SMA(close, long_period)
+        # 均线刚形成多头排列时买入，刚形成空头排列时卖出
+        self.signals = SignalEvaluator(
+            buy=Became(Ordered(self.short_ma, self.mid_ma, self.long_ma)),
+            sell=Became(Ordered(self.short_ma, self.mid_ma, self.long_ma, descending=False)),
+        )
         
     def initialize(self, api, symbol):
         """
@@ -160,64 +183,69 @@ class MultipleMovingAverageStrategy(StrategyBase):
         super().initialize(api, symbol)
         
         # 获取K线数据
-        self.klines = api.get_kline_serial(symbol, self.kline_period)
+        self.klines = self.get_kline_serial(symbol, self.kline_period)
+        self.signals.reset()
         
         # 创建TargetPosTask用于自动调整持仓
-        self.target_pos = TargetPosTask(api, symbol)
+        self.target_pos = self.create_target_pos_task()
         
         # 打印策略参数
-        print(f"多均线策略参数: 短周期={self.short_period}, 中周期={self.mid_period}, 长周期={self.long_period}")
+        self.journal.info("strategy", "多均线策略参数: 短周期={short_period}, 中周期={mid_period}, 长周期={long_period}",
+                          short_period=self.short_period, mid_period=self.mid_period, long_period=self.long_period)
         
+    def warmup_bars(self):
+        """
+        长周期均线形成后还需要一根K线才能判断排列是否刚刚形成
+        """
+        return self.long_period + 1
+        
+    def get_state(self):
+        """
+        策略状态，包含信号的增量计算状态
+        """
+        state = super().get_state()
+        state["signals"] = self.signals.get_state()
+        return state
+    
+    def set_state(self, state):
+        """
+        恢复策略状态，之后只计入快照之后的K线
+        """
+        super().set_state(state)
+        self.signals.set_state(state["signals"])
+    
     def run(self):
         """
         运行策略
         """
         while True:
             # 等待K线更新
-            self.api.wait_update()
+            self.wait_update()
+            
+            # 如果产生了新K线
+            bars = self.bars
+            if bars.is_new_bar():
+                # 使用上一根已完成的K线更新仓位统计量
+                self.update_position_sizer(bars.high[-2], bars.low[-2], bars.close[-2])
+                
+                # 在新完成的K线上增量计算信号，数据不足时均线为NaN，不产生信号
+                values = self.signals.catch_up(bars)
+                if values is not None:
+                    self._generate_signals(values)
             
-            # 如果K线最后一根发生变化
-            if self.api.is_changing(self.klines.iloc[-1], "datetime"):
-                # 确保有足够的数据计算均线
-                if len(self.klines) >= self.long_period:
-                    # 计算均线
-                    self.short_ma = MA(self.klines, self.short_period)
-                    self.mid_ma = MA(self.klines, self.mid_period)
-                    self.long_ma = MA(self.klines, self.long_period)
-                    
-                    # 计算信号
-                    self._generate_signals()
-                    
-                # 更新性能指标
-                self.update_performance()
+            # 每次行情更新都计入绩效，捕捉K线内部的回撤
+            self.update_performance()
     
-    def _generate_signals(self):
-        """
-        生成交易信号
-        """
-        # 确保均线数据有效
-        if len(self.short_ma) < 2 or len(self.mid_ma) < 2 or len(self.long_ma) < 2:
-            return
-        
-        # 获取当前和前一期的均线值
-        try:
-            short_ma_value = self.short_ma.iloc[-1]
-            mid_ma_value = self.mid_ma.iloc[-1]
-            long_ma_value = self.long_ma.iloc[-1]
-            short_ma_prev = self.short_ma.iloc[-2]
-            mid_ma_prev = self.mid_ma.iloc[-2]
-            long_ma_prev = self.long_ma.iloc[-2]
-        except IndexError:
-            return
-        
-        # 买入信号: 短周期均线在中周期均线之上，且中周期均线在长周期均线之上
-        if (short_ma_value > mid_ma_value > long_ma_value and 
-            not (short_ma_prev > mid_ma_prev > long_ma_prev)):
+    def _generate_signals(self, values):
+        """
+        根据信号执行交易
+
+        Args:
+            values: 最后一根完成K线上的信号，包含buy和sell
+        """
+        if values["buy"]:
             self._buy_signal()
-        
-        # 卖出信号: 短周期均线在中周期均线之下，且中周期均线在长周期均线之下
-        elif (short_ma_value < mid_ma_value < long_ma_value and 
-              not (short_ma_prev < mid_ma_prev < long_ma_prev)):
+        elif values["sell"]:
             self._sell_signal()
     
     def _buy_signal(self):
@@ -225,19 +253,27 @@ class MultipleMovingAverageStrategy(StrategyBase):
         买入信号处理
         """
         if self.position <= 0:
-            current_price = self.klines.iloc[-1].close
-            print(f"均线多头排列: 买入 {self.symbol}, 价格: {current_price:.2f}")
-            self.target_pos.set_target_volume(1)  # 设置目标持仓为1手
-            self.position = 1
-            self.trade_count += 1
+            current_price = self.bars.close[-1]
+            # 目标手数由仓位计算和风险控制决定
+            previous = self.position
+            volume = self.set_target_direction(1, current_price)
+            # 风险控制约束后目标手数为0且原本没有持仓时不算交易
+            if self.position != previous:
+                self.journal.info("signal", "均线多头排列: 买入 {symbol}, 价格: {price:.2f}, 目标持仓: {volume}手",
+                                  symbol=self.symbol, price=current_price, volume=volume)
+                self.trade_count += 1
     
     def _sell_signal(self):
         """
         卖出信号处理
         """
         if self.position >= 0:
-            current_price = self.klines.iloc[-1].close
-            print(f"均线空头排列: 卖出 {self.symbol}, 价格: {current_price:.2f}")
-            self.target_pos.set_target_volume(-1)  # 设置目标持仓为-1手
-            self.position = -1
-            self.trade_count += 1
\ No newline at end of file
+            current_price = self.bars.close[-1]
+            # 目标手数由仓位计算和风险控制决定
+            previous = self.position
+            volume = self.set_target_direction(-1, current_price)
+            # 风险控制约束后目标手数为0且原本没有持仓时不算交易
+            if self.position != previous:
+                self.journal.info("signal", "均线空头排列: 卖出 {symbol}, 价格: {price:.2f}, 目标持仓: {volume}手",
+                                  symbol=self.symbol, price=current_price, volume=volume)
+                self.trade_count += 1
\ No newline at end of file
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测量各模块的导入耗时，并检查只做计算的模块是否加载了绘图、网络和数据处理库
+每个模块在独立的子进程中导入，取多次运行的最小值
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+# 要测量的模块
+MODULES = [
+    "framework.quant_framework",
+    "framework.execution_simulator",
+    "framework.position_sizing",
+    "analysis_tools.chip_distribution",
+    "analysis_tools.chip_distribution_with_increment",
+    "strategies.moving_average_strategy",
+    "strategies.chip_distribution_strategy",
+]
+
+# 只应在需要时加载的重量级依赖
+HEAVY_MODULES = ["tqsdk", "matplotlib.pyplot", "pandas"]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module, repeat=5):
+    """
+    在子进程中导入模块，返回最短耗时（秒）和已加载的重量级依赖
+    """
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t); "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best = None
+    loaded = ""
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True,
+                                capture_output=True, text=True)
+        lines = result.stdout.strip().splitlines()
+        elapsed = float(lines[0])
+        loaded = lines[1] if len(lines) > 1 else ""
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+
+def measure_interpreter(repeat=5):
+    """
+    测量空解释器和仅导入numpy的启动耗时，作为对比基准
+    """
+    results = {}
+    for label, code in [("python", "pass"), ("numpy", "import numpy")]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = best
+    return results
+
+
+if __name__ == "__main__":
+    baseline = measure_interpreter()
+    print(f"解释器启动: {baseline['python'] * 1000:.1f} ms, 导入numpy的进程启动: {baseline['numpy'] * 1000:.1f} ms")
+    print(f"{'模块':<50}{'导入耗时(ms)':>14}  已加载的重量级依赖")
+    for module in MODULES:
+        elapsed, loaded = measure_import(module)
+        print(f"{module:<50}{elapsed * 1000:>14.1f}  {loaded or '-'}")
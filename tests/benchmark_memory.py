@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+比较紧凑数据类型与默认数据类型的内存占用和精度
+K线使用一年的模拟1分钟K线，筹码分布使用同一段K线按交易日分批计入后的状态，
+另外测量前2万根K线逐根update_bar（策略中的用法）后的误差
+"""
+
+import os
+import sys
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from framework.compact import compact_klines, restore_prices  # noqa: E402
+from analysis_tools.chip_compact import CompactChipDistribution  # noqa: E402
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement  # noqa: E402
+
+# 一年约244个交易日，每个交易日约345根1分钟K线
+BARS = 244 * 345
+PRICE_TICK = 1.0
+# 逐K线更新的精度测量使用的K线数量
+PER_BAR_BARS = 20000
+
+
+def make_minute_klines(n=BARS, seed=0):
+    """
+    生成模拟1分钟K线，字段与天勤K线一致（全部为float64）
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = 3000 + np.cumsum(rng.normal(0, 2, n)).round()
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    start = pd.Timestamp("2023-01-03 01:00").value
+    return pd.DataFrame({
+        "datetime": start + np.arange(n) * 60 * 10**9,
+        "open": open_, "high": np.maximum(open_, close) + rng.integers(0, 3, n),
+        "low": np.minimum(open_, close) - rng.integers(0, 3, n), "close": close,
+        "volume": rng.integers(10, 2000, n).astype(float),
+        "open_oi": rng.integers(500000, 600000, n).astype(float),
+        "close_oi": rng.integers(500000, 600000, n).astype(float),
+    })
+
+
+def dict_bytes(price_vol):
+    """
+    {价格: 筹码量} 字典及其中浮点数对象占用的字节数
+    """
+    return sys.getsizeof(price_vol) + sum(sys.getsizeof(p) + sys.getsizeof(v) for p, v in price_vol.items())
+
+
+def replay(chip, klines, batch=345):
+    """
+    按交易日分批计入K线，模拟实盘中逐日累积的筹码状态
+    """
+    columns = [klines[c].to_numpy() for c in ["high", "low", "close", "volume", "close_oi"]]
+    for start in range(0, len(klines), batch):
+        chip.replay_bars(*[values[start:start + batch] for values in columns])
+    return chip
+
+
+if __name__ == "__main__":
+    klines = make_minute_klines()
+    compact = compact_klines(klines, PRICE_TICK)
+    full_bytes = klines.memory_usage(deep=True).sum()
+    compact_bytes = compact.memory_usage(deep=True).sum()
+    exact = np.array_equal(restore_prices(compact["close"].to_numpy(), PRICE_TICK), klines["close"].to_numpy())
+    print(f"K线 {len(klines)} 根: float64 {full_bytes / 2**20:.2f} MB, 紧凑 {compact_bytes / 2**20:.2f} MB "
+          f"({compact_bytes / full_bytes:.0%}), 价格精确还原: {exact}")
+
+    reference = replay(ChipDistributionWithIncrement(PRICE_TICK), klines)
+    expected = reference.price_vol
+    scale = max(expected.values())
+    print(f"{'筹码分布':<24}{'价格数':>8}{'字节数':>12}{'每价格字节':>12}{'最大相对误差':>14}")
+    print(f"{'字典（float64）':<24}{len(expected):>8}{dict_bytes(expected):>12}"
+          f"{dict_bytes(expected) / len(expected):>12.1f}{0:>14.1e}")
+    for label, compensated in [("float32 + float32残差", True), ("float32", False)]:
+        chip = replay(CompactChipDistribution(PRICE_TICK, compensated=compensated), klines)
+        actual = chip.price_vol
+        error = max(abs(expected.get(p, 0) - actual.get(p, 0)) for p in set(expected) | set(actual)) / scale
+        print(f"{label:<24}{len(chip.grid):>8}{chip.nbytes:>12}{chip.nbytes / len(chip.grid):>12.1f}{error:>14.1e}")
+
+    # 策略中逐K线调用update_bar，每根K线写回一次float32，误差随写回次数累积
+    bars = klines.iloc[:PER_BAR_BARS]
+    columns = [bars[c].to_numpy() for c in ["high", "low", "close", "volume", "close_oi"]]
+    expected = ChipDistributionWithIncrement(PRICE_TICK)
+    expected.replay_bars(*columns)
+    expected = expected.price_vol
+    scale = max(expected.values())
+    print(f"逐K线update_bar（{PER_BAR_BARS}根）{'':<4}{'最大相对误差':>14}")
+    for label, compensated in [("float32 + float32残差", True), ("float32", False)]:
+        chip = CompactChipDistribution(PRICE_TICK, compensated=compensated)
+        for i, row in enumerate(zip(*columns)):
+            chip.update_bar(i, *row)
+        actual = chip.price_vol
+        error = max(abs(expected.get(p, 0) - actual.get(p, 0)) for p in set(expected) | set(actual)) / scale
+        print(f"{label:<24}{error:>14.1e}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测量运行时指标的记录开销
+每种记录方式重复多轮，取每次记录耗时的最小值；实盘中每次wait_update唤醒记录一次计数和两次耗时
+"""
+
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from framework.runtime_metrics import MetricsRegistry  # noqa: E402
+
+# 每轮记录次数
+RECORDS = 200000
+# 记录一次计数加一次耗时的目标开销，单位为秒
+TARGET = 1e-6
+
+
+def measure(record, n=RECORDS, repeat=5):
+    """
+    返回调用record(i)一次的最短平均耗时（秒）
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(n):
+            record(i)
+        elapsed = (time.perf_counter() - start) / n
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total")
+    histogram = registry.histogram("latency_seconds")
+
+    def both(i):
+        counter.inc()
+        histogram.observe(i)
+
+    baseline = measure(lambda i: None)
+    print(f"{'记录方式':<24}{'每次耗时(us)':>14}{'扣除空调用(us)':>16}")
+    for label, record in [("counter.inc", lambda i: counter.inc()), ("histogram.observe", histogram.observe),
+                          ("计数 + 耗时", both)]:
+        elapsed = measure(record)
+        print(f"{label:<24}{elapsed * 1e6:>14.3f}{(elapsed - baseline) * 1e6:>16.3f}")
+    print(f"目标: 计数 + 耗时在 {TARGET * 1e6:.1f} us 以内")
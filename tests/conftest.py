@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _make_klines(n=300, seed=0):
+    """生成模拟日K线数据"""
+    rng = np.random.default_rng(seed)
+    close = 1500 + np.cumsum(rng.normal(0, 15, n)).round()
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + rng.integers(0, 10, n)
+    low = np.minimum(open_, close) - rng.integers(0, 10, n)
+    start = pd.Timestamp("2023-01-02").value
+    return pd.DataFrame({
+        "datetime": start + np.arange(n) * 86400 * 10**9,
+        "open": open_, "high": high, "low": low, "close": close,
+        "volume": rng.integers(50, 500, n).astype(float),
+        "close_oi": rng.integers(10000, 20000, n).astype(float),
+    })
+
+
+def _make_chip_klines(n=80):
+    """生成筹码分布测试用K线，包含无效K线和最高价等于最低价的K线"""
+    klines = _make_klines(n, seed=5)
+    klines["open_interest"] = klines["close_oi"]
+    klines.loc[10, "volume"] = np.nan
+    klines.loc[20, ["high", "low", "close"]] = klines.loc[20, "low"]
+    return klines
+
+
+def _assert_same_distribution(expected, actual, atol):
+    """两个 {价格: 筹码量} 分布逐价格的差不超过atol"""
+    prices = set(expected) | set(actual)
+    diff = max(abs(expected.get(p, 0) - actual.get(p, 0)) for p in prices)
+    assert diff <= atol
+
+
+@pytest.fixture
+def make_klines():
+    return _make_klines
+
+
+@pytest.fixture
+def make_chip_klines():
+    return _make_chip_klines
+
+
+@pytest.fixture
+def assert_same_distribution():
+    return _assert_same_distribution
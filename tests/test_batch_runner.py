@@ -0,0 +1,96 @@
+import json
+import pytest
+from framework.__main__ import main
+from framework.batch_runner import expand_jobs, run_jobs
+from framework.local_store import LocalStore
+
+
+@pytest.fixture
+def make_spec(make_klines):
+    def make(root):
+        store = LocalStore(root)
+        store.save_klines("CZCE.FG401", 86400, make_klines(seed=1))
+        store.save_klines("CZCE.SA401", 86400, make_klines(seed=2))
+        return {
+            "store": root,
+            "defaults": {"start_date": "2023-02-01"},
+            "jobs": [
+                {"type": "backtest", "strategy": "strategies.moving_average_strategy.MovingAverageStrategy",
+                 "params": {"short_period": 5, "long_period": 20}, "symbols": ["CZCE.FG401", "CZCE.SA401"]},
+                {"type": "chip", "symbols": ["CZCE.FG401"], "methods": ["triangle", "even"],
+                 "start_date": "2023-09-15"},
+            ],
+        }
+    return make
+
+
+def test_local_store_round_trip(tmp_path, make_klines):
+    store = LocalStore(str(tmp_path))
+    klines = make_klines(50)
+    store.save_klines("CZCE.FG401", 86400, klines.iloc[:30], chunk="a")
+    store.save_klines("CZCE.FG401", 86400, klines.iloc[20:], chunk="b")
+
+    # 分块合并后去重
+    loaded = store.load_klines("CZCE.FG401", 86400)
+    assert len(loaded) == 50
+    assert (loaded["close"].to_numpy() == klines["close"].to_numpy()).all()
+    assert (loaded["open_interest"] == loaded["close_oi"]).all()
+
+
+def test_batch_runner_resumes(tmp_path, make_spec):
+    spec = make_spec(str(tmp_path))
+    jobs = expand_jobs(spec)
+    assert len(jobs) == 4
+
+    status = run_jobs(spec, workers=1)
+    assert list(status.values()) == ["done"] * 4
+    store = LocalStore(str(tmp_path))
+    for job_id, job in jobs:
+        metrics = store.load_result(job_id)["metrics"]
+        if job["type"] == "backtest":
+            assert metrics["trade_count"] > 0
+        else:
+            assert 0 <= metrics["profit_ratio"] <= 1
+
+    # 再次运行时跳过已完成的任务
+    status = run_jobs(spec, workers=1)
+    assert list(status.values()) == ["skipped"] * 4
+
+
+def test_cli_runs_jobs_in_parallel(tmp_path, make_spec):
+    spec = make_spec(str(tmp_path / "data"))
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps(spec))
+
+    assert main([str(path), "--workers", "2"]) == 0
+    store = LocalStore(str(tmp_path / "data"))
+    assert all(store.has_result(job_id) for job_id, _ in expand_jobs(spec))
+
+
+def test_batch_runner_reuses_cache(tmp_path, make_spec):
+    spec = make_spec(str(tmp_path))
+    spec["cache"] = True
+    run_jobs(spec, workers=1)
+    store = LocalStore(str(tmp_path))
+    first = {job_id: store.load_result(job_id)["metrics"] for job_id, _ in expand_jobs(spec)}
+
+    # 不跳过已完成任务时，结果从缓存中读取
+    status = run_jobs(spec, workers=1, resume=False)
+    assert list(status.values()) == ["done"] * 4
+    assert {job_id: store.load_result(job_id)["metrics"] for job_id, _ in expand_jobs(spec)} == first
+
+
+def test_failed_tqsdk_backtest_is_not_stored(tmp_path, monkeypatch):
+    import tqsdk
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("天勤服务器不可用")
+
+    monkeypatch.setattr(tqsdk, "TqApi", unavailable)
+    spec = {"store": str(tmp_path), "jobs": [
+        {"type": "backtest", "strategy": "strategies.moving_average_strategy.MovingAverageStrategy",
+         "symbol": "CZCE.FG401", "mode": "tqsdk", "start_date": "2023-01-01", "end_date": "2023-06-30"}]}
+    status = run_jobs(spec, workers=1)
+    assert list(status.values()) == ["failed"]
+    # 失败的任务没有结果，重新运行时不会被跳过
+    assert not LocalStore(str(tmp_path)).has_result(next(iter(status)))
@@ -0,0 +1,28 @@
+import numpy as np
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+from framework.quant_framework import QuantFramework
+from strategies.chip_distribution_strategy import ChipDistributionStrategy
+
+
+def test_chip_metrics_match_individual_queries(make_klines):
+    klines = make_klines(60)
+    chip = ChipDistributionWithIncrement()
+    for row in klines.itertuples():
+        chip.update_bar(row.datetime, row.high, row.low, row.close, row.volume, row.close_oi)
+
+    price = klines["close"].iloc[-1]
+    profit_ratio, costs = chip.get_chip_metrics(price, [15, 50, 85])
+    assert np.isclose(profit_ratio, chip.get_profit_ratio(price))
+    assert costs == [chip.get_cost_distribution(p) for p in [15, 50, 85]]
+
+
+def test_chip_strategy_runs_offline(make_klines):
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    strategy = ChipDistributionStrategy(profit_ratio_high=0.7, profit_ratio_low=0.3)
+    framework.set_strategy(strategy)
+    framework.run_offline_backtest(make_klines(120))
+
+    # 每根已完成的K线只计入一次筹码分布
+    assert strategy.bar_count == 119
+    assert strategy.trade_count > 0
@@ -0,0 +1,133 @@
+import numpy as np
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+from analysis_tools.chip_kernels import grid_prices, increment_turnover_rates, survival_weights
+
+
+def test_vectorized_replay_matches_loop(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines()
+    price = klines["close"].iloc[-1]
+    for method in ("even", "triangle"):
+        loop = ChipDistributionWithIncrement()
+        loop.calculate_from_klines(klines, method, decay_coefficient=0.8, vectorized=False)
+        fast = ChipDistributionWithIncrement()
+        fast.calculate_from_klines(klines, method, decay_coefficient=0.8)
+
+        assert_same_distribution(loop.price_vol, fast.price_vol, 1e-9)
+        assert np.isclose(sum(loop.price_vol.values()), sum(fast.price_vol.values()))
+        loop_ratio, loop_costs = loop.get_chip_metrics(price, [15, 50, 85])
+        fast_ratio, fast_costs = fast.get_chip_metrics(price, [15, 50, 85])
+        assert np.isclose(loop_ratio, fast_ratio)
+        assert loop_costs == fast_costs
+        assert fast.prev_open_interest == loop.prev_open_interest
+
+
+def test_replay_in_segments_matches_full_history(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines()
+    full = ChipDistributionWithIncrement()
+    full.calculate_from_klines(klines, "even")
+
+    chip = ChipDistributionWithIncrement()
+    columns = [klines[c].to_numpy() for c in ["high", "low", "close", "volume", "open_interest"]]
+    count = 0
+    for start, stop in [(0, 30), (30, 31), (31, 80)]:
+        count += chip.replay_bars(*[values[start:stop] for values in columns], method="even")
+    assert count == 79
+    assert_same_distribution(full.price_vol, chip.price_vol, 1e-12)
+
+
+def test_triangle_top_of_bar_matches_loop(make_chip_klines, assert_same_distribution):
+    # 最小变动价位为1时K线最高价多落在已有筹码的价格点上，负值分配与已有筹码相加后保留
+    klines = make_chip_klines(200)
+    price = klines["close"].iloc[-1]
+    columns = [klines[c].to_numpy() for c in ["high", "low", "close", "volume", "open_interest"]]
+    for coefficient in (0.8, 2.5):
+        loop = ChipDistributionWithIncrement(price_tick=1.0)
+        loop.calculate_from_klines(klines, "triangle", decay_coefficient=coefficient, vectorized=False)
+        fast = ChipDistributionWithIncrement(price_tick=1.0)
+        fast.calculate_from_klines(klines, "triangle", decay_coefficient=coefficient)
+        assert_same_distribution(loop.price_vol, fast.price_vol, 1e-9)
+        assert np.isclose(loop.get_profit_ratio(price), fast.get_profit_ratio(price))
+
+        # 分段计入时已有筹码参与递推
+        chip = ChipDistributionWithIncrement(price_tick=1.0)
+        chip.decay_coefficient = coefficient
+        for start, stop in [(0, 70), (70, 71), (71, 72), (72, 200)]:
+            chip.replay_bars(*[values[start:stop] for values in columns])
+        assert_same_distribution(loop.price_vol, chip.price_vol, 1e-9)
+
+
+def test_survival_weights():
+    rates = increment_turnover_rates([10, 5, 8], [100, 104, 50])
+    assert np.allclose(rates, [0.1, 4 / 104, 8 / 50])
+    weights, survival = survival_weights([0.1, 0.5, 1.5])
+    # 换手率超过1时之前的筹码全部清空
+    assert np.allclose(weights, [0, 0, 1])
+    assert survival == 0
+
+
+def test_contract_price_tick_grid(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines()
+    price = klines["close"].iloc[-1]
+    fine = ChipDistributionWithIncrement()
+    fine.calculate_from_klines(klines, "even")
+    coarse = ChipDistributionWithIncrement.for_symbol("CZCE.FG401")
+    assert coarse.price_precision == 1.0
+    coarse.calculate_from_klines(klines, "even")
+    # 价格网格与最小变动价位对齐，价格点数量按比例减少
+    prices = np.array(list(coarse.price_vol))
+    assert np.array_equal(prices, np.round(prices))
+    assert len(fine.price_vol) > 50 * len(coarse.price_vol)
+    assert np.isclose(sum(fine.price_vol.values()), sum(coarse.price_vol.values()), rtol=1e-2)
+    assert abs(fine.get_cost_distribution(50) - coarse.get_cost_distribution(50)) <= 1.0
+
+    # 向量化计算与逐K线计算使用同一个网格
+    loop = ChipDistributionWithIncrement(price_tick=0.5)
+    loop.calculate_from_klines(klines, "even", vectorized=False)
+    fast = ChipDistributionWithIncrement(price_tick=0.5)
+    fast.calculate_from_klines(klines, "even")
+    assert_same_distribution(loop.price_vol, fast.price_vol, 1e-12)
+    loop_ratio, loop_costs = loop.get_chip_metrics(price, [15, 85])
+    fast_ratio, fast_costs = fast.get_chip_metrics(price, [15, 85])
+    assert np.isclose(loop_ratio, fast_ratio) and loop_costs == fast_costs
+
+    # 小于0.01的最小变动价位保留对应的小数位数
+    sub_cent = ChipDistributionWithIncrement(price_tick=0.001)
+    sub_cent.update_bar(0, 1.0025, 1.0, 1.001, 100, 1000)
+    assert sorted(sub_cent.price_vol) == [1.0, 1.001, 1.002, 1.003]
+
+
+def test_off_grid_low_covers_every_grid_price(make_chip_klines, assert_same_distribution):
+    # 1501~1511在间距2.0的网格上覆盖1500到1512的每个价格点，不重复也不跳过
+    assert grid_prices(1501, 1511, 2.0).tolist() == [1500, 1502, 1504, 1506, 1508, 1510, 1512]
+    chip = ChipDistributionWithIncrement(price_tick=2.0)
+    chip.update_bar(0, 1511, 1501, 1506, 10, 100, method="even")
+    assert np.isclose(sum(chip.price_vol.values()), 10 * 10 / 100)
+
+    # 价格多数不在网格上时逐K线计算与向量化计算一致
+    klines = make_chip_klines(200)
+    for method in ("even", "triangle"):
+        loop = ChipDistributionWithIncrement(price_tick=2.0)
+        loop.calculate_from_klines(klines, method, decay_coefficient=0.8, vectorized=False)
+        fast = ChipDistributionWithIncrement(price_tick=2.0)
+        fast.calculate_from_klines(klines, method, decay_coefficient=0.8)
+        assert_same_distribution(loop.price_vol, fast.price_vol, 1e-9)
+
+
+def test_price_tick_from_quote():
+    from framework.contracts import resolve_price_tick
+
+    class Quote:
+        price_tick = 0.2
+
+    class Api:
+        def __init__(self, quote):
+            self.quote = quote
+
+        def get_quote(self, symbol):
+            return self.quote
+
+    assert resolve_price_tick("DCE.i2405") == 0.5
+    assert resolve_price_tick("DCE.i2405", Api(Quote())) == 0.2
+    # 行情中没有有效的最小变动价位时使用本地参数表
+    Quote.price_tick = float("nan")
+    assert resolve_price_tick("DCE.i2405", Api(Quote())) == 0.5
@@ -0,0 +1,22 @@
+import os
+import numpy as np
+from analysis_tools.chip_plotting import bin_chip_distribution, render_chip_charts
+
+
+def test_binning_preserves_total_chips():
+    prices = np.round(np.arange(1000, 4000, 0.01), 2)
+    volumes = np.random.default_rng(0).random(len(prices))
+    edges, values = bin_chip_distribution(prices, volumes, max_bins=1200, price_step=0.01)
+
+    assert len(values) == 1200
+    assert len(edges) == 1201
+    assert np.isclose(values.sum(), volumes.sum())
+
+
+def test_render_chip_charts_headless(tmp_path):
+    prices = np.arange(100, 110, 0.5)
+    volumes = np.ones(len(prices))
+    paths = render_chip_charts([("CZCE.FG401", prices, volumes, 105.0), ("DCE.i2405", prices, volumes, None)],
+                               str(tmp_path))
+    assert [os.path.basename(p) for p in paths] == ["CZCE.FG401.png", "DCE.i2405.png"]
+    assert all(os.path.getsize(p) > 0 for p in paths)
@@ -0,0 +1,42 @@
+import numpy as np
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+from analysis_tools.chip_screener import CrossSectionalChips
+
+FIELDS = ["high", "low", "close", "volume", "close_oi"]
+
+
+def test_cross_section_matches_single_symbol(make_klines):
+    symbols = ["CZCE.FG401", "CZCE.SA401", "DCE.i2405"]
+    klines = [make_klines(60, seed=seed) for seed in range(3)]
+    klines[1].loc[5, "volume"] = np.nan
+    # 初始网格很窄，需要多次平移和扩大
+    screener = CrossSectionalChips(symbols, price_ticks=[0.01] * 3, width=64)
+    for i in range(60):
+        screener.update(*[np.array([k[field].iloc[i] for k in klines]) for field in FIELDS])
+    assert list(screener.bar_counts) == [60, 59, 60]
+
+    prices = np.array([k["close"].iloc[-1] for k in klines])
+    profit_ratio, costs = screener.metrics(prices, [15, 50, 85])
+    for s, k in enumerate(klines):
+        chip = ChipDistributionWithIncrement()
+        for row in k.itertuples():
+            chip.update_bar(row.datetime, row.high, row.low, row.close, row.volume, row.close_oi)
+        expected_ratio, expected_costs = chip.get_chip_metrics(prices[s], [15, 50, 85])
+        assert np.isclose(profit_ratio[s], expected_ratio)
+        assert np.allclose(costs[s], expected_costs)
+
+        grid_prices, volumes = screener.get_distribution(symbols[s])
+        assert np.allclose(volumes.sum(), sum(chip.price_vol.values()))
+
+    # 截面筛选
+    above = prices > screener.cost_distribution(85)
+    assert screener.select(above) == [symbols[s] for s in range(3) if prices[s] > costs[s, 2]]
+
+
+def test_contract_ticks_and_empty_symbols():
+    screener = CrossSectionalChips(["CZCE.FG401", "SHFE.rb2401"])
+    assert list(screener.price_ticks) == [1.0, 1.0]
+    screener.update([1510, np.nan], [1490, np.nan], [1500, np.nan], [100, np.nan], [1000, np.nan])
+    profit_ratio, costs = screener.metrics([1500, 3000], [50])
+    assert 0 < profit_ratio[0] < 1
+    assert profit_ratio[1] == 0 and costs[1, 0] == 0
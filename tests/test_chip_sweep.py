@@ -0,0 +1,60 @@
+import numpy as np
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+from analysis_tools.chip_sweep import DecaySweepChips
+
+
+def test_sweep_matches_single_coefficient_runs(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines()
+    price = klines["close"].iloc[-1]
+    coefficients = [0.3, 0.8, 1.0, 2.5]
+    for method in ("triangle", "even"):
+        sweep = DecaySweepChips(coefficients, price_tick=1.0, method=method)
+        sweep.calculate_from_klines(klines)
+        assert sweep.bar_count == 79
+        ratios, costs = sweep.metrics(price, [15, 50, 85])
+        for i, coefficient in enumerate(coefficients):
+            chip = ChipDistributionWithIncrement(price_tick=1.0)
+            chip.calculate_from_klines(klines, method, decay_coefficient=coefficient)
+            assert_same_distribution(chip.price_vol, sweep.to_chip(i).price_vol, 1e-9)
+            ratio, expected_costs = chip.get_chip_metrics(price, [15, 50, 85])
+            assert np.isclose(ratios[i], ratio)
+            assert list(costs[i]) == expected_costs
+        assert sweep.to_chip(0).prev_open_interest == chip.prev_open_interest
+
+
+def test_sweep_incremental_updates(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines()
+    full = DecaySweepChips([0.5, 1.0], price_tick=1.0, method="even")
+    full.calculate_from_klines(klines)
+
+    sweep = DecaySweepChips([0.5, 1.0], price_tick=1.0, method="even")
+    columns = [klines[c].to_numpy() for c in ["high", "low", "close", "volume", "open_interest"]]
+    sweep.replay_bars(*[values[:40] for values in columns])
+    for row in zip(*[values[40:] for values in columns]):
+        sweep.update_bar(*row)
+    assert sweep.bar_count == full.bar_count
+    for i in range(2):
+        expected = dict(zip(*[values.tolist() for values in full.get_distribution(i)]))
+        actual = dict(zip(*[values.tolist() for values in sweep.get_distribution(i)]))
+        assert_same_distribution(expected, actual, 1e-9)
+    assert np.allclose(sweep.cost_distribution(50), full.cost_distribution(50))
+
+
+def test_sweep_incremental_triangle_matches_per_bar_loop(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines(200)
+    coefficients = [0.8, 2.5]
+    sweep = DecaySweepChips(coefficients, price_tick=1.0, method="triangle")
+    columns = [klines[c].to_numpy() for c in ["high", "low", "close", "volume", "open_interest"]]
+    sweep.replay_bars(*[values[:40] for values in columns])
+    for row in zip(*[values[40:] for values in columns]):
+        sweep.update_bar(*row)
+
+    # 参照为逐K线循环计算，而不是同一套向量化内核
+    for i, coefficient in enumerate(coefficients):
+        loop = ChipDistributionWithIncrement(price_tick=1.0)
+        loop.decay_coefficient = coefficient
+        for row in klines.itertuples():
+            loop.update_bar(row.Index, row.high, row.low, row.close, row.volume, row.open_interest)
+        actual = dict(zip(*[values.tolist() for values in sweep.get_distribution(i)]))
+        assert_same_distribution(loop.price_vol, actual, 1e-9)
+        assert sweep.to_chip(i).prev_open_interest == loop.prev_open_interest
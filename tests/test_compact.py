@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from analysis_tools.chip_compact import CompactChipDistribution
+from analysis_tools.chip_distribution_with_increment import ChipDistributionWithIncrement
+from analysis_tools.chip_sweep import DecaySweepChips
+from framework.compact import compact_klines, compact_prices, restore_prices
+from framework.local_store import LocalStore
+from framework.quant_framework import QuantFramework
+from strategies.chip_distribution_strategy import ChipDistributionStrategy
+
+
+def test_compact_klines_round_trip(tmp_path, make_klines):
+    klines = make_klines(300)
+    # 最小变动价位0.2时价格不是float32可以精确表示的数，还原后仍与对齐的价格一致
+    klines["close"] = klines["close"] + 0.2 * (np.arange(300) % 5)
+    klines.loc[5, "volume"] = np.nan
+    compact = compact_klines(klines, price_tick=0.2)
+    assert compact["close"].dtype == np.float32 and compact["close_oi"].dtype == np.int32
+    # 含NaN的成交量保存为float32
+    assert compact["volume"].dtype == np.float32 and np.isnan(compact["volume"].iat[5])
+    assert compact["datetime"].dtype == np.int64
+    assert np.array_equal(restore_prices(compact["close"].to_numpy(), 0.2), np.round(klines["close"].to_numpy(), 1))
+    assert compact.memory_usage().sum() < 0.6 * klines.memory_usage().sum()
+
+    with pytest.raises(ValueError):
+        compact_prices([2.0 ** 22 * 0.01], 0.01)
+
+    store = LocalStore(str(tmp_path))
+    store.save_klines("CZCE.FG401", 86400, make_klines(50))
+    loaded = store.load_klines("CZCE.FG401", 86400, compact=True)
+    assert loaded["high"].dtype == np.float32 and loaded["open_interest"].dtype == np.int32
+
+
+def test_compact_chips_match_dict_chips(make_chip_klines, assert_same_distribution):
+    klines = make_chip_klines()
+    price = klines["close"].iloc[-1]
+    expected = ChipDistributionWithIncrement(price_tick=1.0)
+    compensated = CompactChipDistribution(price_tick=1.0, compensated=True)
+    plain = CompactChipDistribution(price_tick=1.0)
+    for chip in (expected, compensated, plain):
+        chip.decay_coefficient = 0.8
+    # 逐根更新，舍入误差随更新次数累积
+    for row in klines.itertuples():
+        values = (row.high, row.low, row.close, row.volume, row.open_interest)
+        expected.replay_bars(*[np.array([v]) for v in values])
+        compensated.update_bar(row.Index, *values)
+        plain.update_bar(row.Index, *values)
+    assert compensated.prev_open_interest == expected.prev_open_interest
+
+    scale = max(expected.price_vol.values())
+    assert_same_distribution(expected.price_vol, compensated.price_vol, scale * 1e-12)
+    assert_same_distribution(expected.price_vol, plain.price_vol, scale * len(klines) * 2.0 ** -24)
+    # float32网格本身的误差不超过一次舍入
+    stored = dict(zip(compensated.prices.tolist(), compensated.grid.tolist()))
+    assert_same_distribution(expected.price_vol, stored, scale * 2.0 ** -24)
+
+    ratio, costs = expected.get_chip_metrics(price, [15, 50, 85])
+    compact_ratio, compact_costs = compensated.get_chip_metrics(price, [15, 50, 85])
+    assert np.isclose(compact_ratio, ratio, rtol=1e-12)
+    assert compact_costs == costs
+    assert compensated.get_cost_distribution(50) == expected.get_cost_distribution(50)
+    # 筹码网格每个价格4字节，保存残差时8字节
+    assert compensated.nbytes == 2 * plain.nbytes == 8 * len(compensated.grid)
+
+
+def test_compact_sweep_and_strategy(make_klines, make_chip_klines):
+    klines = make_chip_klines()
+    full = DecaySweepChips([0.5, 1.0], price_tick=1.0)
+    full.calculate_from_klines(klines)
+    compact = DecaySweepChips([0.5, 1.0], price_tick=1.0, compact=True, compensated=False)
+    compact.calculate_from_klines(klines)
+    assert compact.grid.dtype == np.float32 and compact.nbytes * 2 == full.nbytes
+    assert np.allclose(compact.values, full.values, rtol=2.0 ** -23)
+    assert np.array_equal(compact.cost_distribution(50), full.cost_distribution(50))
+
+    results = []
+    for compact_chips in (False, True):
+        framework = QuantFramework()
+        framework.initialize("CZCE.FG401", None, None, 100000)
+        strategy = ChipDistributionStrategy(profit_ratio_high=0.7, profit_ratio_low=0.3, compact_chips=compact_chips)
+        framework.set_strategy(strategy)
+        results.append(framework.run_offline_backtest(make_klines(120)))
+    assert isinstance(strategy.chip, CompactChipDistribution)
+    assert results[0]["trade_count"] == results[1]["trade_count"] > 0
@@ -0,0 +1,39 @@
+import json
+from framework.event_journal import EventJournal, DEBUG, INFO, WARNING, _noop, get_journal, reset_journal
+
+
+def test_journal_writes_json_lines(tmp_path):
+    path = tmp_path / "events.jsonl"
+    journal = EventJournal(path=str(path), level=INFO, console=False)
+    journal.info("signal", "金叉信号: 买入 {symbol}, 价格: {price:.2f}", symbol="CZCE.FG401", price=1500.0)
+    journal.debug("fill", "不应该被记录")
+    journal.close()
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 1
+    assert records[0]["event"] == "signal"
+    assert records[0]["price"] == 1500.0
+    assert records[0]["message"] == "金叉信号: 买入 CZCE.FG401, 价格: 1500.00"
+
+
+def test_disabled_levels_are_noop():
+    journal = EventJournal(level=WARNING, console=False)
+    assert journal.debug is _noop and journal.info is _noop
+    journal.set_level(DEBUG)
+    assert journal.debug is not _noop
+    journal.close()
+
+
+def test_reset_journal_ignores_inherited_lock(tmp_path):
+    path = tmp_path / "worker.jsonl"
+    inherited = get_journal()
+    # 模拟fork时父进程的后台线程正持有锁，子进程重新创建日志后不受影响
+    with inherited._lock:
+        journal = reset_journal(path=str(path), console=False)
+        assert get_journal() is journal and journal is not inherited
+        journal.info("batch", "任务完成: {job_id}", job_id="a")
+        journal.flush()
+    reset_journal()
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["job_id"] for r in records] == ["a"]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from framework.execution_simulator import ExecutionSimulator
+from framework.offline_engine import BacktestFinished, OfflineApi
+from framework.contracts import get_contract_spec
+from framework.quant_framework import QuantFramework
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+
+def test_contract_spec_lookup():
+    # 主连合约和具体合约使用同一套参数
+    assert get_contract_spec("CZCE.FG401").multiplier == 20
+    assert get_contract_spec("KQ.m@SHFE.rb").price_tick == 1.0
+    assert get_contract_spec("DCE.i2405").price_tick == 0.5
+
+
+def test_participation_cap_splits_fill(make_klines):
+    klines = make_klines(10)
+    klines["volume"] = 100.0
+    sim = ExecutionSimulator("CZCE.FG401", participation_rate=0.1, spread_ticks=2)
+    sim.load_market_data(klines)
+
+    fills = sim.simulate([klines["datetime"][0]], [25])
+    # 每根K线最多成交10手，25手需要3根K线
+    assert fills["volume"][0] == 25
+    assert fills["fill_index"][0] == 2
+    expected = (10 * klines["open"][0] + 10 * klines["open"][1] + 5 * klines["open"][2]) / 25 + 1.0
+    assert np.isclose(fills["price"][0], expected)
+    assert np.isclose(fills["commission"][0], 25 * 6.0)
+
+
+def test_latency_and_max_wait(make_klines):
+    klines = make_klines(10)
+    klines["volume"] = 100.0
+    sim = ExecutionSimulator("CZCE.FG401", latency=3600, max_wait_bars=1)
+    sim.load_market_data(klines)
+
+    fills = sim.simulate([klines["datetime"][0]], [-25])
+    # 延迟一小时后到达第二根K线，只等待一根K线，剩余部分撤单
+    assert fills["arrival_index"][0] == 1
+    assert fills["volume"][0] == -10
+    assert fills["unfilled"][0] == 15
+
+
+def test_offline_backtest_runs_strategy(make_klines):
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    framework.set_strategy(MovingAverageStrategy(short_period=5, long_period=20))
+    results = framework.run_offline_backtest(make_klines())
+
+    assert results["trade_count"] > 0
+    assert framework.api.get_trade()
+    assert np.isfinite(results["final_balance"])
+
+
+def test_offline_fills_follow_simulate(make_klines):
+    klines = make_klines(10)
+    klines["volume"] = 100.0
+    sim = ExecutionSimulator("CZCE.FG401", participation_rate=0.1, max_wait_bars=2)
+    api = OfflineApi(klines, "CZCE.FG401", simulator=sim)
+    api.wait_update()
+    api.create_target_pos_task("CZCE.FG401").set_target_volume(25)
+    expected = sim.simulate([klines["datetime"][0]], [25])[0]
+    while True:
+        try:
+            api.wait_update()
+        except BacktestFinished:
+            break
+
+    # 逐K线计入的成交与simulate的整体撮合结果一致，超时后剩余部分撤单
+    trades = list(api.get_trade().values())
+    assert [t.volume for t in trades] == [10, 10]
+    assert sum(t.volume for t in trades) == expected["volume"]
+    assert np.isclose(sum(t.volume * t.price for t in trades) / 20, expected["price"])
+    assert api.get_position().pos == 20
+
+
+def test_offline_rejects_tick_data(make_klines):
+    ticks = pd.DataFrame({"datetime": [1, 2], "last_price": [1500.0, 1501.0], "volume": [10.0, 12.0],
+                          "ask_price1": [1501.0, 1502.0], "bid_price1": [1500.0, 1501.0]})
+    with pytest.raises(ValueError):
+        OfflineApi(ticks, "CZCE.FG401")
+    with pytest.raises(ValueError):
+        OfflineApi(make_klines(5).drop(columns=["open"]), "CZCE.FG401")
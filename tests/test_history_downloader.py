@@ -0,0 +1,67 @@
+import numpy as np
+from framework.history_downloader import FrameBackend, HistoryDownloader, TokenBucket, plan_chunks
+from framework.local_store import LocalStore
+
+
+class FlakyBackend(FrameBackend):
+    """
+    前几次请求失败，或者对某些合约一直失败
+    """
+    def __init__(self, klines, transient=0, broken=()):
+        super().__init__(klines)
+        self.transient = transient
+        self.broken = set(broken)
+
+    def fetch(self, symbol, duration, start, end):
+        with self._lock:
+            self.transient -= 1
+            fail = self.transient >= 0
+        if fail or symbol in self.broken:
+            raise ConnectionError("连接中断")
+        return super().fetch(symbol, duration, start, end)
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0], sleep=sleep)
+    waits = [bucket.acquire() for _ in range(6)]
+    # 前两个令牌立即可用，之后每0.1秒一个
+    assert np.allclose(waits, [0, 0, 0.1, 0.1, 0.1, 0.1])
+    assert np.isclose(now[0], 0.4)
+
+
+def test_download_retries_and_resumes(tmp_path, make_klines):
+    data = {"CZCE.FG401": make_klines(120, seed=1), "SHFE.rb2401": make_klines(120, seed=2)}
+    assert plan_chunks("2023-01-01", "2023-01-31", 10)[-1] == ("2023-01-31", "2023-02-01")
+    store = LocalStore(str(tmp_path))
+    sleeps = []
+
+    # 合约rb一直失败，其他块在重试后成功
+    backend = FlakyBackend(data, transient=2, broken=["SHFE.rb2401"])
+    downloader = HistoryDownloader(store, backend, workers=3, rate=1000, max_retries=2, backoff=0.01,
+                                   chunk_days=30, sleep=sleeps.append)
+    summary = downloader.run(list(data), 86400, "2023-01-01", "2023-05-31")
+    # 151天拆分为6块
+    assert summary["done"] == 6 and summary["failed"] == 6
+    assert 0.01 in sleeps and 0.02 in sleeps
+    # 没有K线的块不写入分块文件
+    assert len(store.list_kline_chunks("CZCE.FG401", 86400)) == 5
+
+    # 重新运行只下载失败的块
+    backend = FrameBackend(data)
+    downloader = HistoryDownloader(store, backend, workers=3, rate=1000, chunk_days=30)
+    summary = downloader.run(list(data), 86400, "2023-01-01", "2023-05-31")
+    assert summary == {"done": 6, "skipped": 6, "failed": 0, "rows": 120}
+    assert backend.calls == 6
+    for symbol, klines in data.items():
+        loaded = store.load_klines(symbol, 86400)
+        assert np.array_equal(loaded["datetime"], klines["datetime"])
+        assert np.array_equal(loaded["close"], klines["close"])
+
+    # 全部完成后不再请求
+    assert downloader.run(list(data), 86400, "2023-01-01", "2023-05-31")["skipped"] == 12
+    assert backend.calls == 6
@@ -0,0 +1,36 @@
+import numpy as np
+from framework.kline_view import KlineView
+from framework.offline_engine import OfflineApi
+
+
+def test_views_follow_offline_serial_in_place(make_klines):
+    klines = make_klines(50)
+    api = OfflineApi(klines, "CZCE.FG401")
+    serial = api.get_kline_serial("CZCE.FG401", 86400, data_length=20)
+    view = KlineView(serial)
+    # 视图与K线序列共享内存
+    assert np.shares_memory(view.close, serial["close"].to_numpy())
+
+    new_bars = 0
+    for step in range(60):
+        api.wait_update()
+        new_bars += view.is_new_bar()
+        assert view.last("datetime") == serial["datetime"].iat[-1]
+        assert view.close[-1] == serial["close"].iat[-1]
+        assert np.isclose(view.bar(-2)["high"], serial["high"].iat[-2], equal_nan=True)
+    # 每根K线推送两次，只有开盘时刻算新K线
+    assert new_bars == 30
+    assert not view.is_stale()
+
+
+def test_strategy_view_is_recreated_when_serial_changes(make_klines):
+    from strategies.moving_average_strategy import MovingAverageStrategy
+
+    strategy = MovingAverageStrategy()
+    assert strategy.bars is None
+    strategy.klines = make_klines(30)
+    view = strategy.bars
+    assert strategy.bars is view
+    assert view.close[-1] == strategy.klines["close"].iat[-1]
+    strategy.klines = make_klines(40)
+    assert strategy.bars is not view and len(strategy.bars) == 40
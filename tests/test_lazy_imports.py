@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与 benchmark_import_time.py 中测量的模块一致
+MODULES = [
+    "framework.quant_framework",
+    "framework.execution_simulator",
+    "framework.position_sizing",
+    "analysis_tools.chip_distribution",
+    "analysis_tools.chip_distribution_with_increment",
+    "strategies.moving_average_strategy",
+    "strategies.chip_distribution_strategy",
+]
+HEAVY_MODULES = ["tqsdk", "matplotlib.pyplot", "pandas"]
+
+
+def test_computational_modules_do_not_load_heavy_dependencies():
+    # 在新的解释器中导入，避免受其他测试已加载模块的影响
+    code = (f"import sys; import {', '.join(MODULES)}; "
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True,
+                            capture_output=True, text=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import time
+import numpy as np
+import pytest
+from framework.market_data_bus import ReplayFeed, MarketDataSubscriber, FeedClosed, _Channel
+
+SYMBOL = "CZCE.FG401"
+
+
+def bus_name(tag):
+    # 每个测试使用独立的总线名称，避免与其他进程的共享内存冲突
+    return f"tbus{os.getpid()}{tag}"
+
+
+def test_subscriber_follows_replay_feed(make_klines):
+    name = bus_name("a")
+    # 缓冲区小于K线数量，覆盖环形缓冲区回绕
+    feed = ReplayFeed(make_klines(50), SYMBOL, name=name, capacity=32)
+    subscriber = MarketDataSubscriber(name)
+    try:
+        serial = subscriber.get_kline_serial(SYMBOL, 86400, data_length=20)
+        quote = subscriber.get_quote(SYMBOL)
+        expected = feed.api.get_kline_serial(SYMBOL, 86400, data_length=20)
+        with pytest.raises(ValueError):
+            subscriber.get_kline_serial(SYMBOL, 86400, data_length=64)
+
+        # 没有新行情时到达截止时间返回False
+        assert not subscriber.wait_update(deadline=time.time() + 0.01)
+
+        new_bars = 0
+        while feed.step():
+            assert subscriber.wait_update(deadline=time.time() + 1)
+            new_bars += subscriber.is_changing(serial, "datetime")
+            assert np.array_equal(serial.to_numpy(), expected.to_numpy(), equal_nan=True)
+            assert quote.last_price == feed.api.get_quote(SYMBOL).last_price
+            assert quote.datetime == expected["datetime"].iat[-1]
+        # 每根K线推送两次，只有开盘时刻产生新K线
+        assert new_bars == 50
+        # 发布端关闭且行情全部读取后抛出FeedClosed
+        with pytest.raises(FeedClosed):
+            subscriber.wait_update(deadline=time.time() + 1)
+    finally:
+        subscriber.close()
+        feed.close()
+
+
+def _run_strategy(name, ready, results):
+    """
+    在子进程中以行情总线作为策略的行情来源
+    """
+    from strategies.moving_average_strategy import MovingAverageStrategy
+
+    strategy = MovingAverageStrategy()
+    strategy.set_data_source(MarketDataSubscriber(name))
+    strategy.klines = strategy.get_kline_serial(SYMBOL, 86400, data_length=30)
+    ready.set()
+    updates = 0
+    try:
+        while True:
+            strategy.wait_update()
+            updates += 1
+    except FeedClosed:
+        pass
+    strategy.data_source.close()
+    results.put((updates, strategy.bars.close.copy()))
+
+
+def test_strategy_reads_bus_from_another_process(make_klines):
+    name = bus_name("b")
+    klines = make_klines(80)
+    feed = ReplayFeed(klines, SYMBOL, name=name, capacity=128)
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Event(), context.Queue()
+    process = context.Process(target=_run_strategy, args=(name, ready, results))
+    process.start()
+    try:
+        assert ready.wait(60)
+        feed.run()
+        updates, close = results.get(timeout=60)
+        process.join(60)
+    finally:
+        feed.close()
+    assert process.exitcode == 0
+    assert 0 < updates <= 160
+    assert np.array_equal(close, klines["close"].to_numpy()[-30:])
+
+
+def test_read_gives_up_on_interrupted_write():
+    channel = _Channel.create(bus_name("w"), 4, 2)
+    try:
+        channel.write(np.ones((3, 2)))
+        seq, count, rows = channel.read(1)
+        assert seq == 2 and count == 3 and rows.shape == (2, 2)
+        # 发布端在写入中途退出，序号停在奇数
+        channel.header[0] += 1
+        with pytest.raises(FeedClosed):
+            channel.read(0, timeout=0.05)
+    finally:
+        channel.close()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from framework.optimizer import ParameterSpace, StrategyOptimizer, GaussianProcess, expected_improvement
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+SPACE = {"short_period": (2, 10), "long_period": [15, 20, 25, 30, 40, 50]}
+
+
+@pytest.fixture
+def make_optimizer(make_klines):
+    def make(n=300, **kwargs):
+        space = ParameterSpace(SPACE, constraint=lambda p: p["short_period"] * 3 <= p["long_period"])
+        return StrategyOptimizer(MovingAverageStrategy, space, "CZCE.FG401", make_klines(n), **kwargs)
+    return make
+
+
+def test_successive_halving_uses_fraction_of_grid(make_optimizer):
+    optimizer = make_optimizer(600)
+    grid = optimizer.space.grid()
+    assert all(p["short_period"] * 3 <= p["long_period"] for p in grid)
+    result = optimizer.successive_halving(min_bars=60, eta=3)
+
+    # 第一轮K线数量不少于最长预热K线（长周期50加1根）的2倍，全部候选参数先在最近102根K线上回测，只有少数进入全部K线
+    assert result["full_evaluations"] == len(grid)
+    assert [r["bars"] for r in optimizer.history].count(102) == len(grid)
+    assert result["cost_ratio"] < 0.5
+    # 最优参数是全部K线上回测过的参数中目标值最高的
+    full = [r for r in optimizer.history if r["bars"] == 600]
+    assert result["best_score"] == max(r["score"] for r in full)
+    assert result["best_params"] in [r["params"] for r in full]
+
+    # 与逐个回测整个网格相比，最优参数的目标值排在前列
+    exhaustive = make_optimizer(600)
+    scores = exhaustive.evaluate(grid)
+    assert result["best_score"] >= np.quantile(scores, 0.75)
+
+
+def test_successive_halving_default_window_covers_warmup(make_klines):
+    space = {"short_period": (2, 8), "long_period": (20, 40)}
+    optimizer = StrategyOptimizer(MovingAverageStrategy, space, "CZCE.FG401", make_klines(300))
+    result = optimizer.successive_halving()
+
+    # 默认的第一轮K线数量按候选数量只有3根，需要提高到预热K线的2倍，否则全部目标值为0，只按网格顺序淘汰
+    assert min(r["bars"] for r in optimizer.history) == 2 * 41
+    exhaustive = StrategyOptimizer(MovingAverageStrategy, space, "CZCE.FG401", make_klines(300))
+    scores = exhaustive.evaluate(exhaustive.space.grid())
+    assert result["best_score"] == max(scores)
+
+    # 全部目标值相同的一轮不淘汰候选参数
+    flat = StrategyOptimizer(MovingAverageStrategy, space, "CZCE.FG401", make_klines(300), objective=lambda r: 0.0)
+    candidates = [{"short_period": 3, "long_period": 20}, {"short_period": 5, "long_period": 30},
+                  {"short_period": 8, "long_period": 40}]
+    flat.successive_halving(candidates, min_bars=82)
+    assert [r["bars"] for r in flat.history] == [82] * 3 + [246] * 3 + [300] * 3
+
+
+def test_gaussian_process_and_bayesian_search(make_optimizer):
+    x = np.linspace(0, 1, 8)[:, None]
+    y = np.sin(6 * x[:, 0])
+    gp = GaussianProcess().fit(x, y)
+    mean, std = gp.predict(np.array([[x[3, 0]], [0.5 / 7 + x[3, 0]], [3.0]]))
+    # 已观测的点预测准确且不确定性小，远离观测的点不确定性大
+    assert abs(mean[0] - y[3]) < 1e-2 and std[0] < std[1] < std[2]
+    improvement = expected_improvement(np.array([0.0, 1.0, 0.0]), np.array([0.1, 0.1, 1.0]), 0.5)
+    assert improvement[1] > improvement[2] > improvement[0]
+
+    optimizer = make_optimizer(seed=1)
+    result = optimizer.bayesian(iterations=12, initial=6, pool=200, batch=2)
+    assert result["evaluations"] == 12 and result["cost_ratio"] == 1.0
+    keys = {tuple(r["params"].values()) for r in optimizer.history}
+    assert len(keys) == 12
+    assert result["best_score"] == max(r["score"] for r in optimizer.history)
+
+
+def test_parallel_workers_match_inline(make_optimizer):
+    candidates = [{"short_period": 3, "long_period": 20}, {"short_period": 5, "long_period": 30},
+                  {"short_period": 8, "long_period": 40}]
+    inline = make_optimizer().evaluate(candidates, bars=200)
+    with make_optimizer(workers=2) as optimizer:
+        parallel = optimizer.evaluate(candidates, bars=200)
+        # 相同参数和K线长度不重复回测
+        optimizer.evaluate(candidates[:1], bars=200)
+        assert len(optimizer.history) == 3
+    assert parallel == inline
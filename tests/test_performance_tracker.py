@@ -0,0 +1,57 @@
+import numpy as np
+from framework.performance_tracker import PerformanceTracker
+from framework.quant_framework import QuantFramework
+from framework.trade_journal import TradeJournal
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+
+def test_tracker_matches_batch_statistics():
+    rng = np.random.default_rng(0)
+    balances = 100000 + np.cumsum(rng.normal(0, 500, 300))
+    exposed = rng.random(300) < 0.5
+    tracker = PerformanceTracker(window=20, periods_per_year=252)
+    tracker.reset(100000, time=0)
+    for i, (balance, flag) in enumerate(zip(balances, exposed)):
+        tracker.update(balance, time=i + 1, exposed=flag)
+        tracker.close_period()
+
+    series = np.concatenate(([100000], balances))
+    peaks = np.maximum.accumulate(series)
+    assert np.isclose(tracker.max_drawdown, ((peaks - series) / peaks).max())
+    assert np.isclose(tracker.drawdown, (peaks[-1] - series[-1]) / peaks[-1])
+    # 每个时间单位的持仓状态由上一次更新决定
+    assert np.isclose(tracker.exposure, exposed[:-1].mean() * 299 / 300)
+
+    returns = series[1:] / series[:-1] - 1
+    assert np.isclose(tracker.rolling_return, series[-1] / series[-21] - 1)
+    assert np.isclose(tracker.rolling_volatility, returns[-20:].std(ddof=1))
+    assert np.isclose(tracker.rolling_sharpe, returns[-20:].mean() / returns[-20:].std(ddof=1) * np.sqrt(252))
+
+
+def test_tracker_drawdown_duration():
+    tracker = PerformanceTracker()
+    tracker.reset(100, time=0)
+    for time, balance in [(1, 110), (2, 100), (3, 105), (4, 111), (5, 90), (6, 95)]:
+        tracker.update(balance, time=time)
+    assert tracker.peak == 111
+    assert tracker.drawdown_duration == 2
+    assert tracker.max_drawdown_duration == 2
+    assert np.isclose(tracker.max_drawdown, 21 / 111)
+
+
+def test_strategy_tracks_intra_bar_drawdown(tmp_path, make_klines):
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    strategy = MovingAverageStrategy()
+    strategy.attach_trade_journal(TradeJournal(str(tmp_path / "ma")))
+    framework.set_strategy(strategy)
+    results = framework.run_offline_backtest(make_klines(200))
+
+    # 开盘和收盘推送都计入绩效，回撤不小于只按K线开盘权益计算的回撤
+    equity = strategy.trade_journal.equity["balance"]
+    peaks = np.maximum.accumulate(np.concatenate(([100000], equity)))
+    bar_drawdown = ((peaks[1:] - equity) / peaks[1:]).max()
+    assert strategy.performance.update_count > len(equity)
+    assert results["max_drawdown"] >= bar_drawdown
+    assert results["max_drawdown"] == strategy.performance.max_drawdown
+    assert 0 < strategy.performance.exposure <= 1
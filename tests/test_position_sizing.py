@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from framework.contracts import get_contract_spec
+from framework.position_sizing import RollingATR, RollingVolatility, ATRSizer, RiskManager
+from framework.offline_engine import OfflineApi
+from framework.quant_framework import QuantFramework
+from strategies.moving_average_strategy import MovingAverageStrategy, MultipleMovingAverageStrategy
+
+
+def test_rolling_statistics_match_batch(make_klines):
+    klines = make_klines(120)
+    atr = RollingATR(14)
+    vol = RollingVolatility(20)
+    for row in klines.itertuples():
+        atr.update(row.high, row.low, row.close)
+        vol.update(row.close)
+
+    # 与一次性计算的结果对比
+    prev_close = klines["close"].shift(1)
+    tr = pd.concat([klines["high"], prev_close], axis=1).max(axis=1) - \
+        pd.concat([klines["low"], prev_close], axis=1).min(axis=1)
+    tr.iloc[0] = klines["high"].iloc[0] - klines["low"].iloc[0]
+    expected_atr = tr.iloc[:14].mean()
+    for value in tr.iloc[14:]:
+        expected_atr += (value - expected_atr) / 14
+    assert np.isclose(atr.value, expected_atr)
+
+    returns = np.log(klines["close"]).diff().iloc[-20:]
+    assert np.isclose(vol.value, returns.std())
+
+
+def test_atr_sizer_and_risk_limits():
+    spec = get_contract_spec("CZCE.FG401")
+    sizer = ATRSizer(risk_fraction=0.02, atr_period=3, atr_multiple=1)
+    for _ in range(3):
+        sizer.update(1510, 1490, 1500)
+    # 单手风险 = 20 × 20 = 400，权益100万的2%可承担50手
+    assert sizer.target_volume(1500, 1000000, spec) == 50
+
+    risk = RiskManager(max_margin_ratio=0.3)
+    # 单手保证金 = 1500 × 20 × 0.12 = 3600
+    assert risk.limit("CZCE.FG401", 50, 1500, 100000, spec) == 8
+    # 组合保证金额度已被占用大部分，第二个品种只能使用剩余部分
+    assert risk.limit("CZCE.SA401", 50, 1500, 100000, get_contract_spec("CZCE.SA401")) == 0
+    # 平仓后释放额度
+    risk.release("CZCE.FG401")
+    assert risk.limit("CZCE.SA401", 50, 1500, 100000, get_contract_spec("CZCE.SA401")) > 0
+
+
+def test_strategy_uses_position_sizer(make_klines):
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 1000000)
+    strategy = MovingAverageStrategy()
+    strategy.set_position_sizer(ATRSizer(risk_fraction=0.01), RiskManager(max_volume=5))
+    framework.set_strategy(strategy)
+    framework.run_offline_backtest(make_klines())
+
+    volumes = [trade.volume for trade in framework.api.get_trade().values()]
+    assert max(volumes) > 1
+    assert abs(framework.api.get_position().pos) <= 5
+
+
+def test_flatten_releases_exposure_and_zero_volume_is_not_a_trade(make_klines):
+    risk = RiskManager(max_margin_ratio=0.3)
+    strategy = MovingAverageStrategy()
+    strategy.set_position_sizer(ATRSizer(risk_fraction=0.01), risk)
+    strategy.initialize(OfflineApi(make_klines(), "CZCE.FG401"), "CZCE.FG401")
+    assert strategy.set_target_direction(1, 1500) > 0
+    assert risk.margins["CZCE.FG401"] > 0
+    strategy.set_target_direction(0, 1500)
+    assert "CZCE.FG401" not in risk.margins
+
+    # 风险控制不允许开仓时，重复的信号不计为交易
+    for strategy in (MovingAverageStrategy(), MultipleMovingAverageStrategy(3, 5, 10)):
+        framework = QuantFramework()
+        framework.initialize("CZCE.FG401", None, None, 100000)
+        strategy.set_position_sizer(ATRSizer(risk_fraction=0.01), RiskManager(max_volume=0))
+        framework.set_strategy(strategy)
+        results = framework.run_offline_backtest(make_klines())
+        assert results["trade_count"] == 0
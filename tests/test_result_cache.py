@@ -0,0 +1,73 @@
+from framework.quant_framework import QuantFramework
+from framework.result_cache import ResultCache, data_fingerprint, source_tree_fingerprint
+from framework.trade_journal import TradeJournal, RunJournal
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+
+def run_cached(cache, klines, journal_dir=None, **params):
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    strategy = MovingAverageStrategy(**params)
+    if journal_dir:
+        strategy.attach_trade_journal(TradeJournal(journal_dir))
+    framework.set_strategy(strategy)
+    results = framework.run_offline_backtest(klines, cache=cache)
+    return framework, results
+
+
+def test_backtest_results_are_cached(tmp_path, make_klines):
+    cache = ResultCache(str(tmp_path / "cache"))
+    klines = make_klines()
+
+    framework, first = run_cached(cache, klines, short_period=5, long_period=20)
+    assert framework.api is not None
+    # 相同策略、参数和数据直接返回缓存结果，成交记录从缓存中复制
+    framework, second = run_cached(cache, klines, str(tmp_path / "run"), short_period=5, long_period=20)
+    assert framework.api is None
+    assert second == first
+    journal = RunJournal(str(tmp_path / "run"))
+    assert journal.meta["trade_count"] == first["trade_count"]
+    assert len(journal.equity) == journal.meta["equity_count"] > 0
+
+    # 参数或数据变化时重新计算
+    run_cached(cache, klines, short_period=3, long_period=20)
+    changed = klines.copy()
+    changed.loc[100, "close"] += 1
+    assert data_fingerprint(changed) != data_fingerprint(klines)
+    run_cached(cache, changed, short_period=5, long_period=20)
+    assert len(cache.entries()) == 3
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10**9)
+
+    def compute(directory):
+        with open(f"{directory}/blob", "wb") as f:
+            f.write(b"0" * 1000)
+        return {"value": 1}
+
+    for key in ["a", "b", "c"]:
+        cache.get_or_compute(key, compute)
+    # 读取a使其成为最近使用，再收紧上限后淘汰b
+    import os, time
+    for key, age in [("a", 30), ("b", 20), ("c", 10)]:
+        path = os.path.join(cache.entry_dir(key), "result.json")
+        os.utime(path, (time.time() - age, time.time() - age))
+    assert cache.get("a") == {"value": 1}
+    cache.max_bytes = 2500
+    cache.evict()
+    assert sorted(key for key, _, _ in cache.entries()) == ["a", "c"]
+
+
+def test_source_tree_fingerprint_covers_every_module(tmp_path, monkeypatch):
+    package = tmp_path / "cached_pkg"
+    (package / "sub").mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "sub" / "helper.py").write_text("SCALE = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    before = source_tree_fingerprint(["cached_pkg"])
+    # 策略没有直接引用的子模块变化同样改变指纹
+    (package / "sub" / "helper.py").write_text("SCALE = 2\n")
+    assert source_tree_fingerprint(["cached_pkg"]) != before
+    assert source_tree_fingerprint(["framework"]) != source_tree_fingerprint(["analysis_tools"])
@@ -0,0 +1,66 @@
+import numpy as np
+from framework.robustness import (block_bootstrap_paths, shuffle_paths, path_statistics, segment_returns,
+                                  journal_returns, simulate, summarize)
+from framework.trade_journal import EQUITY_DTYPE, TradeJournal, load_journals
+from framework.quant_framework import QuantFramework
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+
+def test_path_statistics_match_single_path():
+    returns = np.array([0.1, -0.2, 0.05, 0.1])
+    stats = path_statistics(returns, initial_capital=100)
+    equity = np.cumprod(1 + returns)
+    assert np.isclose(stats["terminal_equity"][0], 100 * equity[-1])
+    assert np.isclose(stats["max_drawdown"][0], 1 - equity[1] / equity[0])
+    assert np.isclose(stats["sharpe"][0], returns.mean() / returns.std(ddof=1) * np.sqrt(252))
+
+
+def test_resampled_paths_reuse_original_values():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.01, 250)
+    paths = block_bootstrap_paths(returns, 100, block_size=10, rng=rng)
+    assert paths.shape == (100, 250)
+    assert np.isin(paths, returns).all()
+    # 块内保持原序列的连续顺序
+    start = np.flatnonzero(returns == paths[0, 0])[0]
+    assert np.array_equal(paths[0, :10], returns[np.arange(start, start + 10) % 250])
+
+    shuffled = shuffle_paths(returns, 50, rng)
+    assert np.array_equal(np.sort(shuffled, axis=1), np.tile(np.sort(returns), (50, 1)))
+    # 打乱顺序不改变期末权益，只改变回撤
+    stats = path_statistics(shuffled)
+    assert np.allclose(stats["terminal_equity"], np.prod(1 + returns))
+    assert stats["max_drawdown"].std() > 0
+
+
+def test_simulation_is_independent_of_worker_count():
+    returns = np.random.default_rng(1).normal(0.0005, 0.01, 1260)
+    single = simulate(returns, n_paths=3000, seed=7, chunk_size=1000)
+    parallel = simulate(returns, n_paths=3000, seed=7, chunk_size=1000, workers=2)
+    for name in single:
+        assert len(single[name]) == 3000
+        assert np.array_equal(single[name], parallel[name], equal_nan=True)
+
+    summary = summarize(single, observed=path_statistics(returns))
+    assert summary["max_drawdown"]["p5"] <= summary["max_drawdown"]["p95"]
+    assert 0 <= summary["sharpe"]["observed_rank"] <= 1
+
+
+def test_segment_returns_from_equity_records(tmp_path, make_klines):
+    equity = np.zeros(6, dtype=EQUITY_DTYPE)
+    equity["datetime"] = np.arange(6)
+    equity["balance"] = [100, 100, 105, 110, 99, 99]
+    equity["position"] = [0, 1, 1, -1, 0, 0]
+    assert np.allclose(segment_returns(equity), [0.1, -0.1])
+
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    strategy = MovingAverageStrategy()
+    strategy.attach_trade_journal(TradeJournal(str(tmp_path / "ma")))
+    framework.set_strategy(strategy)
+    framework.run_offline_backtest(make_klines(200))
+    run = load_journals(str(tmp_path))[0]
+    returns = journal_returns(run)
+    assert len(returns) == 199
+    assert np.isclose(np.prod(1 + returns), run.equity["balance"][-1] / run.equity["balance"][0])
+    assert len(segment_returns(run)) > 0
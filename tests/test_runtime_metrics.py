@@ -0,0 +1,74 @@
+import json
+import time
+import urllib.request
+from framework.quant_framework import QuantFramework
+from framework.runtime_metrics import MetricsRegistry, MetricsServer, SnapshotWriter, register_process_metrics
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+
+def test_histogram_buckets_and_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "事件数", strategy="A", symbol="X")
+    # 相同名称和标签返回同一个指标
+    assert registry.counter("events_total", strategy="A", symbol="X") is counter
+    counter.inc()
+    counter.inc(2)
+    histogram = registry.histogram("latency_seconds", "耗时")
+    for ns in (0, 1, 3, 1000, 1023, 1024):
+        histogram.observe(ns)
+    # 二进制位数相同的耗时落在同一个桶
+    assert histogram.buckets[0] == 1 and histogram.buckets[1] == 1 and histogram.buckets[2] == 1
+    assert histogram.buckets[10] == 2 and histogram.buckets[11] == 1
+    assert histogram.count == 6 and histogram.sum == 3051
+    # 分位数返回所在桶的上界
+    assert histogram.quantile(0.5) == 4 and histogram.quantile(0.9) == 2048
+    registry.gauge("memory_bytes", function=lambda: 42)
+
+    text = registry.to_prometheus()
+    assert "# TYPE events_total counter" in text
+    assert 'events_total{strategy="A",symbol="X"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 6' in text
+    # 桶计数为累计值，最后一个有限桶等于总数
+    assert f'latency_seconds_bucket{{le="{2 ** 11 / 1e9!r}"}} 6' in text
+    assert "latency_seconds_count 6" in text
+    assert "memory_bytes 42" in text
+
+
+def test_strategy_metrics_served_over_http(tmp_path, make_klines):
+    registry = MetricsRegistry()
+    register_process_metrics(registry)
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    strategy = MovingAverageStrategy(short_period=5, long_period=20)
+    strategy.enable_metrics(registry)
+    framework.set_strategy(strategy)
+    framework.run_offline_backtest(make_klines(100))
+
+    instruments = strategy.instruments
+    assert instruments.bars.value == 100
+    assert instruments.wakeups.value >= 100
+    assert instruments.processing.count == instruments.wakeups.value - 1
+    assert instruments.last_bar.value > 0
+
+    server = MetricsServer(registry, port=0)
+    port = server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=10) as response:
+            text = response.read().decode("utf-8")
+    finally:
+        server.stop()
+    assert 'strategy_bars_total{strategy="MovingAverageStrategy",symbol="CZCE.FG401"} 100' in text
+    assert "strategy_update_seconds_bucket" in text
+    assert "process_resident_memory_bytes" in text
+
+    writer = SnapshotWriter(str(tmp_path / "metrics" / "snapshot.json"), registry, interval=0.01)
+    writer.start()
+    time.sleep(0.05)
+    writer.stop()
+    with open(tmp_path / "metrics" / "snapshot.json", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    sample = snapshot["strategy_wait_seconds"]["samples"][0]
+    assert sample["labels"] == {"strategy": "MovingAverageStrategy", "symbol": "CZCE.FG401"}
+    assert sample["count"] == instruments.wakeups.value
+    assert snapshot["process_resident_memory_bytes"]["samples"][0]["value"] > 0
+
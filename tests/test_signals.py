@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from framework.signals import Field, SMA, CrossAbove, CrossBelow, Ordered, Became, SignalEvaluator
+
+
+def make_evaluator():
+    close = Field("close")
+    short_ma, mid_ma, long_ma = SMA(close, 5), SMA(close, 10), SMA(close, 20)
+    return SignalEvaluator(
+        short_ma=short_ma,
+        cross_up=CrossAbove(short_ma, long_ma),
+        cross_down=CrossBelow(short_ma, long_ma),
+        bull=Became(Ordered(short_ma, mid_ma, long_ma)),
+        bear=Became(Ordered(short_ma, mid_ma, long_ma, descending=False)),
+        # 阈值和逻辑组合
+        breakout=(close > SMA(Field("high"), 10)) & ~(Field("volume") < 100) | CrossAbove(close, 1500),
+    )
+
+
+def test_sma_matches_rolling_mean(make_klines):
+    klines = make_klines()
+    klines.loc[50, "close"] = np.nan
+    values = SMA(Field("close"), 20).evaluate(klines)
+    expected = klines["close"].rolling(20).mean().to_numpy()
+    assert np.allclose(values, expected, equal_nan=True)
+    assert np.isnan(values[50:70]).all()
+
+
+def test_incremental_matches_vectorized(make_klines):
+    klines = make_klines()
+    evaluator = make_evaluator()
+    history = evaluator.evaluate(klines)
+    rows = [evaluator.commit(bar) for _, bar in klines.iterrows()]
+    for name, values in history.items():
+        incremental = np.array([row[name] for row in rows])
+        # 两种计算方式逐位相同
+        assert np.array_equal(incremental, values, equal_nan=True), name
+    assert history["cross_up"].any() and history["bull"].any() and history["breakout"].any()
+
+
+def test_peek_does_not_change_state(make_klines):
+    klines = make_klines(60)
+    evaluator = make_evaluator()
+    for _, bar in klines.iloc[:-1].iterrows():
+        evaluator.commit(bar)
+    forming = klines.iloc[-1]
+    assert evaluator.peek(forming) == evaluator.peek(forming)
+    assert evaluator.bar_count == 59
+    assert evaluator.peek(forming) == evaluator.commit(forming)
+
+
+def test_catch_up_skips_invalid_and_committed_bars(make_klines):
+    klines = make_klines(80)
+    klines["datetime"] = klines["datetime"].astype(float)
+    klines.loc[:4, klines.columns] = np.nan
+    evaluator = make_evaluator()
+    expected = evaluator.evaluate(klines.iloc[5:79])
+
+    # 首次计入已有的全部历史，之后每次只计入新完成的一根
+    values = evaluator.catch_up(klines.iloc[:60])
+    assert evaluator.bar_count == 54
+    assert values["short_ma"] == expected["short_ma"][53]
+    assert evaluator.catch_up(klines.iloc[:60]) is None
+    for end in range(61, 81):
+        values = evaluator.catch_up(klines.iloc[:end])
+    assert evaluator.bar_count == 74
+    assert values == {name: series[-1] for name, series in expected.items()}
+
+
+def test_chained_comparison_is_rejected():
+    close = Field("close")
+    with pytest.raises(ValueError):
+        SMA(close, 5) > SMA(close, 10) > SMA(close, 20)
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+from framework.offline_engine import OfflineApi
+from framework.quant_framework import QuantFramework
+from framework.state_snapshot import StateSnapshot
+from strategies.chip_distribution_strategy import ChipDistributionStrategy
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+SYMBOL = "CZCE.FG401"
+
+
+def run_session(strategy, klines, snapshot=None):
+    framework = QuantFramework()
+    framework.initialize(SYMBOL, None, None, 100000)
+    if snapshot is not None:
+        strategy.attach_snapshot(snapshot)
+    framework.set_strategy(strategy)
+    framework.run_offline_backtest(klines)
+    return strategy
+
+
+def test_moving_average_restores_and_catches_up(tmp_path, make_klines):
+    klines = make_klines(260)
+    reference = run_session(MovingAverageStrategy(5, 20), klines)
+
+    path = str(tmp_path / "state" / "ma.pkl")
+    first = run_session(MovingAverageStrategy(5, 20), klines.iloc[:200], StateSnapshot(path, interval=0))
+    assert os.path.isfile(path) and not os.path.exists(path + ".tmp")
+    saved = StateSnapshot(path).load()
+    assert saved["params"] == {"short_period": 5, "long_period": 20, "kline_period": 86400}
+    assert saved["state"]["signals"]["bar_count"] == first.signals.bar_count == 199
+
+    # 重启后从快照恢复，只计入快照之后的K线
+    restarted = MovingAverageStrategy(5, 20)
+    commits = []
+    commit = restarted.signals.commit
+    restarted.signals.commit = lambda bar: commits.append(bar) or commit(bar)
+    run_session(restarted, klines, StateSnapshot(path, interval=0))
+    assert len(commits) == 259 - 199
+    assert restarted.signals.bar_count == reference.signals.bar_count
+    assert restarted.signals.last_datetime == reference.signals.last_datetime
+    for state, expected in zip(restarted.signals._states, reference.signals._states):
+        if state is not None and "totals" in state:
+            assert state["count"] == expected["count"]
+            assert np.allclose(state["totals"], expected["totals"])
+    assert restarted.trade_count >= first.trade_count
+
+
+def test_restore_checks_params_and_account_position(tmp_path, make_klines):
+    path = str(tmp_path / "ma.pkl")
+    first = run_session(MovingAverageStrategy(5, 20), make_klines(120), StateSnapshot(path, interval=0))
+    assert first.position != 0
+
+    # 参数不同的策略不恢复
+    other = MovingAverageStrategy(3, 20)
+    other.attach_snapshot(StateSnapshot(path))
+    other.initialize(OfflineApi(make_klines(120), SYMBOL), SYMBOL)
+    assert not other.restore_snapshot()
+    assert other.trade_count == 0
+
+    # 恢复交易次数和回撤，持仓以账户中的实际持仓为准
+    strategy = MovingAverageStrategy(5, 20)
+    strategy.attach_snapshot(StateSnapshot(path))
+    strategy.initialize(OfflineApi(make_klines(120), SYMBOL), SYMBOL)
+    assert strategy.restore_snapshot()
+    assert strategy.trade_count == first.trade_count
+    assert strategy.max_drawdown == first.max_drawdown
+    assert strategy.position == 0
+
+    # 损坏的快照文件不恢复
+    with open(path, "wb") as f:
+        f.write(b"broken")
+    assert StateSnapshot(path).load() is None
+
+
+def test_snapshot_interval_and_chip_state(tmp_path, make_klines, assert_same_distribution):
+    klines = make_klines(120)
+    klines["open_interest"] = klines["close_oi"]
+    reference = run_session(ChipDistributionStrategy(profit_ratio_high=0.7, profit_ratio_low=0.3), klines)
+
+    path = str(tmp_path / "chip.pkl")
+    # 时钟不前进时新K线不保存，只有持仓变化和回测结束时保存
+    snapshot = StateSnapshot(path, interval=60, clock=lambda: 0.0)
+    first = run_session(ChipDistributionStrategy(profit_ratio_high=0.7, profit_ratio_low=0.3), klines.iloc[:80],
+                        snapshot)
+    assert 1 < snapshot.save_count < 80
+
+    restarted = run_session(ChipDistributionStrategy(profit_ratio_high=0.7, profit_ratio_low=0.3), klines,
+                            StateSnapshot(path))
+    assert first.bar_count == 79
+    assert restarted.bar_count == reference.bar_count == 119
+    assert_same_distribution(reference.chip.price_vol, restarted.chip.price_vol, 1e-9)
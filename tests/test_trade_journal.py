@@ -0,0 +1,34 @@
+import numpy as np
+from framework.trade_journal import TradeJournal, load_journals
+from framework.quant_framework import QuantFramework
+from strategies.moving_average_strategy import MovingAverageStrategy
+
+
+def test_journal_flushes_chunks_to_disk(tmp_path):
+    journal = TradeJournal(str(tmp_path / "run"), chunk_size=4, metadata={"symbol": "CZCE.FG401"})
+    for i in range(10):
+        journal.record_equity(i, 100000.0 + i, 0, 1500.0)
+    journal.close()
+
+    runs = load_journals(str(tmp_path))
+    assert len(runs) == 1
+    assert runs[0].meta["equity_count"] == 10
+    assert isinstance(runs[0].equity, np.memmap)
+    assert np.array_equal(runs[0].equity["balance"], 100000.0 + np.arange(10))
+
+
+def test_strategy_records_trades_and_equity(tmp_path, make_klines):
+    framework = QuantFramework()
+    framework.initialize("CZCE.FG401", None, None, 100000)
+    strategy = MovingAverageStrategy()
+    strategy.attach_trade_journal(TradeJournal(str(tmp_path / "ma")))
+    framework.set_strategy(strategy)
+    results = framework.run_offline_backtest(make_klines(200))
+
+    run = load_journals(str(tmp_path))[0]
+    trades = framework.api.get_trade()
+    assert len(run.trades) == len(trades)
+    assert run.trades["position"][-1] == framework.api.get_position().pos
+    # 每根K线记录一个权益点，最后一个权益点为回测结束时的权益
+    assert len(run.equity) == 201
+    assert np.isclose(run.equity["balance"][-1], results["final_balance"])
@@ -0,0 +1,89 @@
+import numpy as np
+from framework import trading_calendar
+from framework.trading_calendar import TradingCalendar
+
+
+def beijing(text):
+    # 北京时间字符串转换为UTC纳秒时间戳
+    return np.datetime64(text, "ns").astype(np.int64) - 8 * 3600 * 10 ** 9
+
+
+def test_night_sessions_and_holidays():
+    calendar = TradingCalendar.for_symbol("CZCE.FG401", "2024-01-01", "2024-03-31")
+    # 周五夜盘属于下周一
+    assert calendar.trading_day(beijing("2024-01-05 21:30")) == np.datetime64("2024-01-08")
+    assert calendar.is_trading(beijing("2024-01-05 21:30"))
+    # 春节前最后一个交易日没有夜盘，休市时间属于节后第一个交易日
+    assert not calendar.is_trading(beijing("2024-02-08 21:30"))
+    assert calendar.trading_day(beijing("2024-02-08 21:30")) == np.datetime64("2024-02-19")
+    assert not calendar.is_trading(beijing("2024-01-08 10:20"))
+    assert np.datetime64("2024-02-12") not in calendar.trading_days
+
+    # 黄金夜盘跨过午夜
+    gold = TradingCalendar.for_symbol("SHFE.au2406", "2024-01-01", "2024-03-31")
+    times = np.array([beijing("2024-01-06 01:30"), beijing("2024-01-06 03:00")])
+    assert list(gold.is_trading(times)) == [True, False]
+    assert gold.trading_day(times[0]) == np.datetime64("2024-01-08")
+    # 股指期货没有夜盘，9:30开盘
+    index = TradingCalendar.for_symbol("CFFEX.IF2403", "2024-01-01", "2024-03-31")
+    assert index.session_bounds(beijing("2024-01-08 09:00"))[0] == beijing("2024-01-08 09:30")
+
+    # 夜盘品种表覆盖活跃品种，没有交易时段信息的品种需要先注册
+    assert trading_calendar.session_template("DCE.a2405")[1] == (21 * 60, 23 * 60)
+    assert trading_calendar.session_template("INE.bc2405")[1] == (21 * 60, 60)
+    assert trading_calendar.session_template("CZCE.AP405")[1] is None
+    try:
+        TradingCalendar.for_symbol("XXX.zz2405")
+        assert False
+    except ValueError:
+        pass
+
+
+def test_bar_close_and_counts():
+    calendar = TradingCalendar.for_symbol("CZCE.FG401", "2024-01-01", "2024-03-31")
+    # 自然小时线: 10:00的小时线包含10:00-10:15和10:30-11:00，11:00的小时线在11:30午休时收盘，日线在15:00收盘
+    assert calendar.next_bar_close(beijing("2024-01-08 10:00"), 3600) == beijing("2024-01-08 11:00")
+    assert calendar.next_bar_close(beijing("2024-01-08 10:40"), 3600) == beijing("2024-01-08 11:00")
+    assert calendar.next_bar_close(beijing("2024-01-08 11:00"), 3600) == beijing("2024-01-08 11:30")
+    assert calendar.next_bar_close(beijing("2024-01-08 10:00"), 900) == beijing("2024-01-08 10:15")
+    assert calendar.next_bar_close(beijing("2024-01-08 14:30"), 1800) == beijing("2024-01-08 15:00")
+    assert calendar.next_bar_close(beijing("2024-01-05 21:00"), 86400) == beijing("2024-01-08 15:00")
+    assert calendar.is_bar_final(beijing("2024-01-08 10:00"), 3600, beijing("2024-01-08 11:00"))
+    assert not calendar.is_bar_final(beijing("2024-01-08 10:00"), 3600, beijing("2024-01-08 10:15"))
+    # 2小时线的8:00-10:00和10:00-12:00各跨过一次休市
+    assert calendar.next_bar_close(beijing("2024-01-08 10:00"), 7200) == beijing("2024-01-08 11:30")
+
+    # 一个交易日: 夜盘120分钟 + 日盘225分钟；小时线为21、22、9、10、11、13、14点共7根
+    day = (beijing("2024-01-05 21:00"), beijing("2024-01-08 15:00"))
+    assert calendar.bars_between(*day, 60) == 345
+    assert calendar.bars_between(*day, 3600) == 7
+    assert calendar.bars_between(*day, 7200) == 6
+    # 2月1日的交易日从1月31日夜盘开始
+    assert calendar.bars_between(beijing("2024-01-01"), beijing("2024-01-31 16:00"), 86400) == 22
+    assert calendar.bars_between(beijing("2024-01-01"), beijing("2024-02-01"), 86400) == 23
+
+    # 与逐时段枚举K线开始时间的结果一致，同一交易日内跨过休市的整周期只算一根
+    for duration in (60, 300, 900, 3600, 7200):
+        starts = []
+        last = None
+        step = duration * 10 ** 9
+        offset = 8 * 3600 * 10 ** 9
+        for open_, close, day in zip(calendar.opens[:200], calendar.closes[:200], calendar.session_days[:200]):
+            for cell in range((open_ + offset) // step, -((-(close + offset)) // step)):
+                if (day, cell) != last:
+                    starts.append(max(cell * step - offset, open_))
+                    last = (day, cell)
+        times = np.random.default_rng(0).integers(calendar.opens[0], calendar.closes[199], 500)
+        assert np.array_equal(calendar.bar_position(times, duration), np.searchsorted(starts, times))
+
+
+def test_calendar_npz_cache(tmp_path):
+    calendar = TradingCalendar.for_symbol("DCE.i2405", "2023-01-01", "2023-12-31", cache_dir=str(tmp_path))
+    assert len(list(tmp_path.glob("calendar_*.npz"))) == 1
+    trading_calendar._CALENDAR_CACHE.clear()
+    loaded = TradingCalendar.for_symbol("DCE.i2405", "2023-01-01", "2023-12-31", cache_dir=str(tmp_path))
+    assert loaded is not calendar
+    assert np.array_equal(loaded.opens, calendar.opens)
+    assert np.array_equal(loaded.trading_days, calendar.trading_days)
+    # 2023年共242个交易日
+    assert len(loaded.trading_days) == 242
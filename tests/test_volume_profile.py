@@ -0,0 +1,55 @@
+import numpy as np
+from analysis_tools.volume_profile import WindowedVolumeProfile
+
+
+def profile_of(klines, method, window=None):
+    profile = WindowedVolumeProfile(window=window, method=method, price_tick=1.0, width=64)
+    profile.replay_bars(klines["high"], klines["low"], klines["close"], klines["volume"])
+    return profile
+
+
+def test_sliding_window_matches_recomputation(make_klines):
+    klines = make_klines(120)
+    for method in ("triangle", "even"):
+        # 较小的初始宽度和重建间隔，覆盖网格平移和重建
+        profile = WindowedVolumeProfile(window=20, method=method, price_tick=1.0, width=64, rebuild_interval=7)
+        for i, bar in enumerate(klines.itertuples()):
+            profile.update(bar.high, bar.low, bar.close, bar.volume)
+            if i % 17 == 0 or i == len(klines) - 1:
+                expected = profile_of(klines.iloc[max(0, i - 19):i + 1], method)
+                prices, volumes = profile.get_distribution()
+                expected_prices, expected_volumes = expected.get_distribution()
+                assert np.array_equal(prices, expected_prices)
+                assert np.allclose(volumes, expected_volumes)
+        assert len(profile) == 20
+        # 窗口内的成交量全部分配到价格网格上
+        assert np.isclose(profile.get_distribution()[1].sum(), klines["volume"].iloc[-20:].sum(), rtol=1e-2)
+
+
+def test_grid_total_equals_window_volume(make_klines):
+    klines = make_klines(60)
+    # 网格间距比行情价格粗，多数最低价不在网格上
+    for method in ("triangle", "even"):
+        profile = WindowedVolumeProfile(window=20, method=method, price_tick=2.0, width=16, rebuild_interval=7)
+        for i, bar in enumerate(klines.itertuples()):
+            profile.update(bar.high, bar.low, bar.close, bar.volume)
+            window_volume = klines["volume"].iloc[max(0, i - 19):i + 1].sum()
+            assert np.isclose(profile.grid.sum(), window_volume, rtol=1e-9)
+
+
+def test_session_reset_and_queries(make_klines):
+    klines = make_klines(40)
+    profile = profile_of(klines.iloc[:30], "even")
+    assert len(profile) == 30
+    profile.update(*klines.iloc[30][["high", "low", "close", "volume"]], new_session=True)
+    assert len(profile) == 1
+
+    profile = profile_of(klines, "triangle")
+    prices, volumes = profile.get_distribution()
+    poc = profile.point_of_control()
+    low, high = profile.value_area(0.7)
+    assert low <= poc <= high
+    assert volumes[(prices >= low) & (prices <= high)].sum() >= 0.7 * volumes.sum()
+    ratio, (cost50,) = profile.get_chip_metrics(klines["close"].iloc[-1], [50])
+    assert 0 <= ratio <= 1
+    assert profile.get_cost_distribution(50) == cost50